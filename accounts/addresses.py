@@ -0,0 +1,111 @@
+"""
+Нормализация и дедупликация адресов покупателей.
+
+Отпечаток (fingerprint) — SHA-256 от нормализованных полей адреса: пробелы
+по краям убираются, внутренние схлопываются, регистр не учитывается.
+У пользователя не может быть двух адресов с одинаковым отпечатком
+(ограничение ``unique_user_address``), поэтому повторный ввод того же
+адреса не создаёт новую строку.
+
+Функции очистки принимают классы моделей и вызываются командой
+cleanup_addresses; миграция 0002 содержит собственную копию этой логики.
+"""
+import hashlib
+
+from django.db import transaction
+from django.db.models import Count, Max
+
+ADDRESS_FIELDS = ('city', 'street', 'house', 'building', 'apartment', 'postal_code')
+
+
+def normalize(value):
+    """Приводит значение поля адреса к каноническому виду."""
+    return ' '.join(str(value or '').split()).casefold()
+
+
+def fingerprint(**fields):
+    """
+    Вычисляет отпечаток адреса.
+
+    Args:
+        **fields: Значения полей из ADDRESS_FIELDS (отсутствующие считаются пустыми).
+
+    Returns:
+        str: Шестнадцатеричный SHA-256.
+    """
+    canonical = '\x1f'.join(normalize(fields.get(name)) for name in ADDRESS_FIELDS)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+# Отпечаток пустого адреса-заглушки
+EMPTY_FINGERPRINT = fingerprint()
+
+
+def fill_fingerprints(address_model, chunk_size=500):
+    """Заполняет отпечатки адресов, у которых он ещё не вычислен, пачками по pk."""
+    filled = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            addresses = list(
+                address_model.objects.filter(pk__gt=last_pk, fingerprint='')
+                .order_by('pk')
+                .only('pk', *ADDRESS_FIELDS)[:chunk_size]
+            )
+            if not addresses:
+                return filled
+            for address in addresses:
+                address.fingerprint = fingerprint(**{name: getattr(address, name) for name in ADDRESS_FIELDS})
+            address_model.objects.bulk_update(addresses, ['fingerprint'])
+        filled += len(addresses)
+        last_pk = addresses[-1].pk
+
+
+def collapse_duplicates(address_model, order_model, chunk_size=500):
+    """
+    Объединяет адреса пользователя с одинаковым отпечатком.
+
+    Остаётся самый новый адрес; заказы, ссылавшиеся на дубликаты,
+    перепривязываются к нему. Обработка идёт пачками групп дубликатов.
+
+    Returns:
+        int: Количество удалённых дубликатов.
+    """
+    removed = 0
+    while True:
+        with transaction.atomic():
+            groups = list(
+                address_model.objects.values('user_id', 'fingerprint')
+                .annotate(rows=Count('id'), keep_id=Max('id'))
+                .filter(rows__gt=1)
+                .order_by()[:chunk_size]
+            )
+            if not groups:
+                return removed
+            for group in groups:
+                duplicates = address_model.objects.filter(
+                    user_id=group['user_id'], fingerprint=group['fingerprint']
+                ).exclude(pk=group['keep_id'])
+                order_model.objects.filter(address__in=duplicates).update(address_id=group['keep_id'])
+                removed += duplicates.delete()[1].get(address_model._meta.label, 0)
+
+
+def delete_placeholders(address_model, order_model, chunk_size=500):
+    """
+    Удаляет пустые адреса-заглушки, на которые не ссылаются заказы.
+
+    Returns:
+        int: Количество удалённых адресов.
+    """
+    removed = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                address_model.objects.filter(fingerprint=EMPTY_FINGERPRINT)
+                .exclude(pk__in=order_model.objects.filter(address__isnull=False).values('address_id'))
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ids:
+                return removed
+            address_model.objects.filter(pk__in=ids).delete()
+        removed += len(ids)
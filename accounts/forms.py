@@ -62,6 +62,9 @@ class UserForm(forms.ModelForm):
 
     def clean_email(self):
         email = self.cleaned_data.get('email')
+        # Пустой или неизменённый email не проверяем — без лишнего запроса
+        if not email or 'email' not in self.changed_data:
+            return email
         if User.objects.filter(email=email).exclude(pk=self.instance.pk).exists():
             raise ValidationError("Пользователь с таким email уже существует.")
         return email
\ No newline at end of file
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from accounts import addresses
+from accounts.models import Address
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Collapses duplicate customer addresses and removes empty placeholder addresses in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of rows or duplicate groups per transaction')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        filled = addresses.fill_fingerprints(Address, chunk_size)
+        collapsed = addresses.collapse_duplicates(Address, Order, chunk_size)
+        placeholders = addresses.delete_placeholders(Address, Order, chunk_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Fingerprinted {filled} addresses, removed {collapsed} duplicates and {placeholders} placeholders'
+        ))
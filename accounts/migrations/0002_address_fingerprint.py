@@ -0,0 +1,69 @@
+# Generated by Django 6.0 on 2026-10-17 17:30
+
+import hashlib
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+# Логика заполнения зафиксирована на момент миграции и не зависит от accounts.addresses
+ADDRESS_FIELDS = ('city', 'street', 'house', 'building', 'apartment', 'postal_code')
+
+
+def fingerprint(address):
+    canonical = '\x1f'.join(' '.join(str(getattr(address, name) or '').split()).casefold() for name in ADDRESS_FIELDS)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def deduplicate_addresses(apps, schema_editor):
+    """Вычисляет отпечатки и объединяет дубликаты перед созданием уникального ограничения."""
+    Address = apps.get_model('accounts', 'Address')
+    Order = apps.get_model('orders', 'Order')
+
+    last_pk = 0
+    while True:
+        addresses = list(Address.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', *ADDRESS_FIELDS)[:500])
+        if not addresses:
+            break
+        for address in addresses:
+            address.fingerprint = fingerprint(address)
+        Address.objects.bulk_update(addresses, ['fingerprint'])
+        last_pk = addresses[-1].pk
+
+    # Остаётся самый новый адрес, заказы дубликатов перепривязываются к нему
+    groups = (
+        Address.objects.values('user_id', 'fingerprint')
+        .annotate(rows=Count('id'), keep_id=Max('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in list(groups):
+        duplicates = Address.objects.filter(
+            user_id=group['user_id'], fingerprint=group['fingerprint']
+        ).exclude(pk=group['keep_id'])
+        Order.objects.filter(address__in=duplicates).update(address_id=group['keep_id'])
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('orders', '0007_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Отпечаток адреса'),
+        ),
+        migrations.RunPython(deduplicate_addresses, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['user', 'created_at'], name='address_user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(fields=('user', 'fingerprint'), name='unique_user_address'),
+        ),
+    ]
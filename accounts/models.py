@@ -2,11 +2,42 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.contrib.auth.models import BaseUserManager
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from accounts import addresses
 from accounts.validators import validate_phone_number
 
 
+class AddressQuerySet(models.QuerySet):
+    """QuerySet адресов с выборкой по пользователю и вставкой без дубликатов."""
+
+    def for_user(self, user):
+        """Адреса пользователя, начиная с последнего использованного (без пустых заглушек)."""
+        return self.filter(user=user).exclude(fingerprint=addresses.EMPTY_FINGERPRINT).order_by('-created_at')
+
+    def upsert(self, user, **fields):
+        """
+        Возвращает адрес пользователя с такими данными, создавая его при необходимости.
+
+        Выполняется одним ``INSERT ... ON CONFLICT (user_id, fingerprint) DO UPDATE``:
+        у найденного адреса обновляется дата, и он становится последним использованным.
+
+        Args:
+            user (User): Владелец адреса.
+            **fields: Значения полей адреса.
+
+        Returns:
+            Address: Сохранённый адрес.
+        """
+        address = self.model(user=user, **fields)
+        address.fingerprint = address.compute_fingerprint()
+        self.bulk_create(
+            [address],
+            update_conflicts=True,
+            unique_fields=['user', 'fingerprint'],
+            update_fields=['created_at'],
+        )
+        return address
+
+
 class Address(models.Model):
     """
     Модель для хранения адресов покупателей.
@@ -19,7 +50,8 @@ class Address(models.Model):
         building (CharField): Корпус. Может быть пустым.
         apartment (CharField): Квартира. Может быть пустой.
         postal_code (CharField): Почтовый индекс. Может быть пустым.
-        created_at (DateTimeField): Дата и время добавления адреса.
+        created_at (DateTimeField): Дата и время добавления (последнего использования) адреса.
+        fingerprint (CharField): Отпечаток нормализованного адреса (см. accounts.addresses).
 
     Methods:
         __str__: Возвращает строковое представление адреса.
@@ -37,6 +69,9 @@ class Address(models.Model):
     apartment = models.CharField(max_length=10, blank=True, null=True, verbose_name='Квартира')
     postal_code = models.CharField(max_length=10, blank=True, null=True, verbose_name='Индекс')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False, verbose_name='Отпечаток адреса')
+
+    objects = AddressQuerySet.as_manager()
 
     def __str__(self):
         """
@@ -58,9 +93,25 @@ class Address(models.Model):
             value = getattr(self, field).strip() if hasattr(self, field) else ''
             setattr(self, field, value.upper())
 
+    def compute_fingerprint(self):
+        """Вычисляет отпечаток по текущим значениям полей."""
+        return addresses.fingerprint(**{name: getattr(self, name) for name in addresses.ADDRESS_FIELDS})
+
+    def save(self, *args, **kwargs):
+        self.fingerprint = self.compute_fingerprint()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'fingerprint'}
+        super().save(*args, **kwargs)
+
     class Meta:
         db_table = 'address'
         verbose_name = 'Адреса'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'fingerprint'], name='unique_user_address'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='address_user_created_idx'),
+        ]
 
 
 class CustomUserManager(BaseUserManager):
@@ -157,19 +208,3 @@ class User(AbstractUser):
             str: Номер телефона пользователя.
         """
         return str(self.phone_number)
-
-
-@receiver(post_save, sender=User)
-def create_address(sender, instance, created, **kwargs):
-    """
-    Сигнал для автоматического создания адреса при создании нового пользователя.
-
-    Args:
-        sender (Model): Модель, отправившая сигнал.
-        instance (User): Экземпляр пользователя.
-        created (bool): Флаг, указывающий, был ли пользователь только что создан.
-        **kwargs: Дополнительные аргументы сигнала.
-    """
-    if created:
-        Address.objects.create(user=instance)
-        
\ No newline at end of file
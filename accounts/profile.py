@@ -0,0 +1,49 @@
+"""
+Загрузка данных для страницы профиля пользователя.
+
+``load_profile()`` сразу читает только адреса (одним запросом, уже без
+дубликатов) — их выводит шаблон профиля. Заказы и избранное возвращаются
+ленивыми querysets и выполняются, только если их действительно перебирают:
+заказы — с сохранёнными итогами, избранное — как карточки товаров с основным
+изображением, по одному запросу на каждый список.
+"""
+from dataclasses import dataclass
+
+from django.db.models import QuerySet
+
+from accounts.models import Address
+from shop.models import ProductShop
+
+
+@dataclass(frozen=True)
+class ProfileBundle:
+    """Данные страницы профиля."""
+    orders: QuerySet
+    favorite_products: QuerySet
+    addresses: list
+
+    @property
+    def address(self):
+        """Последний использованный адрес."""
+        return self.addresses[0] if self.addresses else None
+
+    def as_context(self):
+        return {
+            'orders': self.orders,
+            'favorite_products': self.favorite_products,
+            'addresses': self.addresses,
+            'address': self.address,
+        }
+
+
+def load_profile(user):
+    """
+    Загружает адреса пользователя и готовит ленивые querysets заказов и избранного.
+
+    Returns:
+        ProfileBundle: Данные профиля (один запрос к базе данных за адреса).
+    """
+    orders = user.orders.only('id', 'user_id', 'status', 'created_at', 'total').order_by('-created_at')
+    favorite_products = ProductShop.objects.filter(favorited_by=user).cards(user).order_by('-pk')
+    addresses = list(Address.objects.for_user(user))
+    return ProfileBundle(orders, favorite_products, addresses)
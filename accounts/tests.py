@@ -1,3 +1,113 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import Address, User
+from accounts.profile import load_profile
+from orders.models import Order
+from shop.models import CategoryShop, ProductImage, ProductShop
+
+
+class AddressDeduplicationTest(TestCase):
+    """Проверяет дедупликацию адресов на уровне базы данных."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990000020', password='password')
+
+    def test_no_placeholder_on_registration(self):
+        self.assertFalse(Address.objects.filter(user=self.user).exists())
+
+    def test_upsert_reuses_normalized_address(self):
+        first = Address.objects.upsert(self.user, city='Москва', street='Тверская', house='1')
+        with self.assertNumQueries(1):
+            second = Address.objects.upsert(self.user, city='  москва ', street='ТВЕРСКАЯ', house='1', building='')
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Address.objects.filter(user=self.user).count(), 1)
+
+        other = Address.objects.upsert(self.user, city='Москва', street='Тверская', house='2')
+        self.assertEqual(list(Address.objects.for_user(self.user)), [other, first])
+
+    def test_cleanup_removes_unused_placeholders(self):
+        Address.objects.create(user=self.user)
+        used = User.objects.create_user(phone_number='+79990000021', password='password')
+        placeholder = Address.objects.create(user=used)
+        Order.objects.create(user=used, address=placeholder, payment_method='cash')
+
+        self.assertFalse(Address.objects.for_user(self.user).exists())
+        call_command('cleanup_addresses', stdout=StringIO())
+
+        self.assertEqual(list(Address.objects.values_list('pk', flat=True)), [placeholder.pk])
+
+
+class ProfileQueryCountTest(TestCase):
+    """Проверяет бюджет запросов страницы профиля."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone_number='+79990000022', password='password')
+        cls.category = CategoryShop.objects.create(title='Категория', slug='category')
+
+    def add_data(self, count):
+        start = ProductShop.objects.count()
+        for index in range(start, start + count):
+            product = ProductShop.objects.create(
+                title=f'Товар {index}', slug=f'product-{index}', price=100, quantity=1, category=self.category
+            )
+            ProductImage.objects.create(product=product, image=f'shop_images/{index}.jpg', slug=f'image-{index}')
+            self.user.favorite_products.add(product)
+            Order.objects.create(user=self.user, payment_method='cash', total=100)
+            Address.objects.upsert(self.user, city='Москва', street='Тверская', house=str(index))
+
+    def test_load_profile_query_budget(self):
+        self.add_data(3)
+        with self.assertNumQueries(1):
+            bundle = load_profile(self.user)
+        self.assertEqual(bundle.address.house, '2')
+
+        with self.assertNumQueries(2):
+            favorites = list(bundle.favorite_products)
+            orders = list(bundle.orders)
+        self.assertEqual(len(favorites), 3)
+        self.assertEqual(favorites[0].primary_image_url, '/media/shop_images/2.jpg')
+        self.assertEqual(orders[0].total_cost, 100)
+
+    def test_profile_page_queries_do_not_grow(self):
+        self.client.force_login(self.user)
+        url = reverse('accounts:profile')
+        self.add_data(1)
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        self.add_data(10)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        # Сессия, пользователь и адреса: заказы и избранное шаблон не выводит
+        self.assertEqual(len(large.captured_queries), 3)
+
+    def test_profile_update_is_single_save(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('accounts:profile'))
+        data = {'first_name': 'Иван', 'last_name': '', 'email': '', 'phone_number': self.user.phone_number}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('accounts:profile'), data)
+
+        self.assertEqual(response.status_code, 302)
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "accounts_user"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"first_name"', updates[0])
+        self.assertIn('"receive_notifications"', updates[0])
+        self.assertNotIn('"password"', updates[0])
 
-# Create your tests here.
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Иван')
+        self.assertFalse(self.user.receive_notifications)
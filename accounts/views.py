@@ -3,11 +3,14 @@ from django.contrib.auth import login, logout
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
+from django.db import transaction
 
 from accounts.models import User
 from .forms import RegistrationForm, LoginForm, UserForm
 from orders.forms import OrderForm
 from orders.models import Address
+from notifications import outbox
+from .profile import load_profile
 
 # Базовый класс для упрощения функционала аутентификации
 class BaseAuthView(View):
@@ -30,8 +33,10 @@ class RegisterView(BaseAuthView):
         """POST-запрос обрабатывает отправленную форму регистрации"""
         form = RegistrationForm(request.POST)
         if form.is_valid():
-            # Сохраняем пользователя через форму
-            user = form.save()
+            # Сохраняем пользователя и приветственное уведомление в одной транзакции
+            with transaction.atomic():
+                user = form.save()
+                outbox.publish_welcome(user.pk)
             login(request, user)
             if form.cleaned_data.get('is_checkout_registration'):
                 return redirect('accounts:profile')
@@ -74,39 +79,28 @@ class AddressView(LoginRequiredMixin, BaseAuthView):
 
     def get(self, request):
         """GET-запрос возвращает страницу управления адресом."""
-        addresses = Address.objects.filter(user=request.user).order_by('-created_at')
-
-        # Фильтруем только уникальные и непустые адреса
-        unique_addresses = []
-        seen_addresses = set()
-
-        for addr in addresses:
-            # Проверяем, что адрес не пустой (хотя бы город и улица заполнены)
-            if addr.city and addr.street:
-                # Создаем уникальный ключ для адреса
-                address_key = (addr.city, addr.street, addr.house, addr.building, addr.apartment, addr.postal_code)
-                if address_key not in seen_addresses:
-                    seen_addresses.add(address_key)
-                    unique_addresses.append(addr)
-
-        if unique_addresses:
-            form = OrderForm(instance=unique_addresses.first())
+        # Дубликаты и пустые адреса исключены на уровне базы данных
+        addresses = list(Address.objects.for_user(request.user))
+
+        if addresses:
+            form = OrderForm(instance=addresses[0])
         else:
             form = OrderForm()
-        return render(request, self.template_name, {'form': form, 'addresses': unique_addresses})
+        return render(request, self.template_name, {'form': form, 'addresses': addresses})
 
     def post(self, request):
-        """POST-запрос сохраняет новый или обновляет существующий адрес пользователя."""
+        """POST-запрос сохраняет новый адрес пользователя (или делает существующий последним)."""
         form = OrderForm(request.POST)
         if form.is_valid():
-            address, _ = Address.objects.update_or_create(user=request.user, defaults={
-                'city': form.cleaned_data['city'],
-                'street': form.cleaned_data['street'],
-                'house': form.cleaned_data['house'],
-                'building': form.cleaned_data['building'],
-                'apartment': form.cleaned_data['apartment'],
-                'postal_code': form.cleaned_data['postal_code'],
-            })
+            Address.objects.upsert(
+                request.user,
+                city=form.cleaned_data['city'],
+                street=form.cleaned_data['street'],
+                house=form.cleaned_data['house'],
+                building=form.cleaned_data['building'],
+                apartment=form.cleaned_data['apartment'],
+                postal_code=form.cleaned_data['postal_code'],
+            )
             return self.get_redirect_url()
         return render(request, self.template_name, {'form': form})
 
@@ -117,50 +111,21 @@ class UserView(LoginRequiredMixin, BaseAuthView):
     def get(self, request):
         """GET-запрос возвращает профиль пользователя с информацией о заказах и избранных продуктах."""
         form = UserForm(instance=request.user)
-        orders = request.user.orders.all()
-        favorite_products = request.user.favorite_products.all()
-
-        # Получить адреса пользователя
-        addresses = Address.objects.filter(user=request.user).order_by('-created_at')
-
-        # Фильтруем только уникальные и непустые адреса
-        unique_addresses = []
-        seen_addresses = set()
-
-        for addr in addresses:
-            # Проверяем, что адрес не пустой (хотя бы город и улица заполнены)
-            if addr.city and addr.street:
-                # Создаем уникальный ключ для адреса
-                address_key = (addr.city, addr.street, addr.house, addr.building, addr.apartment, addr.postal_code)
-                if address_key not in seen_addresses:
-                    seen_addresses.add(address_key)
-                    unique_addresses.append(addr)
-
-        address = unique_addresses[0] if unique_addresses else None
-
-        return render(request, self.template_name, {
-            'form': form,
-            'orders': orders,
-            'favorite_products': favorite_products,
-            'address': address,
-            'addresses': unique_addresses,
-        })
+        return render(request, self.template_name, {'form': form, **load_profile(request.user).as_context()})
 
     def post(self, request):
-        """POST-запрос обновляет профиль пользователя."""
-        if request.POST.get('receive_notifications') == 'on':
-            request.user.receive_notifications = True
-        else:
-            request.user.receive_notifications = False
-        request.user.save()
-
+        """POST-запрос обновляет профиль пользователя одним сохранением изменённых полей."""
         form = UserForm(request.POST, instance=request.user)
         if form.is_valid():
-            form.save()
+            user = form.save(commit=False)
+            update_fields = list(form.changed_data)
+
+            receive_notifications = request.POST.get('receive_notifications') == 'on'
+            if user.receive_notifications != receive_notifications:
+                user.receive_notifications = receive_notifications
+                update_fields.append('receive_notifications')
+
+            if update_fields:
+                user.save(update_fields=update_fields)
             return self.get_redirect_url()
-        return render(request, self.template_name, {
-            'form': form,
-            'orders': request.user.orders.all(),
-            'favorite_products': request.user.favorite_products.all(),
-            'address': Address.objects.filter(user=request.user).first(),
-        })
+        return render(request, self.template_name, {'form': form, **load_profile(request.user).as_context()})
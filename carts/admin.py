@@ -7,7 +7,7 @@ class CartAdmin(admin.ModelAdmin):
     """
     Администрируем модель корзины.
     """
-    list_display = ('id', 'user')
+    list_display = ('id', 'user', 'item_count', 'total_quantity', 'total_price')
     list_filter = ()
     search_fields = ('user__username',)
     date_hierarchy = None
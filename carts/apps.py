@@ -5,3 +5,7 @@ class CartsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'carts'
     verbose_name = 'Корзина'
+
+    def ready(self):
+        # Импортируем сигналы для их регистрации
+        import carts.signals  # noqa: F401
@@ -1,28 +1,20 @@
+from django.utils.functional import SimpleLazyObject
+
 from .models import Cart
 
 def cart_context(request):
     """
     Context processor to make cart information available globally in templates.
 
+    The quantity is read lazily from the session (kept in sync by the cart
+    mutation views), so rendering a page never creates a cart or a session.
+
     Args:
         request (HttpRequest): The current request object.
 
     Returns:
         dict: A dictionary containing cart information including total quantity.
     """
-    cart_data = {
-        'total_quantity': 0,
+    return {
+        'total_quantity': SimpleLazyObject(lambda: Cart.get_cached_total_quantity(request)),
     }
-
-    try:
-        # Get or create the cart for the current user/session
-        cart = Cart.get_or_create_cart(request)
-
-        # Calculate total quantity of items in cart
-        if cart and cart.items.exists():
-            cart_data['total_quantity'] = sum(item.quantity for item in cart.items.all())
-    except Exception:
-        # If there's any error, just return 0 quantity
-        pass
-
-    return cart_data
\ No newline at end of file
@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from carts.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = 'Recalculates denormalized cart counters and repairs drifted carts in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of carts per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report drifted carts')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        checked = repaired = 0
+        last_pk = 0
+
+        while True:
+            with transaction.atomic():
+                carts = list(
+                    Cart.objects.filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .only('pk', *Cart.COUNTER_FIELDS)[:chunk_size]
+                )
+                if not carts:
+                    break
+
+                totals = {
+                    row['cart_id']: row
+                    for row in CartItem.objects.filter(cart_id__in=[cart.pk for cart in carts])
+                    .values('cart_id')
+                    .annotate(
+                        item_count=Count('id'),
+                        total_quantity=Sum('quantity'),
+                        total_price=Sum(F('quantity') * F('price')),
+                    )
+                    .order_by()
+                }
+
+                drifted = []
+                for cart in carts:
+                    row = totals.get(cart.pk, {})
+                    expected = (
+                        row.get('item_count', 0),
+                        row.get('total_quantity') or 0,
+                        Decimal(row.get('total_price') or 0),
+                    )
+                    if (cart.item_count, cart.total_quantity, cart.total_price) != expected:
+                        cart.item_count, cart.total_quantity, cart.total_price = expected
+                        drifted.append(cart)
+
+                if drifted and not dry_run:
+                    Cart.objects.bulk_update(drifted, Cart.COUNTER_FIELDS)
+
+            checked += len(carts)
+            repaired += len(drifted)
+            last_pk = carts[-1].pk
+
+        action = 'Found' if dry_run else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} carts. {action} {repaired} drifted carts'))
@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-17 13:00
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    """Объединяет повторяющиеся позиции (cart, product) перед созданием уникального ограничения."""
+    Cart = apps.get_model('carts', 'Cart')
+    CartItem = apps.get_model('carts', 'CartItem')
+
+    duplicates = (
+        CartItem.objects.values('cart_id', 'product_id')
+        .annotate(rows=Count('id'), total=Sum('quantity'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates:
+        items = CartItem.objects.filter(cart_id=duplicate['cart_id'], product_id=duplicate['product_id']).order_by('id')
+        keep = items.first()
+        items.exclude(pk=keep.pk).delete()
+        CartItem.objects.filter(pk=keep.pk).update(quantity=duplicate['total'])
+
+        totals = CartItem.objects.filter(cart_id=duplicate['cart_id']).aggregate(
+            rows=Count('id'), quantity=Sum('quantity'), price=Sum(F('quantity') * F('price'))
+        )
+        Cart.objects.filter(pk=duplicate['cart_id']).update(
+            item_count=totals['rows'], total_quantity=totals['quantity'] or 0, total_price=totals['price'] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carts', '0002_cart_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
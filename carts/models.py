@@ -1,17 +1,88 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import connection, models, transaction
+from django.db.models import F
 from django.conf import settings
 from django.forms import ValidationError
+from main.tracking import LoadedStateMixin
 from shop.models import ProductShop
 
 
+# Ключ сессии, в котором хранится количество товаров в корзине для значка в шапке
+CART_QUANTITY_SESSION_KEY = 'cart_total_quantity'
+
+
 class CartMixin:
     """
     Базовый класс для работы с корзиной.
 
     Methods:
         get_or_create_cart(request): Получает или создаёт корзину для пользователя или сессии.
+        get_cart(request): Возвращает существующую корзину, ничего не создавая.
+        remember_total_quantity(request, quantity): Сохраняет количество товаров в сессии.
+        get_cached_total_quantity(request): Возвращает количество товаров для значка корзины.
     """
 
+    @staticmethod
+    def get_cart(request):
+        """
+        Возвращает существующую корзину пользователя или сессии.
+
+        В отличие от get_or_create_cart не создаёт ни корзину, ни сессию,
+        поэтому подходит для GET-запросов.
+
+        Args:
+            request (HttpRequest): Запрос пользователя.
+
+        Returns:
+            Cart | None: Экземпляр корзины или None, если корзины ещё нет.
+        """
+        if request.user.is_authenticated:
+            return Cart.objects.filter(user=request.user).first()
+
+        session_id = request.session.session_key
+        if not session_id:
+            return None
+        return Cart.objects.filter(session_id=session_id).first()
+
+    @staticmethod
+    def remember_total_quantity(request, quantity):
+        """
+        Сохраняет количество товаров в корзине в сессии.
+
+        Вызывается представлениями, изменяющими корзину, чтобы значок корзины
+        не требовал запросов к базе данных.
+
+        Args:
+            request (HttpRequest): Запрос пользователя.
+            quantity (int): Количество товаров в корзине.
+        """
+        request.session[CART_QUANTITY_SESSION_KEY] = int(quantity or 0)
+
+    @staticmethod
+    def get_cached_total_quantity(request):
+        """
+        Возвращает количество товаров в корзине для значка в шапке.
+
+        Читает значение из сессии; для авторизованного пользователя без
+        сохранённого значения (например, сессия создана до появления кэша)
+        выполняет один запрос на чтение. Ничего не записывает.
+
+        Args:
+            request (HttpRequest): Запрос пользователя.
+
+        Returns:
+            int: Количество товаров в корзине.
+        """
+        quantity = request.session.get(CART_QUANTITY_SESSION_KEY)
+        if quantity is not None:
+            return quantity
+
+        if request.user.is_authenticated:
+            cart = Cart.get_cart(request)
+            return cart.total_quantity if cart else 0
+        return 0
+
     @staticmethod
     def get_or_create_cart(request):
         """
@@ -43,6 +114,9 @@ class Cart(models.Model, CartMixin):
         created_at (DateTimeField): Дата и время создания корзины.
         updated_at (DateTimeField): Дата и время последнего обновления корзины.
         session_id (CharField): Идентификатор сессии для неавторизованных пользователей.
+        item_count (PositiveIntegerField): Количество позиций в корзине.
+        total_quantity (PositiveIntegerField): Общее количество единиц товара в корзине.
+        total_price (DecimalField): Итоговая стоимость всех товаров в корзине.
 
     Meta:
         db_table (str): Имя таблицы в базе данных.
@@ -51,8 +125,10 @@ class Cart(models.Model, CartMixin):
         indexes (list): Индексы для оптимизации запросов.
         constraints (list): Ограничения для обеспечения уникальности данных.
 
-    Properties:
-        total_price: Возвращает итоговую стоимость всех товаров в корзине.
+    Methods:
+        apply_totals_delta(...): Атомарно изменяет счётчики корзины.
+        refresh_totals(): Перечитывает счётчики из базы данных.
+        clear(): Удаляет все позиции и обнуляет счётчики.
     """
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -68,6 +144,13 @@ class Cart(models.Model, CartMixin):
     # Поле для хранения сессионного ID (для неавторизованных пользователей)
     session_id = models.CharField(max_length=40, null=True, blank=True, verbose_name='Session ID')
 
+    # Денормализованные счётчики, изменяются атомарно вместе с позициями корзины
+    item_count = models.PositiveIntegerField(default=0, verbose_name='Количество позиций')
+    total_quantity = models.PositiveIntegerField(default=0, verbose_name='Количество товаров')
+    total_price = models.DecimalField(default=0, max_digits=12, decimal_places=2, verbose_name='Итоговая стоимость')
+
+    COUNTER_FIELDS = ['item_count', 'total_quantity', 'total_price']
+
     class Meta:
         db_table = 'cart'
         verbose_name = 'Корзина'
@@ -81,21 +164,215 @@ class Cart(models.Model, CartMixin):
             models.UniqueConstraint(fields=['session_id'], condition=models.Q(session_id__isnull=False), name='unique_session_id'),
         ]
 
-    @property
-    def total_price(self):
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет корзину, не перезаписывая счётчики.
+
+        Счётчики изменяются только атомарными обновлениями (см. apply_totals_delta),
+        поэтому при сохранении существующей корзины они исключаются из UPDATE,
+        чтобы устаревшие значения в памяти не затёрли актуальные.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def apply_totals_delta(self, item_count=0, quantity=0, price=0):
+        """
+        Атомарно изменяет счётчики корзины на указанные величины.
+
+        Выполняется одним UPDATE с выражениями F(), поэтому конкурентные
+        изменения не теряются. Значения в памяти обновляются одним чтением.
+
+        Args:
+            item_count (int): Изменение количества позиций.
+            quantity (int): Изменение общего количества единиц товара.
+            price (Decimal): Изменение итоговой стоимости.
+        """
+        Cart.objects.filter(pk=self.pk).update(
+            item_count=F('item_count') + item_count,
+            total_quantity=F('total_quantity') + quantity,
+            total_price=F('total_price') + price,
+        )
+        self.refresh_totals()
+
+    def refresh_totals(self):
+        """Перечитывает счётчики корзины из базы данных."""
+        self.refresh_from_db(fields=self.COUNTER_FIELDS)
+
+    def clear(self):
+        """
+        Удаляет все позиции корзины и обнуляет счётчики в одной транзакции.
+        """
+        with transaction.atomic():
+            self.items.all().delete()
+            Cart.objects.filter(pk=self.pk).update(item_count=0, total_quantity=0, total_price=0)
+        self.item_count, self.total_quantity, self.total_price = 0, 0, Decimal('0')
+
+
+class CartItemManager(models.Manager):
+    """
+    Менеджер позиций корзины с атомарными операциями изменения количества.
+
+    Каждая операция выполняется одним условным SQL-выражением, поэтому
+    одновременные запросы (например, двойной клик) не теряют изменений и не
+    превышают остаток на складе. Счётчики корзины обновляются в той же транзакции.
+
+    Methods:
+        add_product(cart, product): Добавляет единицу товара в корзину.
+        change_quantity(cart, item_id, delta): Изменяет количество товара в позиции.
+        remove_item(cart, item_id): Удаляет позицию из корзины.
+    """
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    INSUFFICIENT = 'insufficient'
+    NOT_FOUND = 'not_found'
+
+    def _table(self):
+        return connection.ops.quote_name(self.model._meta.db_table)
+
+    def add_product(self, cart, product):
+        """
+        Добавляет единицу товара в корзину.
+
+        Новая позиция создаётся одним выражением INSERT ... ON CONFLICT DO NOTHING
+        с количеством 1. Существующая позиция блокируется (SELECT ... FOR UPDATE;
+        в SQLite блокировку на запись уже взял INSERT), после чего условный
+        UPDATE увеличивает её на 1, только если это не превышает остаток на
+        складе, и обновляет цену. Счётчики корзины изменяются на точную разницу
+        между старой и новой стоимостью позиции.
+
+        Args:
+            cart (Cart): Корзина.
+            product (ProductShop): Товар.
+
+        Returns:
+            int | None: Новое количество товара в позиции или None, если
+            достигнут остаток на складе.
+        """
+        table = self._table()
+        product_table = connection.ops.quote_name(ProductShop._meta.db_table)
+        price = product.sell_price()
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (cart_id, product_id, quantity, price) '
+                    f'SELECT %s, p.id, 1, %s FROM {product_table} p WHERE p.id = %s AND p.quantity > 0 '
+                    f'ON CONFLICT (cart_id, product_id) DO NOTHING '
+                    f'RETURNING quantity, price',
+                    [cart.pk, price, product.pk],
+                )
+                row = cursor.fetchone()
+            if row is not None:
+                quantity, price = row
+                cart.apply_totals_delta(1, 1, Decimal(str(price)))
+                return quantity
+
+            loaded = (
+                self.select_for_update().filter(cart=cart, product=product)
+                .values_list('pk', 'quantity', 'price').first()
+            )
+            if loaded is None:
+                return None
+
+            item_id, old_quantity, old_price = loaded
+            row = self._update_returning(
+                'quantity = quantity + 1, price = %s',
+                f'quantity < (SELECT quantity FROM {product_table} WHERE id = {table}.product_id)',
+                [price], [item_id],
+            )
+            if row is None:
+                return None
+
+            quantity, price = row
+            cart.apply_totals_delta(0, quantity - old_quantity, quantity * price - old_quantity * old_price)
+        return quantity
+
+    def change_quantity(self, cart, item_id, delta):
+        """
+        Изменяет количество товара в позиции на delta одним условным UPDATE ... RETURNING.
+
+        Если количество становится нулевым или отрицательным, позиция удаляется.
+
+        Args:
+            cart (Cart): Корзина.
+            item_id (int): Идентификатор позиции.
+            delta (int): Изменение количества.
+
+        Returns:
+            str: UPDATED, DELETED, INSUFFICIENT или NOT_FOUND.
+        """
+        product_table = connection.ops.quote_name(ProductShop._meta.db_table)
+        with transaction.atomic():
+            row = self._update_returning(
+                'quantity = quantity + %s',
+                f'cart_id = %s AND quantity > %s '
+                f'AND quantity <= (SELECT quantity FROM {product_table} WHERE id = {self._table()}.product_id) - %s',
+                [delta], [item_id, cart.pk, -delta, delta],
+            )
+            if row is not None:
+                _, price = row
+                cart.apply_totals_delta(0, delta, delta * price)
+                return self.UPDATED
+
+            if delta < 0 and self._delete_returning(cart, item_id, 'AND quantity + %s <= 0', [delta]):
+                return self.DELETED
+
+        if self.filter(pk=item_id, cart=cart).exists():
+            return self.INSUFFICIENT
+        return self.NOT_FOUND
+
+    def remove_item(self, cart, item_id):
+        """
+        Удаляет позицию из корзины одним выражением DELETE ... RETURNING.
+
+        Args:
+            cart (Cart): Корзина.
+            item_id (int): Идентификатор позиции.
+
+        Returns:
+            bool: True, если позиция была удалена.
         """
-        Рассчитывает итоговую стоимость корзины с использованием агрегаций базы данных.
+        with transaction.atomic():
+            return self._delete_returning(cart, item_id)
+
+    def _update_returning(self, assignments, condition, set_params, where_params):
+        """
+        Обновляет позицию по id, если выполнено условие.
 
         Returns:
-            Decimal: Итоговая стоимость всех товаров в корзине.
+            tuple | None: Новые (quantity, price) или None, если позиция не изменена.
         """
-        from django.db.models import Sum, F
-        result = self.items.aggregate(total=Sum(F('quantity') * F('price')))
-        total = result['total'] or 0
-        return total
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {self._table()} SET {assignments} WHERE id = %s AND {condition} RETURNING quantity, price',
+                [*set_params, *where_params],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        quantity, price = row
+        return quantity, Decimal(str(price))
+
+    def _delete_returning(self, cart, item_id, condition='', params=()):
+        """Удаляет позицию и уменьшает счётчики корзины на её количество и стоимость."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self._table()} WHERE id = %s AND cart_id = %s {condition} RETURNING quantity, price',
+                [item_id, cart.pk, *params],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return False
+
+        quantity, price = row
+        cart.apply_totals_delta(-1, -quantity, -quantity * Decimal(str(price)))
+        return True
 
 
-class CartItem(models.Model):
+class CartItem(LoadedStateMixin, models.Model):
     """
     Модель позиции корзины.
 
@@ -107,7 +384,8 @@ class CartItem(models.Model):
 
     Methods:
         clean(): Проверяет наличие достаточного количества товара на складе.
-        save(*args, **kwargs): Сохраняет позицию корзины после прохождения проверок.
+        save(*args, **kwargs): Сохраняет позицию корзины и обновляет счётчики корзины.
+        delete(*args, **kwargs): Удаляет позицию корзины и обновляет счётчики корзины.
 
     Properties:
         total_price: Возвращает общую стоимость текущего товара в корзине.
@@ -127,6 +405,11 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1, verbose_name='Количество')
     price = models.DecimalField(max_digits=8, decimal_places=2, verbose_name='Цена')
 
+    objects = CartItemManager()
+
+    # Исходные значения для вычисления изменения счётчиков корзины при сохранении
+    tracked_fields = ('cart_id', 'quantity', 'price')
+
     def clean(self):
         """
         Проверяет наличие достаточного количества товара на складе.
@@ -143,14 +426,44 @@ class CartItem(models.Model):
 
     def save(self, *args, **kwargs):
         """
-        Сохраняет позицию корзины после прохождения проверок.
+        Сохраняет позицию корзины после прохождения проверок и обновляет
+        счётчики корзины в той же транзакции.
 
         Args:
             *args: Дополнительные аргументы.
             **kwargs: Дополнительные именованные аргументы.
         """
         self.full_clean()
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+
+        with transaction.atomic():
+            loaded_state = None
+            if not adding:
+                loaded_state = tuple(self.get_loaded_value(name) for name in self.tracked_fields)
+                # Позиция создана в памяти или загружена без нужных полей (only/defer)
+                if None in loaded_state:
+                    loaded_state = CartItem.objects.filter(pk=self.pk).values_list(*self.tracked_fields).first()
+            super().save(*args, **kwargs)
+            if loaded_state is None:
+                self.cart.apply_totals_delta(1, self.quantity, self.total_price)
+            else:
+                old_cart_id, old_quantity, old_price = loaded_state
+                if old_cart_id != self.cart_id:
+                    Cart(pk=old_cart_id).apply_totals_delta(-1, -old_quantity, -old_quantity * old_price)
+                    self.cart.apply_totals_delta(1, self.quantity, self.total_price)
+                else:
+                    self.cart.apply_totals_delta(
+                        0, self.quantity - old_quantity, self.total_price - old_quantity * old_price
+                    )
+
+    def delete(self, *args, **kwargs):
+        """
+        Удаляет позицию корзины и уменьшает счётчики корзины в той же транзакции.
+        """
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.cart.apply_totals_delta(-1, -self.quantity, -self.total_price)
+        return result
 
     @property
     def total_price(self):
@@ -168,3 +481,7 @@ class CartItem(models.Model):
         indexes = [
             models.Index(fields=['product_id']),  # Индекс для быстрой выборки товаров
         ]
+        constraints = [
+            # Одна позиция на товар в корзине: основа для INSERT ... ON CONFLICT
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
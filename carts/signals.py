@@ -0,0 +1,16 @@
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from .models import Cart
+
+
+@receiver(user_logged_in)
+def remember_cart_quantity_on_login(sender, request, user, **kwargs):
+    """
+    Сохраняет в сессии количество товаров в корзине пользователя при входе,
+    чтобы значок корзины не обращался к базе данных на каждой странице.
+    """
+    if request is None:
+        return
+    cart = Cart.objects.filter(user=user).first()
+    Cart.remember_total_quantity(request, cart.total_quantity if cart else 0)
@@ -1,3 +1,333 @@
-from django.test import TestCase
+import threading
+import time
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from carts.models import CART_QUANTITY_SESSION_KEY, Cart, CartItem
+from orders.models import Order, OrderItem
+from shop import facets
+from shop.models import CategoryShop, ProductFacetCount, ProductShop
+
+
+class AtomicCartMutationTest(TransactionTestCase):
+    """
+    Проверяет, что одновременные добавления одного товара в одну корзину
+    не теряют изменений и не превышают остаток на складе.
+    """
+    THREADS = 8
+    ADDS_PER_THREAD = 5
+    MAX_RETRIES = 1000
+
+    def setUp(self):
+        category = CategoryShop.objects.create(title='Категория', slug='category')
+        self.product = ProductShop.objects.create(
+            title='Товар', slug='product', price=100, quantity=25, category=category
+        )
+        self.cart = Cart.objects.create(session_id='concurrency')
+
+    def hammer(self, operation):
+        """Запускает operation параллельно в нескольких потоках и возвращает результаты."""
+        results = []
+        errors = []
+        results_lock = threading.Lock()
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker():
+            barrier.wait()
+            try:
+                for _ in range(self.ADDS_PER_THREAD):
+                    # SQLite в памяти с общим кэшем сразу сообщает о блокировке
+                    # вместо ожидания — повторяем операцию, как это сделал бы пользователь
+                    for attempt in range(self.MAX_RETRIES):
+                        try:
+                            result = operation()
+                            break
+                        except OperationalError:
+                            if attempt == self.MAX_RETRIES - 1:
+                                raise
+                            time.sleep(0.001)
+                    with results_lock:
+                        results.append(result)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def test_concurrent_add_to_cart_respects_stock(self):
+        results = self.hammer(lambda: CartItem.objects.add_product(Cart.objects.get(pk=self.cart.pk), self.product))
+
+        item = CartItem.objects.get(cart=self.cart, product=self.product)
+        successful = [result for result in results if result is not None]
+        self.assertEqual(item.quantity, self.product.quantity)
+        self.assertEqual(len(successful), self.product.quantity)
+        self.assertEqual(sorted(successful), list(range(1, self.product.quantity + 1)))
+
+        self.cart.refresh_totals()
+        self.assertEqual(self.cart.item_count, 1)
+        self.assertEqual(self.cart.total_quantity, self.product.quantity)
+        self.assertEqual(self.cart.total_price, item.price * item.quantity)
+
+    def test_concurrent_quantity_updates_are_not_lost(self):
+        CartItem.objects.add_product(self.cart, self.product)
+        item = CartItem.objects.get(cart=self.cart)
+        ProductShop.objects.filter(pk=self.product.pk).update(quantity=1000)
+
+        results = self.hammer(lambda: CartItem.objects.change_quantity(Cart.objects.get(pk=self.cart.pk), item.pk, 1))
+
+        self.assertTrue(all(result == CartItem.objects.UPDATED for result in results))
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 1 + self.THREADS * self.ADDS_PER_THREAD)
+        self.cart.refresh_totals()
+        self.assertEqual(self.cart.total_quantity, item.quantity)
+
+    def test_add_to_cart_is_single_statement(self):
+        cart = Cart.objects.get(pk=self.cart.pk)
+        # BEGIN, INSERT ... ON CONFLICT, обновление счётчиков, их чтение и COMMIT
+        with self.assertNumQueries(5):
+            CartItem.objects.add_product(cart, self.product)
+        self.assertEqual(cart.total_quantity, 1)
+
+    def test_readd_with_new_price_updates_total_exactly(self):
+        cart = Cart.objects.get(pk=self.cart.pk)
+        CartItem.objects.add_product(cart, self.product)
+        CartItem.objects.add_product(cart, self.product)
+        ProductShop.objects.filter(pk=self.product.pk).update(price=150)
+        self.product.refresh_from_db()
+
+        self.assertEqual(CartItem.objects.add_product(cart, self.product), 3)
+        self.assertEqual(cart.total_quantity, 3)
+        self.assertEqual(cart.total_price, 450)
+
+        item = CartItem.objects.get(cart=cart)
+        self.assertEqual(CartItem.objects.change_quantity(cart, item.pk, -1), CartItem.objects.UPDATED)
+        self.assertEqual(cart.total_price, 300)
+
+
+class ReconcileCartTotalsTest(TestCase):
+    """Проверяет, что команда reconcile_cart_totals исправляет разошедшиеся счётчики."""
+
+    def setUp(self):
+        category = CategoryShop.objects.create(title='Категория', slug='category')
+        self.product = ProductShop.objects.create(
+            title='Товар', slug='product', price=100, quantity=25, category=category
+        )
+        self.cart = Cart.objects.create(session_id='drifted')
+        self.empty = Cart.objects.create(session_id='empty')
+        CartItem.objects.add_product(self.cart, self.product)
+        CartItem.objects.add_product(self.cart, self.product)
+        Cart.objects.filter(pk=self.cart.pk).update(item_count=5, total_quantity=7, total_price=1)
+        Cart.objects.filter(pk=self.empty.pk).update(item_count=1, total_quantity=1, total_price=100)
+
+    def test_dry_run_only_reports(self):
+        out = StringIO()
+        call_command('reconcile_cart_totals', dry_run=True, stdout=out)
+
+        self.assertIn('Found 2 drifted carts', out.getvalue())
+        self.cart.refresh_totals()
+        self.assertEqual(self.cart.total_quantity, 7)
+
+    def test_repairs_drifted_counters(self):
+        out = StringIO()
+        call_command('reconcile_cart_totals', chunk_size=1, stdout=out)
+
+        self.assertIn('Repaired 2 drifted carts', out.getvalue())
+        self.cart.refresh_totals()
+        self.assertEqual((self.cart.item_count, self.cart.total_quantity, self.cart.total_price), (1, 2, 200))
+        self.empty.refresh_totals()
+        self.assertEqual((self.empty.item_count, self.empty.total_quantity, self.empty.total_price), (0, 0, 0))
+
+        out = StringIO()
+        call_command('reconcile_cart_totals', stdout=out)
+        self.assertIn('Repaired 0 drifted carts', out.getvalue())
+
+
+class CartItemSaveTest(TestCase):
+    """Проверяет изменение счётчиков корзины при сохранении позиции через ORM."""
+
+    def setUp(self):
+        category = CategoryShop.objects.create(title='Категория', slug='category')
+        self.product = ProductShop.objects.create(
+            title='Товар', slug='product', price=100, quantity=25, category=category
+        )
+        self.cart = Cart.objects.create(session_id='first')
+        self.other = Cart.objects.create(session_id='second')
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2, price=100)
+
+    def totals(self, cart):
+        cart.refresh_totals()
+        return cart.item_count, cart.total_quantity, cart.total_price
+
+    def test_save_applies_difference_without_extra_select(self):
+        item = CartItem.objects.select_related('product').get()
+        item.quantity = 5
+        item.price = 90
+        with CaptureQueriesContext(connection) as queries:
+            item.save()
+        # Исходные значения не перечитываются из базы
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT "carts_cartitem"."cart_id", "carts_cartitem"."quantity"')
+        ])
+        self.assertEqual(self.totals(self.cart), (1, 5, 450))
+
+        item.cart = self.other
+        item.save()
+        self.assertEqual(self.totals(self.cart), (0, 0, 0))
+        self.assertEqual(self.totals(self.other), (1, 5, 450))
+
+    def test_deferred_fields_fall_back_to_database(self):
+        item = CartItem.objects.only('pk', 'cart', 'product').get()
+        item.quantity = 3
+        item.price = 100
+        item.save()
+        self.assertEqual(self.totals(self.cart), (1, 3, 300))
+
+
+class CartSessionTest(TestCase):
+    """Проверяет значок корзины из сессии и отсутствие записей при просмотре страниц."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryShop.objects.create(title='Категория', slug='category')
+        cls.product = ProductShop.objects.create(
+            title='Товар', slug='product', price=100, quantity=25, category=category
+        )
+        cls.user = get_user_model().objects.create_user(phone_number='+79990000010', password='password')
+
+    def test_browsing_does_not_create_cart_or_session(self):
+        for url in (reverse('main:index'), reverse('carts:view_cart'), reverse('carts:checkout')):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['total_quantity'], 0)
+
+        self.assertFalse(Cart.objects.exists())
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+    def test_badge_is_read_from_session(self):
+        self.client.post(reverse('carts:add_to_cart', args=[self.product.slug]))
+        self.client.post(reverse('carts:add_to_cart', args=[self.product.slug]))
+        self.assertEqual(self.client.session[CART_QUANTITY_SESSION_KEY], 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('main:index'))
+        self.assertEqual(str(response.context['total_quantity']), '2')
+        self.assertFalse([query for query in queries.captured_queries if 'FROM "cart"' in query['sql']])
+
+    def test_login_remembers_cart_quantity(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.add_product(cart, self.product)
+        CartItem.objects.add_product(cart, self.product)
+        CartItem.objects.add_product(cart, self.product)
+
+        self.client.force_login(self.user)
+
+        self.assertEqual(self.client.session[CART_QUANTITY_SESSION_KEY], 3)
+        response = self.client.get(reverse('carts:checkout'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Cart.objects.count(), 1)
+
+
+class GuestCheckoutTest(TestCase):
+    """Проверяет оформление заказа гостем с созданием учётной записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryShop.objects.create(title='Категория', slug='category')
+        cls.product = ProductShop.objects.create(
+            title='Товар', slug='product', price=100, quantity=5, category=category
+        )
+
+    def test_guest_checkout_creates_account_and_order(self):
+        self.client.post(reverse('carts:add_to_cart', args=[self.product.slug]))
+        self.client.post(reverse('carts:add_to_cart', args=[self.product.slug]))
+
+        response = self.client.post(reverse('carts:checkout'), {
+            'first_name': 'Пётр', 'last_name': 'Петров', 'email': 'guest@example.com',
+            'phone': '+79990000013', 'password': 'Secret-pass-1', 'password2': 'Secret-pass-1',
+            'city': 'Москва', 'street': 'Тверская', 'house': '1',
+            'payment_method': 'cash', 'agree_to_terms': 'on',
+        })
+
+        user = get_user_model().objects.get(phone_number='+79990000013')
+        order = Order.objects.get(user=user)
+        self.assertRedirects(response, reverse('orders:order_detail', args=[order.pk]), fetch_redirect_response=False)
+        self.assertEqual(list(order.items.values_list('product_id', 'quantity')), [(self.product.pk, 2)])
+        cart = Cart.objects.get()
+        self.assertEqual((cart.user_id, cart.session_id, cart.total_quantity), (user.pk, None, 0))
+        self.assertEqual(int(self.client.session['_auth_user_id']), user.pk)
+
+
+class CheckoutStockShortfallTest(TestCase):
+    """Проверяет, что заказ, для которого не хватило товара, откатывается целиком."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryShop.objects.create(title='Категория', slug='category')
+        cls.last_units = ProductShop.objects.create(
+            title='Последний товар', slug='last', price=100, quantity=2, category=category
+        )
+        cls.plenty = ProductShop.objects.create(
+            title='Товар', slug='plenty', price=50, quantity=10, category=category
+        )
+        User = get_user_model()
+        cls.first = User.objects.create_user(phone_number='+79990000011', password='password')
+        cls.second = User.objects.create_user(phone_number='+79990000012', password='password')
+
+    def fill_cart(self, user, *products):
+        cart = Cart.objects.create(user=user)
+        for product in products:
+            CartItem.objects.add_product(cart, product)
+            CartItem.objects.add_product(cart, product)
+        return cart
+
+    def checkout(self, user):
+        self.client.force_login(user)
+        return self.client.post(reverse('carts:checkout'), {
+            'first_name': 'Иван', 'last_name': 'Иванов', 'email': 'buyer@example.com',
+            'phone': str(user.phone_number), 'city': 'Москва', 'street': 'Тверская', 'house': '1',
+            'payment_method': 'cash', 'agree_to_terms': 'on',
+        })
+
+    def snapshot(self):
+        return (
+            dict(ProductShop.objects.values_list('slug', 'quantity')),
+            set(ProductFacetCount.objects.values_list('scope', 'facet', 'value', 'count')),
+        )
+
+    def test_second_order_for_last_units_is_rolled_back(self):
+        self.fill_cart(self.first, self.last_units)
+        # Доступный товар списывается раньше, чем обнаруживается нехватка
+        second_cart = self.fill_cart(self.second, self.plenty, self.last_units)
+
+        self.assertEqual(self.checkout(self.first).status_code, 302)
+        before = self.snapshot()
+        self.assertEqual(before[0], {'last': 0, 'plenty': 10})
+        self.assertEqual(facets.get_counts().in_stock, 1)
+
+        response = self.checkout(self.second)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Недостаточно товара', ' '.join(str(message) for message in get_messages(response.wsgi_request)))
+        self.assertEqual(Order.objects.filter(user=self.second).count(), 0)
+        self.assertEqual(OrderItem.objects.count(), 1)
+        self.assertEqual(self.snapshot(), before)
+        second_cart.refresh_totals()
+        self.assertEqual(second_cart.total_quantity, 4)
@@ -1,9 +1,6 @@
 from typing import Any, Dict, Optional
-import uuid
 
 from django.views.generic import View, TemplateView
-from django.conf import settings
-from yookassa import Configuration, Payment
 from django.urls import reverse_lazy
 from django.http import JsonResponse, HttpRequest, HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
@@ -12,12 +9,17 @@ from django.contrib import messages
 from django.contrib.auth import get_user_model, login
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 
 from orders.forms import OrderForm
 from accounts.models import User
 from carts.models import Cart, CartItem
+from shop import facets, products_json
 from shop.models import ProductShop
 from orders.models import Address, Order, OrderItem
+from orders.payments import PaymentError, start_payment
+from notifications import outbox
 
 User = get_user_model()
 
@@ -30,13 +32,13 @@ class CartView(TemplateView):
     def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
         context = super().get_context_data(**kwargs)
 
-        # Получаем корзину
-        cart = Cart.get_or_create_cart(self.request)
+        # Получаем корзину (не создаём её при простом просмотре)
+        cart = Cart.get_cart(self.request)
 
         context['cart'] = cart
-        context['cart_items'] = cart.items.all()
-        context['total_sum'] = cart.total_price
-        context['total_quantity'] = sum(item.quantity for item in cart.items.all())
+        context['cart_items'] = cart.items.all() if cart else CartItem.objects.none()
+        context['total_sum'] = cart.total_price if cart else 0
+        context['total_quantity'] = cart.total_quantity if cart else 0
         return context
 
 class AddToCartView(View):
@@ -50,29 +52,18 @@ class AddToCartView(View):
     def post(self, request: HttpRequest, product_slug: str) -> HttpResponse:
         product = get_object_or_404(ProductShop, slug=product_slug)
 
-        # Получаем корзину
-        cart = Cart.get_or_create_cart(request)
-
         if product.quantity == 0:
             messages.warning(request, 'Товар закончился.')
             return redirect('carts:view_cart')
 
-        cart_item, item_created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'price': product.sell_price(), 'quantity': 1}
-        )
-        if not item_created and cart_item.quantity < product.quantity:
-            cart_item.quantity += 1
-            cart_item.price = product.sell_price()
-            cart_item.save()
-        elif item_created and product.quantity > 0:
-            cart_item.quantity = 1
-            cart_item.price = product.sell_price()
-            cart_item.save()
-        else:
+        # Получаем корзину (создаётся только при первом добавлении товара)
+        cart = Cart.get_or_create_cart(request)
+
+        # Создание позиции или увеличение количества одним условным запросом
+        if CartItem.objects.add_product(cart, product) is None:
             messages.warning(request, 'Максимальное количество товара достигнуто.')
 
+        Cart.remember_total_quantity(request, cart.total_quantity)
         return redirect('carts:view_cart')
 
 class RemoveFromCartView(View):
@@ -81,20 +72,18 @@ class RemoveFromCartView(View):
     """
     def post(self, request: HttpRequest, item_id: int) -> JsonResponse:
         # Получаем корзину
-        cart = Cart.get_or_create_cart(request)
+        cart = Cart.get_cart(request)
 
-        try:
-            cart_item = cart.items.get(pk=item_id)
-            cart_item.delete()
-        except CartItem.DoesNotExist:
+        if cart is None or not CartItem.objects.remove_item(cart, item_id):
             return JsonResponse({'success': False, 'error': 'Товар не найден.'})
 
         # Возвращаем обновленные данные корзины
         data = {
             'success': True,
             'total_sum': cart.total_price,
-            'total_quantity': sum(item.quantity for item in cart.items.all()),
+            'total_quantity': cart.total_quantity,
         }
+        Cart.remember_total_quantity(request, data['total_quantity'])
         return JsonResponse(data)
 
 class UpdateCartView(View):
@@ -109,30 +98,27 @@ class UpdateCartView(View):
                 return JsonResponse({'success': False, 'error': 'Delta не может быть нулевым.'})
 
             # Получаем корзину
-            cart = Cart.get_or_create_cart(request)
-
-            cart_item = get_object_or_404(cart.items, id=item_id)
-            product = cart_item.product
-            new_quantity = cart_item.quantity + delta
-
-            if new_quantity <= 0:
-                cart_item.delete()
-            elif new_quantity > product.quantity:
+            cart = Cart.get_cart(request)
+            if cart is None:
+                return JsonResponse({'success': False, 'error': 'Товар не найден.'})
+
+            # Изменение количества (или удаление позиции) одним условным запросом
+            result = CartItem.objects.change_quantity(cart, item_id, delta)
+            if result == CartItem.objects.NOT_FOUND:
+                return JsonResponse({'success': False, 'error': 'Товар не найден.'})
+            if result == CartItem.objects.INSUFFICIENT:
                 return JsonResponse({'success': False, 'error': 'Недостаточно товара на складе.'})
-            else:
-                cart_item.quantity = new_quantity
-                cart_item.price = product.sell_price()
-                cart_item.save()
 
             # Возвращаем обновленные данные корзины
             data = {
                 'success': True,
                 'total_sum': cart.total_price,
-                'total_quantity': sum(item.quantity for item in cart.items.all()),
+                'total_quantity': cart.total_quantity,
             }
+            Cart.remember_total_quantity(request, data['total_quantity'])
             return JsonResponse(data)
 
-        except ValueError:
+        except (TypeError, ValueError):
             return JsonResponse({'success': False, 'error': 'Невалидное значение delta.'})
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
@@ -144,16 +130,17 @@ class CheckoutView(SuccessMessageMixin, View):
     success_message = 'Ваш заказ успешно оформлен!'
 
     def get(self, request: HttpRequest) -> HttpResponse:
-        cart = self._get_cart(request)
-        
+        # Просмотр формы не создаёт ни корзину, ни сессию
+        cart = Cart.get_cart(request)
+
         initial_data = self._get_initial_form_data(request, cart)
         form = OrderForm(initial=initial_data)
         
         return render(request, 'carts/checkout.html', {'cart': cart, 'form': form})
 
     def post(self, request: HttpRequest) -> HttpResponse:
-        cart = self._get_cart(request)
-        
+        cart = Cart.get_or_create_cart(request)
+
         if not cart.items.exists():
             messages.error(request, 'Корзина пуста.')
             return redirect('carts:view_cart')
@@ -166,75 +153,44 @@ class CheckoutView(SuccessMessageMixin, View):
                     messages.error(request, f"{field}: {error}")
             return render(request, 'carts/checkout.html', {'cart': cart, 'form': form})
 
+        # Фаза 1: заказ фиксируется в базе данных без сетевых вызовов,
+        # чтобы транзакция (и блокировка записи SQLite) была максимально короткой
         try:
             with transaction.atomic():
-                user = self._create_or_get_user(request, form)
+                user = self._create_or_get_user(request, form, cart)
                 order = self._create_order(request, form, cart, user)
                 self._process_order_items(cart, order)
                 self._clear_cart_and_session(cart, request, user)
-                
-                messages.success(request, self.success_message)
-                if user:
-                    # Если пользователь был создан, нужно его авторизовать
-                    login(request, user)
-                
-                # Если выбрана оплата картой - перенаправляем на оплату
-                if form.cleaned_data['payment_method'] == 'card':
-                    try:
-                        # Конфигурируем ЮКасса
-                        Configuration.configure(settings.YOOKASSA_ACCOUNT_ID, settings.YOOKASSA_SECRET_KEY)
-                        
-                        # Создаем платеж
-                        payment = Payment.create({
-                            "amount": {
-                                "value": str(float(order.total_cost)),
-                                "currency": "RUB"
-                            },
-                            "confirmation": {
-                                "type": "redirect",
-                                "return_url": request.build_absolute_uri(reverse_lazy('orders:payment_success', args=[order.pk]))
-                            },
-                            "capture": True,
-                            "description": f"Оплата заказа #{order.id}",
-                            "metadata": {
-                                "order_id": str(order.id)
-                            }
-                        }, str(uuid.uuid4()))
-                        
-                        # Сохраняем id платежа в заказе (добавим поле в модель потом)
-                        return redirect(payment.confirmation.confirmation_url)
-                    except Exception as payment_error:
-                        messages.error(request, f'Ошибка создания платежа: {str(payment_error)}')
-                        return redirect('carts:checkout')
-                
-                # Иначе обычный переход на страницу заказа
-                return redirect('orders:order_detail', pk=order.pk)
         except Exception as e:
             messages.error(request, f'Ошибка оформления заказа: {str(e)}')
             return render(request, 'carts/checkout.html', {'cart': cart, 'form': form})
 
-    def _get_cart(self, request: HttpRequest) -> Cart:
-        """Получает корзину пользователя."""
-        if request.user.is_authenticated:
-            cart, created = Cart.objects.get_or_create(user=request.user)
-        else:
-            session_id = request.session.session_key
-            if not session_id:
-                messages.error(request, 'Ошибка сессии.')
-                return redirect('carts:view_cart')
-            cart, created = Cart.objects.get_or_create(session_id=session_id)
-        return cart
-
-    def _get_initial_form_data(self, request: HttpRequest, cart: Cart) -> Dict[str, Any]:
+        messages.success(request, self.success_message)
+        if user:
+            # Если пользователь был создан, нужно его авторизовать
+            login(request, user)
+
+        # Фаза 2: платёж создаётся после коммита, с таймаутом и повторами
+        if order.payment_method == 'card':
+            return_url = request.build_absolute_uri(reverse_lazy('orders:payment_success', args=[order.pk]))
+            try:
+                payment = start_payment(order, return_url)
+            except PaymentError as payment_error:
+                messages.error(request, f'Ошибка создания платежа: {str(payment_error)}')
+                return redirect('orders:payment_fail', order_id=order.pk)
+            return redirect(payment.confirmation_url)
+
+        # Иначе обычный переход на страницу заказа
+        return redirect('orders:order_detail', pk=order.pk)
+
+    def _get_initial_form_data(self, request: HttpRequest, cart: Optional[Cart]) -> Dict[str, Any]:
         """Получает начальные данные для формы из профиля пользователя."""
         initial_data = {}
         
         if request.user.is_authenticated:
-            # Получаем адреса пользователя, если они существуют
-            addresses = Address.objects.filter(user=request.user).order_by('-created_at')
-            if addresses.exists():
-                # Если есть адреса, используем последний добавленный
-                address = addresses.first()
+            # Последний использованный адрес пользователя, если он есть
+            address = Address.objects.for_user(request.user).first()
+            if address:
                 initial_data = {
                     'first_name': request.user.first_name,
                     'last_name': request.user.last_name,
@@ -257,7 +213,7 @@ class CheckoutView(SuccessMessageMixin, View):
                 }
         return initial_data
 
-    def _create_or_get_user(self, request: HttpRequest, form: OrderForm) -> Optional[AbstractBaseUser]:
+    def _create_or_get_user(self, request: HttpRequest, form: OrderForm, cart: Cart) -> Optional[AbstractBaseUser]:
         """Создает нового пользователя или возвращает существующего."""
         user = None
         if not request.user.is_authenticated:
@@ -277,13 +233,13 @@ class CheckoutView(SuccessMessageMixin, View):
                     # last_name=last_name,
                     # email=email
                 )
+                outbox.publish_welcome(user.pk)
             else:
                 messages.error(request, 'Пароли не совпадают.')
                 raise ValueError('Passwords do not match')
         
         # Если пользователь авторизован или только что создан, привязываем корзину к нему
         if user:
-            cart = self._get_cart(request)
             cart.user = user
             cart.session_id = None  # Удаляем session_id
             cart.save()
@@ -302,40 +258,17 @@ class CheckoutView(SuccessMessageMixin, View):
             'postal_code': form.cleaned_data['postal_code'],
         }
 
-        # Если пользователь аутентифицирован, связать адрес с пользователем
-        if request.user.is_authenticated:
-            address_data['user'] = request.user
-        elif user:  # Если пользователь был создан
-            address_data['user'] = user
-
-        # Проверяем, существует ли уже такой адрес у пользователя
-        current_user = user or request.user
-        if current_user.is_authenticated:
-            # Ищем существующий адрес с такими же данными
-            existing_address = Address.objects.filter(
-                user=current_user,
-                city=address_data['city'],
-                street=address_data['street'],
-                house=address_data['house'],
-                building=address_data['building'],
-                apartment=address_data['apartment'],
-                postal_code=address_data['postal_code']
-            ).first()
-
-            if existing_address:
-                address = existing_address
-            else:
-                # Создаем новый адрес только если такого еще нет
-                address = Address.objects.create(**address_data)
-        else:
-            # Для неавторизованных пользователей всегда создаем новый адрес
-            address = Address.objects.create(**address_data)
+        # Адрес привязывается к пользователю; такой же адрес повторно не создаётся
+        address = Address.objects.upsert(user or request.user, **address_data)
 
         # Создать заказ
         order = form.save(commit=False)
         order.user = user or request.user
         order.address = address
         order.payment_method = form.cleaned_data['payment_method']
+        if order.payment_method == 'card':
+            # Заказ ждёт оплаты до подтверждения от платёжного сервиса
+            order.status = 'pending_payment'
         
         # Обновляем профиль пользователя (для всех случаев: авторизован или нет)
         current_user = user or request.user
@@ -363,19 +296,57 @@ class CheckoutView(SuccessMessageMixin, View):
         return order
 
     def _process_order_items(self, cart: Cart, order: Order) -> None:
-        """Обрабатывает элементы заказа."""
-        for item in cart.items.all():
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                quantity=item.quantity
-            )
-            item.product.quantity -= item.quantity
-            item.product.save()
+        """
+        Обрабатывает элементы заказа.
+
+        Позиции заказа создаются одним bulk_create, а остаток каждого товара
+        уменьшается условным UPDATE (quantity >= заказанного), поэтому
+        конкурентные заказы не уводят остаток в минус. При нехватке товара
+        выбрасывается ValueError и вся транзакция заказа откатывается.
+        Цены позиций и итоги заказа фиксируются на момент покупки.
+        Сигналы товаров не вызываются; products.json пересобирается один раз.
+        """
+        items = list(cart.items.select_related('product').only(
+            'product_id', 'quantity', 'product__title', 'product__price', 'product__discount',
+            'product__quantity', 'product__category',
+        ))
+
+        order_items = []
+        for item in items:
+            order_item = OrderItem(order=order, product_id=item.product_id, quantity=item.quantity)
+            order_item.set_price_snapshot(item.product)
+            order_items.append(order_item)
+        OrderItem.objects.bulk_create(order_items)
+
+        # Итоги заказа считаются один раз и больше не пересчитываются при чтении
+        order.set_totals(order_items)
+        Order.objects.filter(pk=order.pk).update(
+            updated_at=timezone.now(), **{field: getattr(order, field) for field in Order.TOTAL_FIELDS}
+        )
+        outbox.publish(
+            order.user_id, 'order_created', f'Заказ #{order.pk} оформлен на сумму {order.total} ₽.',
+            order_id=order.pk,
+        )
+
+        for item in items:
+            updated = ProductShop.objects.filter(
+                pk=item.product_id, quantity__gte=item.quantity
+            ).update(quantity=F('quantity') - item.quantity)
+            if not updated:
+                raise ValueError(f'Недостаточно товара "{item.product.title}" на складе.')
+
+        # Групповой UPDATE не вызывает сигналы: счётчик «в наличии» обновляем здесь.
+        # Транзакция уже держит блокировку записи, поэтому прочитанный остаток актуален
+        facets.record_stock_change(
+            (item.product.category_id, item.product.quantity, item.product.quantity - item.quantity)
+            for item in items
+        )
+        products_json.schedule_rebuild()
 
     def _clear_cart_and_session(self, cart: Cart, request: HttpRequest, user: Optional[AbstractBaseUser]) -> None:
         """Очищает корзину и сессию."""
-        cart.items.all().delete()
+        cart.clear()
+        Cart.remember_total_quantity(request, 0)
         
         # Очищаем сессию после оформления заказа для неавторизованных пользователей
         if not user and not request.user.is_authenticated:
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class MainConfig(AppConfig):
     name = 'main'
-    verbose_name = 'Главная'
\ No newline at end of file
+    verbose_name = 'Главная'
+
+    def ready(self):
+        # Настройки SQLite применяются к каждому новому соединению
+        from main.sqlite import configure_connection
+        connection_created.connect(configure_connection, dispatch_uid='main.sqlite.configure_connection')
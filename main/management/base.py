@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class QueueWorkerCommand(BaseCommand):
+    """
+    Базовая команда обработчика очереди: один проход или опрос с ``--watch``.
+
+    Подкласс задаёт ``drain(batch_size)`` (обрабатывает всё накопившееся и
+    возвращает итог) и ``report(result)`` (выводит итог). В режиме ``--watch``
+    итог выводится только если что-то было обработано.
+    """
+    queue_name = 'queue'
+    default_batch_size = 100
+    batch_size_help = 'Number of items per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=self.default_batch_size, help=self.batch_size_help)
+        parser.add_argument('--watch', action='store_true', help='Keep polling the queue instead of exiting when it is empty')
+        parser.add_argument('--interval', type=float, default=1.0, help='Polling interval in seconds for --watch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        if not options['watch']:
+            self.report(self.drain(batch_size))
+            return
+
+        self.stdout.write(f'Watching {self.queue_name} every {options["interval"]}s')
+        try:
+            while True:
+                result = self.drain(batch_size)
+                if self.has_progress(result):
+                    self.report(result)
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped')
+
+    def drain(self, batch_size):
+        raise NotImplementedError('subclasses of QueueWorkerCommand must provide a drain() method')
+
+    def report(self, result):
+        raise NotImplementedError('subclasses of QueueWorkerCommand must provide a report() method')
+
+    def has_progress(self, result):
+        """Проверяет, было ли что-то обработано за проход."""
+        return any(result) if isinstance(result, tuple) else bool(result)
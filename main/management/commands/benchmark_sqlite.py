@@ -0,0 +1,109 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.sqlite import apply_pragmas, get_pragmas
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs a multi-threaded read/write benchmark on a scratch SQLite file, comparing the stock '
+        'configuration (new connection per request, rollback journal, deferred transactions) '
+        'with the tuned profile from SQLITE_PRAGMAS (persistent connections, WAL, BEGIN IMMEDIATE)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Number of worker threads')
+        parser.add_argument('--seconds', type=float, default=3.0, help='Duration of each run')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Share of requests that write')
+        parser.add_argument('--rows', type=int, default=10000, help='Number of rows in the scratch table')
+
+    def handle(self, *args, **options):
+        profiles = (
+            ('stock', {'persistent': False, 'pragmas': {}, 'begin': 'BEGIN'}),
+            ('tuned', {'persistent': True, 'pragmas': get_pragmas(), 'begin': 'BEGIN IMMEDIATE'}),
+        )
+        self.stdout.write(
+            f'{options["threads"]} threads, {options["seconds"]}s per run, '
+            f'{options["write_ratio"]:.0%} writes, {options["rows"]} rows'
+        )
+        self.stdout.write(f'{"profile":<8} {"reads/s":>10} {"writes/s":>10} {"errors":>8}')
+
+        for name, profile in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                self.create_database(path, options['rows'], profile['pragmas'])
+                reads, writes, errors = self.run(path, profile, options)
+            seconds = options['seconds']
+            self.stdout.write(f'{name:<8} {reads / seconds:>10.0f} {writes / seconds:>10.0f} {errors:>8}')
+
+    @staticmethod
+    def connect(path, pragmas):
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        cursor = connection.cursor()
+        apply_pragmas(cursor, pragmas)
+        cursor.close()
+        return connection
+
+    def create_database(self, path, rows, pragmas):
+        connection = self.connect(path, pragmas)
+        connection.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, quantity INTEGER NOT NULL, title TEXT NOT NULL)')
+        connection.executemany(
+            'INSERT INTO item (id, quantity, title) VALUES (?, ?, ?)',
+            ((index, 1000, f'item {index}') for index in range(1, rows + 1)),
+        )
+        connection.close()
+
+    def run(self, path, profile, options):
+        """Запускает потоки на options['seconds'] и возвращает (чтений, записей, ошибок)."""
+        totals = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+        rows = options['rows']
+
+        def request(connection, rng):
+            item_id = rng.randint(1, rows)
+            if rng.random() >= options['write_ratio']:
+                connection.execute('SELECT id, quantity, title FROM item WHERE id BETWEEN ? AND ?', (item_id, item_id + 20)).fetchall()
+                return 'reads'
+            # Чтение и запись в одной транзакции — как при оформлении заказа
+            connection.execute(profile['begin'])
+            try:
+                connection.execute('SELECT quantity FROM item WHERE id = ?', (item_id,)).fetchone()
+                connection.execute('UPDATE item SET quantity = quantity - 1 WHERE id = ?', (item_id,))
+                connection.execute('COMMIT')
+            except sqlite3.OperationalError:
+                connection.execute('ROLLBACK')
+                raise
+            return 'writes'
+
+        def worker(seed):
+            rng = random.Random(seed)
+            counts = {'reads': 0, 'writes': 0, 'errors': 0}
+            connection = self.connect(path, profile['pragmas']) if profile['persistent'] else None
+            while time.monotonic() < deadline:
+                current = connection or self.connect(path, profile['pragmas'])
+                try:
+                    counts[request(current, rng)] += 1
+                except sqlite3.OperationalError:
+                    counts['errors'] += 1
+                finally:
+                    if connection is None:
+                        current.close()
+            if connection is not None:
+                connection.close()
+            with lock:
+                for key, value in counts.items():
+                    totals[key] += value
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return totals['reads'], totals['writes'], totals['errors']
@@ -0,0 +1,73 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from main import querycache, routers
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Cookie, закрепляющая чтение за основной базой после записи
+PIN_COOKIE = 'db_pin'
+DEFAULT_PIN_SECONDS = 5
+
+
+class ReadReplicaMiddleware:
+    """
+    Включает маршрутизацию чтения в базу для чтения на время безопасного запроса.
+
+    Если запрос что-то записал, ответ ставит короткоживущую cookie, и следующие
+    запросы этого пользователя до её истечения читают из основной базы.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        read_alias = routers.get_read_alias()
+        if request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+            read_alias = None
+
+        state, token = routers.activate(read_alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.deactivate(token)
+
+        if state.pinned:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'DATABASE_READ_PIN_SECONDS', DEFAULT_PIN_SECONDS),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class QueryCacheMiddleware:
+    """
+    Включает кэш одинаковых SELECT-запросов на время запроса (см. main/querycache.py).
+
+    При DEBUG ответ получает заголовок ``X-Query-Cache`` со статистикой:
+    сколько запросов сэкономлено, выполнено и сколько раз кэш сбрасывался.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cache, token = querycache.activate()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(cache.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            querycache.deactivate(token)
+
+        if settings.DEBUG:
+            response['X-Query-Cache'] = cache.report()
+            logger.debug('%s %s: query cache %s', request.method, request.path, cache.report())
+        return response
@@ -0,0 +1,111 @@
+"""
+Кэш одинаковых SELECT-запросов в пределах одного HTTP-запроса.
+
+Модель подключается к кэшу через ``RequestCachedQuerySet`` (как менеджер
+``objects`` или базовый класс своего QuerySet). Пока ``QueryCacheMiddleware``
+обрабатывает запрос, повторное выполнение того же SQL с теми же параметрами
+возвращает уже загруженные объекты без обращения к базе.
+
+Любой запрос к базе, кроме чтения, очищает кэш целиком. Внутри
+``transaction.atomic`` кэш не используется: транзакция может быть отменена.
+"""
+from contextvars import ContextVar
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models
+
+_cache = ContextVar('request_query_cache', default=None)
+
+# Запросы, которые ничего не меняют и не сбрасывают кэш
+READ_PREFIXES = ('SELECT', 'SAVEPOINT', 'RELEASE', 'BEGIN', 'PRAGMA', 'EXPLAIN')
+
+
+class QueryCache:
+    """
+    Результаты запросов текущего HTTP-запроса.
+
+    Attributes:
+        results (dict): Ключ запроса -> список загруженных объектов.
+        hits (int): Сколько запросов к базе сэкономлено.
+        misses (int): Сколько запросов выполнено и сохранено.
+        invalidations (int): Сколько раз кэш очищался из-за записи.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def clear(self):
+        if self.results:
+            self.invalidations += 1
+            self.results.clear()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Обёртка ``connection.execute_wrapper``: запись очищает кэш."""
+        if not sql.lstrip()[:9].upper().startswith(READ_PREFIXES):
+            self.clear()
+        return execute(sql, params, many, context)
+
+    def report(self):
+        return f'hits={self.hits}; misses={self.misses}; invalidations={self.invalidations}'
+
+
+def activate():
+    """
+    Включает кэш для текущего запроса.
+
+    Returns:
+        tuple: (QueryCache, токен для ``deactivate``).
+    """
+    cache = QueryCache()
+    return cache, _cache.set(cache)
+
+
+def deactivate(token):
+    """Выключает кэш, включённый ``activate``."""
+    _cache.reset(token)
+
+
+class RequestCachedQuerySet(models.QuerySet):
+    """QuerySet, результаты которого кэшируются на время HTTP-запроса."""
+
+    def _cache_key(self):
+        """Возвращает ключ кэша или None, если результат кэшировать нельзя."""
+        if self._for_write or self.query.select_for_update:
+            return None
+        # Prefetch с собственным QuerySet не отражается в SQL основного запроса
+        if any(not isinstance(lookup, str) for lookup in self._prefetch_related_lookups):
+            return None
+        if connections[self.db].in_atomic_block:
+            return None
+        try:
+            sql, params = self.query.get_compiler(using=self.db).as_sql()
+        except EmptyResultSet:
+            return None
+        key = (self.db, self._iterable_class, sql, tuple(params), self._prefetch_related_lookups)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _fetch_all(self):
+        cache = _cache.get()
+        if cache is None or self._result_cache is not None:
+            return super()._fetch_all()
+
+        key = self._cache_key()
+        if key is None:
+            return super()._fetch_all()
+
+        results = cache.results.get(key)
+        if results is None:
+            super()._fetch_all()
+            cache.results[key] = list(self._result_cache)
+            cache.misses += 1
+        else:
+            self._result_cache = list(results)
+            self._prefetch_done = True
+            cache.hits += 1
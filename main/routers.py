@@ -0,0 +1,85 @@
+"""
+Маршрутизация запросов к базе данных между основной базой и базой для чтения.
+
+Во время GET/HEAD-запроса (см. ``ReadReplicaMiddleware``) запросы на чтение
+уходят в псевдоним ``DATABASE_READ_ALIAS`` — тот же файл SQLite, открытый с
+``PRAGMA query_only``. В режиме WAL такое соединение не конкурирует с
+оформлением заказа за блокировку записи и всегда видит зафиксированные данные.
+
+В основную базу идут:
+
+* все записи;
+* чтения внутри ``transaction.atomic`` — чтобы проверка и запись в одной
+  транзакции видели одни и те же данные;
+* чтения после первой записи в рамках запроса и в течение
+  ``DATABASE_READ_PIN_SECONDS`` после неё (read-your-writes);
+* всё, что выполняется вне HTTP-запроса: команды, воркеры, тесты.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    """
+    Состояние маршрутизации текущего запроса.
+
+    Attributes:
+        read_alias (str | None): Псевдоним базы для чтения или None.
+        pinned (bool): Были записи — дальше читаем из основной базы.
+    """
+    __slots__ = ('read_alias', 'pinned')
+
+    def __init__(self, read_alias=None):
+        self.read_alias = read_alias
+        self.pinned = False
+
+
+def get_read_alias():
+    """Возвращает псевдоним базы для чтения из настроек, если он настроен."""
+    alias = getattr(settings, 'DATABASE_READ_ALIAS', None)
+    return alias if alias in settings.DATABASES else None
+
+
+def activate(read_alias=None):
+    """
+    Начинает маршрутизацию для текущего запроса.
+
+    Returns:
+        tuple: (RoutingState, токен для ``deactivate``).
+    """
+    state = RoutingState(read_alias)
+    return state, _state.set(state)
+
+
+def deactivate(token):
+    """Завершает маршрутизацию, начатую ``activate``."""
+    _state.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Отправляет чтения безопасных запросов в базу для чтения, остальное — в default."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.read_alias is None or state.pinned:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.read_alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Обе базы — один и тот же файл
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,56 @@
+"""
+Настройка соединений SQLite.
+
+Обработчик сигнала ``connection_created`` применяет PRAGMA из настройки
+``SQLITE_PRAGMAS`` к каждому новому соединению SQLite: журнал WAL (читатели
+не блокируют писателя), ``synchronous=NORMAL``, ожидание блокировки вместо
+немедленной ошибки «database is locked», увеличенный кэш страниц и mmap.
+
+Транзакции на запись начинаются с ``BEGIN IMMEDIATE`` (параметр
+``transaction_mode`` в OPTIONS базы данных), поэтому конфликт писателей
+обнаруживается в начале транзакции и обрабатывается busy_timeout, а не
+ошибкой при попытке повысить блокировку посреди транзакции.
+"""
+from django.conf import settings
+
+# Значения по умолчанию, если SQLITE_PRAGMAS не задана
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+
+def get_pragmas():
+    """Возвращает PRAGMA из настроек."""
+    return getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+
+
+def apply_pragmas(cursor, pragmas):
+    """
+    Выполняет PRAGMA на курсоре DB-API.
+
+    Args:
+        cursor: Курсор sqlite3.
+        pragmas (dict): Имя PRAGMA -> значение.
+    """
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    Применяет SQLITE_PRAGMAS к каждому новому соединению SQLite.
+
+    Для баз данных в памяти (тесты) SQLite оставляет свой режим журнала.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    cursor = connection.connection.cursor()
+    try:
+        apply_pragmas(cursor, get_pragmas())
+    finally:
+        cursor.close()
@@ -0,0 +1,31 @@
+import os
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from shop import products_json
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Запускает тесты с products.json во временном каталоге.
+
+    Сигналы каталога планируют пересборку файла после каждой фиксации
+    транзакции (TransactionTestCase), и без подмены пути тесты перезаписывали
+    бы static/products.json.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._products_json_dir = tempfile.TemporaryDirectory()
+        self._products_json_path = override_settings(
+            PRODUCTS_JSON_PATH=os.path.join(self._products_json_dir.name, 'products.json')
+        )
+        self._products_json_path.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        products_json.cancel_scheduled()
+        self._products_json_path.disable()
+        self._products_json_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
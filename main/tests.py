@@ -1,3 +1,138 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main import querycache, routers
+from main.middleware import PIN_COOKIE, ReadReplicaMiddleware
+from shop.models import CategoryShop, ProductShop
+
+
+class PrimaryReplicaRouterTest(SimpleTestCase):
+    """Проверяет выбор базы для чтения и записи."""
+
+    def setUp(self):
+        self.state, token = routers.activate('replica')
+        self.addCleanup(routers.deactivate, token)
+
+    def test_reads_go_to_replica_outside_transaction(self):
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', False):
+            self.assertEqual(router.db_for_read(ProductShop), 'replica')
+
+    def test_reads_inside_atomic_stay_on_primary(self):
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            self.assertEqual(router.db_for_read(ProductShop), DEFAULT_DB_ALIAS)
+
+    def test_write_pins_following_reads_to_primary(self):
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', False):
+            self.assertEqual(router.db_for_write(ProductShop), DEFAULT_DB_ALIAS)
+            self.assertTrue(self.state.pinned)
+            self.assertEqual(router.db_for_read(ProductShop), DEFAULT_DB_ALIAS)
+
+    def test_no_request_context_uses_primary(self):
+        token = routers._state.set(None)
+        self.addCleanup(routers._state.reset, token)
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', False):
+            self.assertEqual(router.db_for_read(ProductShop), DEFAULT_DB_ALIAS)
+
+    def test_migrations_only_on_primary(self):
+        self.assertFalse(router.allow_migrate('replica', 'shop'))
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'shop'))
+
+
+@override_settings(DATABASE_READ_ALIAS='replica')
+class ReadReplicaMiddlewareTest(SimpleTestCase):
+    """Проверяет включение базы для чтения и закрепление после записи."""
+
+    def run_request(self, request, write=False):
+        seen = {}
+
+        def view(request):
+            seen['read_alias'] = routers._state.get().read_alias
+            if write:
+                router.db_for_write(ProductShop)
+            return HttpResponse()
+
+        return ReadReplicaMiddleware(view)(request), seen
+
+    def test_safe_request_reads_from_replica(self):
+        response, seen = self.run_request(RequestFactory().get('/'))
+        self.assertEqual(seen['read_alias'], 'replica')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertIsNone(routers._state.get())
+
+    def test_unsafe_request_uses_primary_and_pins(self):
+        response, seen = self.run_request(RequestFactory().post('/'), write=True)
+        self.assertIsNone(seen['read_alias'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_pinned_client_reads_from_primary(self):
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        _, seen = self.run_request(request)
+        self.assertIsNone(seen['read_alias'])
+
+
+class RequestQueryCacheTest(TransactionTestCase):
+    """
+    Проверяет кэш одинаковых SELECT-запросов в пределах запроса.
+
+    TransactionTestCase: внутри transaction.atomic (TestCase) кэш отключён.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.category = CategoryShop.objects.create(title='Категория', slug='category')
+        cache, token = querycache.activate()
+        self.cache = cache
+        self.addCleanup(querycache.deactivate, token)
+
+    def test_identical_select_runs_once(self):
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as queries:
+            first = CategoryShop.objects.get(slug='category')
+            second = CategoryShop.objects.get(slug='category')
+        self.assertEqual(len(queries), 1)
+        self.assertIs(first, second)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_write_invalidates_cache(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        with connection.execute_wrapper(self.cache.execute_wrapper):
+            self.assertEqual(CategoryShop.objects.get(slug='category').title, 'Категория')
+            CategoryShop.objects.filter(pk=self.category.pk).update(title='Новая')
+            self.assertEqual(CategoryShop.objects.get(slug='category').title, 'Новая')
+        self.assertEqual(self.cache.hits, 0)
+        self.assertEqual(self.cache.invalidations, 1)
+
+    @override_settings(DEBUG=True)
+    def test_middleware_reports_saved_queries(self):
+        response = self.client.get(reverse('shop:category', args=['category']))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['X-Query-Cache'], r'^hits=\d+; misses=\d+; invalidations=0$')
+
+
+class QueueWorkerCommandTest(TestCase):
+    """Проверяет общий цикл команд-обработчиков очередей."""
+
+    def test_single_pass_reports_result(self):
+        out = StringIO()
+        call_command('process_payment_events', stdout=out)
+        self.assertIn('Processed 0 payment events', out.getvalue())
+
+    def test_watch_polls_until_interrupted(self):
+        out = StringIO()
+        with mock.patch('main.management.base.time.sleep', side_effect=[None, KeyboardInterrupt]) as sleep:
+            call_command('send_notifications', watch=True, interval=0.5, stdout=out)
+
+        self.assertEqual(sleep.call_count, 2)
+        sleep.assert_called_with(0.5)
+        output = out.getvalue()
+        self.assertIn('Watching notification outbox every 0.5s', output)
+        # Пустая очередь в режиме --watch ничего не выводит
+        self.assertNotIn('Delivered', output)
+        self.assertTrue(output.rstrip().endswith('Stopped'))
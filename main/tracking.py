@@ -0,0 +1,33 @@
+class LoadedStateMixin:
+    """
+    Запоминает значения полей ``tracked_fields`` в момент загрузки из базы данных.
+
+    Позволяет узнать, изменилось ли поле, без повторного SELECT перед
+    сохранением. Отложенные поля (only/defer) не отслеживаются, чтобы их
+    чтение не вызывало дополнительный запрос. После сохранения текущие
+    значения становятся новыми исходными.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_state()
+        return instance
+
+    def _remember_loaded_state(self):
+        values = self.__dict__
+        self._loaded_state = {name: values[name] for name in self.tracked_fields if name in values}
+
+    def get_loaded_value(self, name, default=None):
+        """Возвращает значение поля на момент загрузки (или последнего сохранения)."""
+        return getattr(self, '_loaded_state', {}).get(name, default)
+
+    def has_changed(self, name):
+        """Проверяет, изменилось ли отслеживаемое поле с момента загрузки."""
+        loaded_state = getattr(self, '_loaded_state', {})
+        return name in loaded_state and name in self.__dict__ and loaded_state[name] != self.__dict__[name]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_loaded_state()
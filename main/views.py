@@ -1,5 +1,6 @@
 from django.views.generic import TemplateView
-from shop.models import ProductShop, CategoryShop
+from shop import categories
+from shop.models import ProductShop
 from main.models import Carousel
 from shop.mixins import SearchMixin
 
@@ -15,12 +16,12 @@ class IndexView(TemplateView):
         
         # Базовые данные для главной страницы (всегда отображаются)
         context.update({
-            'categories': CategoryShop.objects.all(),
+            'categories': categories.get_tree().categories,
             'carousels': Carousel.objects.prefetch_related('images').all(),
             
             # Используем .exists() один раз для оптимизации
-            'bestsellers': ProductShop.objects.filter(is_bestseller=True)[:8],
-            'promos': ProductShop.objects.filter(is_promo=True)[:8],
+            'bestsellers': ProductShop.objects.filter(is_bestseller=True).cards(self.request.user)[:8],
+            'promos': ProductShop.objects.filter(is_promo=True).cards(self.request.user)[:8],
             
             # Поисковый запрос для поля input (пустой по умолчанию)
             'search_query': '',
@@ -36,6 +37,6 @@ class IndexView(TemplateView):
             
             # Получаем результаты и добавляем их в контекст
             context['search_query'] = search_query
-            context['search_results'] = search_mixin.get_search_results()[:12] 
+            context['search_results'] = search_mixin.get_search_results().cards(self.request.user)[:12]
         
         return context
\ No newline at end of file
@@ -45,10 +45,13 @@ INSTALLED_APPS = [
     'orders.apps.OrdersConfig',
     'about.apps.AboutConfig',
     'legal.apps.LegalConfig',
+    'notifications.apps.NotificationsConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'main.middleware.ReadReplicaMiddleware',
+    'main.middleware.QueryCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -85,7 +88,53 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Постоянные соединения вместо открытия файла на каждый запрос
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Транзакции сразу берут блокировку записи (BEGIN IMMEDIATE)
+            'transaction_mode': 'IMMEDIATE',
+            # Ожидание блокировки в секундах вместо ошибки "database is locked"
+            'timeout': 5,
+        },
+    },
+    # Тот же файл, открытый только для чтения: сюда уходят запросы на чтение
+    # из GET/HEAD-запросов (см. main/routers.py)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': 'PRAGMA query_only = ON',
+            'timeout': 5,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['main.routers.PrimaryReplicaRouter']
+
+# Псевдоним базы для чтения; None — всё через default
+DATABASE_READ_ALIAS = 'replica'
+
+# Сколько секунд после записи запросы пользователя читают из основной базы
+DATABASE_READ_PIN_SECONDS = 5
+
+# Границы ценовых диапазонов для счётчиков фасетов каталога (см. shop/facets.py).
+# После изменения выполните rebuild_facet_counts
+PRODUCT_PRICE_BANDS = (1000, 5000, 10000, 50000)
+
+# PRAGMA для каждого нового соединения SQLite (см. main/sqlite.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',       # читатели не блокируют писателя
+    'synchronous': 'NORMAL',     # в режиме WAL безопасно и без fsync на каждый коммит
+    'busy_timeout': 5000,        # миллисекунды ожидания блокировки
+    'cache_size': -64000,        # ~64 МБ кэша страниц на соединение
+    'mmap_size': 268435456,      # 256 МБ файла читаются через mmap
+    'temp_store': 'MEMORY',
 }
 
 
@@ -137,6 +186,9 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'accounts.User'
+
+# Тесты пишут products.json во временный каталог (см. main/test_runner.py)
+TEST_RUNNER = 'main.test_runner.TestRunner'
 AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
 
 CSRF_TRUSTED_ORIGINS = [
@@ -157,3 +209,30 @@ CSRF_TRUSTED_ORIGINS = [
 YOOKASSA_ACCOUNT_ID = '1326697'
 YOOKASSA_SECRET_KEY = 'test_hSCE28Ws0QWV1E8n_gCWQVbZRYg0buXbW-AUtYUBXb8'
 YOOKASSA_TEST_MODE = True
+
+# Платёжный шлюз; для разработки без сети — 'orders.payments.LocalGateway'.
+PAYMENT_GATEWAY = 'orders.payments.YooKassaGateway'
+# Таймаут соединения и чтения одного запроса к платёжному сервису (в секундах).
+PAYMENT_TIMEOUT_SECONDS = 10
+# Количество попыток создания платежа (с тем же ключом идемпотентности).
+PAYMENT_MAX_ATTEMPTS = 3
+
+# Транспорт доставки уведомлений покупателям (console, file или email).
+NOTIFICATIONS_TRANSPORT = 'notifications.transports.ConsoleTransport'
+# Количество попыток доставки одного уведомления.
+NOTIFICATIONS_MAX_ATTEMPTS = 5
+# Через сколько секунд захват уведомления остановившимся обработчиком считается брошенным.
+NOTIFICATIONS_CLAIM_TIMEOUT_SECONDS = 300
+
+# Отставание отметки сводок продаж от текущего времени (в секундах), чтобы
+# изменения из незафиксированных транзакций не были пропущены.
+SALES_ROLLUP_LAG_SECONDS = 60
+
+# Файл каталога для внешних клиентов, пересобираемый после изменений каталога.
+PRODUCTS_JSON_PATH = BASE_DIR / 'static' / 'products.json'
+
+# Окно дребезга (в секундах) для пересборки products.json: каждое изменение
+# откладывает пересборку на это время. 0 — пересобирать сразу после коммита транзакции.
+PRODUCTS_JSON_DEBOUNCE_SECONDS = 2
+# Наибольшая задержка пересборки (в секундах) от первого несобранного изменения.
+PRODUCTS_JSON_MAX_WAIT_SECONDS = 10
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Notification
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'kind', 'created_at', 'sent_at')  # очередь уведомлений
+    list_filter = ('kind', 'sent_at')
+    search_fields = ('message',)
+    readonly_fields = ('created_at', 'sent_at')
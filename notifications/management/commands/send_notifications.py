@@ -0,0 +1,18 @@
+from main.management.base import QueueWorkerCommand
+from notifications import worker
+
+
+class Command(QueueWorkerCommand):
+    help = 'Delivers queued customer notifications in batches through the configured transport'
+    queue_name = 'notification outbox'
+    default_batch_size = worker.DEFAULT_BATCH_SIZE
+    batch_size_help = 'Number of notifications per batch'
+
+    def drain(self, batch_size):
+        return worker.drain(batch_size)
+
+    def report(self, result):
+        delivered, failed = result
+        self.stdout.write(self.style.SUCCESS(f'Delivered {delivered} notifications'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Failed to deliver {failed} notifications'))
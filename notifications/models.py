@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class Notification(models.Model):
+    """
+    Уведомление покупателю в исходящей очереди (outbox).
+
+    Запись создаётся в той же транзакции, что и изменение, о котором нужно
+    сообщить; доставка выполняется отдельно, вне запроса.
+
+    Attributes:
+        user (ForeignKey): Получатель уведомления.
+        kind (CharField): Тип уведомления (например, 'order_status').
+        message (TextField): Текст уведомления.
+        payload (JSONField): Дополнительные данные для транспорта доставки.
+        created_at (DateTimeField): Дата создания.
+        sent_at (DateTimeField): Дата доставки (NULL — ещё не доставлено).
+        claimed_at (DateTimeField): Когда обработчик взял уведомление в доставку
+            (NULL — свободно).
+        attempts (PositiveSmallIntegerField): Количество неудачных попыток доставки.
+        last_error (TextField): Текст последней ошибки доставки.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications', verbose_name='Получатель')
+    kind = models.CharField(max_length=50, verbose_name='Тип уведомления')
+    message = models.TextField(verbose_name='Текст')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Данные')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата доставки')
+    claimed_at = models.DateTimeField(null=True, blank=True, verbose_name='Взято в доставку')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток доставки')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+
+    def __str__(self):
+        return f"{self.kind} для {self.user_id}"
+
+    class Meta:
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+        indexes = [
+            # Очередь недоставленных уведомлений выбирается по этому индексу
+            models.Index(fields=['sent_at', 'id'], name='notification_queue_idx'),
+        ]
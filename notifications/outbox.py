@@ -0,0 +1,41 @@
+"""
+Запись уведомлений в исходящую очередь.
+
+Функции только вставляют строки в таблицу Notification и не выполняют
+доставку, поэтому их можно вызывать внутри транзакции изменения: если
+транзакция откатится, уведомление не будет отправлено.
+"""
+from notifications.models import Notification
+
+WELCOME_MESSAGE = 'Добро пожаловать в GlobalShop! Регистрация прошла успешно.'
+
+
+def publish(user_id, kind, message, **payload):
+    """
+    Добавляет одно уведомление в очередь.
+
+    Args:
+        user_id (int): ID получателя.
+        kind (str): Тип уведомления.
+        message (str): Текст уведомления.
+        **payload: Дополнительные данные для транспорта.
+
+    Returns:
+        Notification: Созданная запись.
+    """
+    return Notification.objects.create(user_id=user_id, kind=kind, message=str(message), payload=payload)
+
+
+def publish_many(notifications):
+    """
+    Добавляет несколько уведомлений одним запросом.
+
+    Args:
+        notifications (Iterable[Notification]): Несохранённые уведомления.
+    """
+    return Notification.objects.bulk_create(list(notifications))
+
+
+def publish_welcome(user_id):
+    """Добавляет приветственное уведомление для нового пользователя."""
+    return publish(user_id, 'welcome', WELCOME_MESSAGE)
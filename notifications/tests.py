@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from notifications import outbox, worker
+from notifications.models import Notification
+from notifications.transports import BaseTransport, DeliveryError, FileTransport
+
+User = get_user_model()
+
+
+class FailingTransport(BaseTransport):
+    def send(self, notification):
+        raise DeliveryError('transport unavailable')
+
+
+@override_settings(NOTIFICATIONS_MAX_ATTEMPTS=2)
+class NotificationWorkerTest(TestCase):
+    """Проверяет доставку уведомлений из исходящей очереди."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+79990000010', password='password')
+        handle, self.path = tempfile.mkstemp(suffix='.log')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def test_file_transport_delivers_once(self):
+        outbox.publish_welcome(self.user.pk)
+        outbox.publish(self.user.pk, 'order_created', 'Заказ #1 оформлен.', order_id=1)
+
+        self.assertEqual(worker.drain(transport=FileTransport(self.path)), (2, 0))
+        self.assertEqual(worker.drain(transport=FileTransport(self.path)), (0, 0))
+
+        with open(self.path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line['kind'] for line in lines], ['welcome', 'order_created'])
+        self.assertEqual(lines[1]['payload'], {'order_id': 1})
+        self.assertFalse(Notification.objects.filter(sent_at__isnull=True).exists())
+
+    def test_failed_delivery_is_retried_until_max_attempts(self):
+        notification = outbox.publish_welcome(self.user.pk)
+
+        self.assertEqual(worker.drain(transport=FailingTransport()), (0, 1))
+        self.assertEqual(worker.drain(transport=FailingTransport()), (0, 1))
+        self.assertEqual(worker.drain(transport=FailingTransport()), (0, 0))
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.attempts, 2)
+        self.assertEqual(notification.last_error, 'transport unavailable')
+        self.assertIsNone(notification.sent_at)
+
+    def test_claimed_notifications_are_not_delivered_twice(self):
+        notification = outbox.publish_welcome(self.user.pk)
+        # Другой обработчик уже взял уведомление в доставку
+        self.assertEqual(worker.claim_batch(), [notification.pk])
+        self.assertEqual(worker.claim_batch(), [])
+
+        self.assertEqual(worker.drain(transport=FileTransport(self.path)), (0, 0))
+        self.assertEqual(os.path.getsize(self.path), 0)
+
+    @override_settings(NOTIFICATIONS_CLAIM_TIMEOUT_SECONDS=60)
+    def test_abandoned_claim_is_taken_over(self):
+        notification = outbox.publish_welcome(self.user.pk)
+        Notification.objects.filter(pk=notification.pk).update(claimed_at=timezone.now() - timedelta(minutes=5))
+
+        self.assertEqual(worker.drain(transport=FileTransport(self.path)), (1, 0))
+        notification.refresh_from_db()
+        self.assertIsNotNone(notification.sent_at)
+
+    def test_failed_delivery_releases_claim(self):
+        notification = outbox.publish_welcome(self.user.pk)
+        worker.drain(transport=FailingTransport())
+
+        notification.refresh_from_db()
+        self.assertIsNone(notification.claimed_at)
+        self.assertEqual(worker.drain(transport=FileTransport(self.path)), (1, 0))
+
+    def test_opted_out_user_is_skipped(self):
+        User.objects.filter(pk=self.user.pk).update(receive_notifications=False)
+        outbox.publish_welcome(self.user.pk)
+
+        self.assertEqual(worker.drain(transport=FailingTransport()), (1, 0))
+        self.assertEqual(os.path.getsize(self.path), 0)
@@ -0,0 +1,83 @@
+"""
+Транспорты доставки уведомлений.
+
+Транспорт выбирается настройкой ``NOTIFICATIONS_TRANSPORT``. ``ConsoleTransport``
+и ``FileTransport`` не обращаются в сеть и подходят для разработки и тестов,
+``EmailTransport`` отправляет письмо на email покупателя.
+"""
+import json
+import sys
+import threading
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.utils.module_loading import import_string
+
+DEFAULT_TRANSPORT = 'notifications.transports.ConsoleTransport'
+
+
+class DeliveryError(Exception):
+    """Уведомление не удалось доставить (доставка будет повторена)."""
+
+
+class BaseTransport:
+    """Базовый класс транспорта доставки."""
+
+    def send(self, notification):
+        """
+        Доставляет одно уведомление.
+
+        Args:
+            notification (Notification): Уведомление с загруженным получателем.
+
+        Raises:
+            DeliveryError: Если доставка не удалась.
+        """
+        raise NotImplementedError
+
+
+class ConsoleTransport(BaseTransport):
+    """Выводит уведомления в stdout."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, notification):
+        self.stream.write(f'[{notification.kind}] {notification.user.phone_number}: {notification.message}\n')
+
+
+class FileTransport(BaseTransport):
+    """Дописывает уведомления в файл ``NOTIFICATIONS_FILE_PATH`` (по одному JSON на строку)."""
+
+    _lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = path or getattr(settings, 'NOTIFICATIONS_FILE_PATH', settings.BASE_DIR / 'notifications.log')
+
+    def send(self, notification):
+        line = json.dumps({
+            'id': notification.pk,
+            'user_id': notification.user_id,
+            'kind': notification.kind,
+            'message': notification.message,
+            'payload': notification.payload,
+        }, ensure_ascii=False)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+class EmailTransport(BaseTransport):
+    """Отправляет уведомление письмом на email покупателя."""
+
+    def send(self, notification):
+        if not notification.user.email:
+            raise DeliveryError('У получателя не указан email.')
+        try:
+            send_mail('GlobalShop', notification.message, None, [notification.user.email])
+        except Exception as e:
+            raise DeliveryError(str(e)) from e
+
+
+def get_transport():
+    """Возвращает экземпляр транспорта из настройки NOTIFICATIONS_TRANSPORT."""
+    return import_string(getattr(settings, 'NOTIFICATIONS_TRANSPORT', DEFAULT_TRANSPORT))()
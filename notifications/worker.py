@@ -0,0 +1,133 @@
+"""
+Доставка уведомлений из исходящей очереди.
+
+Пачка уведомлений сначала захватывается одним условным
+``UPDATE ... SET claimed_at ... WHERE claimed_at IS NULL ... RETURNING id``,
+поэтому несколько одновременно запущенных обработчиков не доставят одно
+уведомление дважды. Захваченные уведомления доставляются транспортом вне
+транзакции, после чего результаты фиксируются короткой транзакцией из
+групповых UPDATE, а неудачные освобождаются. Захват старше
+``NOTIFICATIONS_CLAIM_TIMEOUT_SECONDS`` считается брошенным (обработчик
+остановился во время доставки) и может быть захвачен снова.
+
+Неудачная доставка повторяется до
+``NOTIFICATIONS_MAX_ATTEMPTS`` раз; уведомления для пользователей,
+отключивших рассылку (``User.receive_notifications``), помечаются
+обработанными без доставки.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from notifications.models import Notification
+from notifications.transports import get_transport
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_CLAIM_TIMEOUT_SECONDS = 300
+
+
+def get_max_attempts():
+    return getattr(settings, 'NOTIFICATIONS_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+
+
+def get_claim_timeout():
+    return timedelta(seconds=getattr(settings, 'NOTIFICATIONS_CLAIM_TIMEOUT_SECONDS', DEFAULT_CLAIM_TIMEOUT_SECONDS))
+
+
+def claim_batch(batch_size=DEFAULT_BATCH_SIZE, after_pk=0):
+    """
+    Захватывает пачку недоставленных уведомлений одним условным UPDATE.
+
+    Условие захвата повторяется во внешнем WHERE: строку, которую между
+    выбором и обновлением успел захватить другой обработчик, UPDATE пропустит.
+
+    Returns:
+        list[int]: Идентификаторы захваченных уведомлений по возрастанию.
+    """
+    now = timezone.now()
+    table = connection.ops.quote_name(Notification._meta.db_table)
+    claimable = '(claimed_at IS NULL OR claimed_at < %s)'
+    stale = connection.ops.adapt_datetimefield_value(now - get_claim_timeout())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET claimed_at = %s '
+            f'WHERE id IN ('
+            f'SELECT id FROM {table} WHERE sent_at IS NULL AND attempts < %s AND id > %s AND {claimable} '
+            f'ORDER BY sent_at, id LIMIT %s'
+            f') AND sent_at IS NULL AND {claimable} '
+            f'RETURNING id',
+            [connection.ops.adapt_datetimefield_value(now), get_max_attempts(), after_pk, stale, batch_size, stale],
+        )
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def deliver_batch(batch_size=DEFAULT_BATCH_SIZE, transport=None, after_pk=0):
+    """
+    Захватывает и доставляет одну пачку недоставленных уведомлений.
+
+    Args:
+        batch_size (int): Размер пачки.
+        transport (BaseTransport, optional): Транспорт (по умолчанию из настроек).
+        after_pk (int): Начать с уведомлений с pk больше указанного.
+
+    Returns:
+        tuple: (обработано, доставлено, ошибок, последний pk пачки).
+    """
+    transport = transport or get_transport()
+    claimed = claim_batch(batch_size, after_pk)
+    if not claimed:
+        return 0, 0, 0, after_pk
+
+    notifications = list(
+        Notification.objects.filter(pk__in=claimed)
+        .select_related('user')
+        .only('pk', 'user_id', 'kind', 'message', 'payload',
+              'user__phone_number', 'user__email', 'user__receive_notifications')
+        .order_by('pk')
+    )
+
+    done, errors = [], {}
+    for notification in notifications:
+        if not notification.user.receive_notifications:
+            done.append(notification.pk)
+            continue
+        try:
+            transport.send(notification)
+        except Exception as e:
+            errors[notification.pk] = str(e) or e.__class__.__name__
+        else:
+            done.append(notification.pk)
+
+    with transaction.atomic():
+        if done:
+            Notification.objects.filter(pk__in=done).update(sent_at=timezone.now(), last_error='')
+        for pk, error in errors.items():
+            Notification.objects.filter(pk=pk).update(
+                attempts=F('attempts') + 1, last_error=error, claimed_at=None
+            )
+
+    return len(claimed), len(done), len(errors), claimed[-1]
+
+
+def drain(batch_size=DEFAULT_BATCH_SIZE, transport=None):
+    """
+    Доставляет все накопившиеся уведомления.
+
+    Неудачные уведомления в этом проходе не повторяются — только в следующем.
+
+    Returns:
+        tuple: (доставлено, ошибок).
+    """
+    transport = transport or get_transport()
+    delivered = failed = 0
+    last_pk = 0
+    while True:
+        processed, done, errors, last_pk = deliver_batch(batch_size, transport, after_pk=last_pk)
+        if not processed:
+            return delivered, failed
+        delivered += done
+        failed += errors
@@ -1,19 +1,82 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from django.db.models import Sum
+
+from . import export
+from .models import DailySalesRollup, Order, OrderItem, PaymentEvent
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = (
-        'id', 'user', 'address', 'status', 'created_at', 'total_cost'
+        'id', 'user', 'address', 'status', 'created_at', 'total'
     )  # отображаем ключевую информацию заказа
     list_filter = ('status', 'created_at')  # фильтры по статусу и дате создания
     search_fields = ('user__username',)  # расширенный поиск
-    readonly_fields = ('total_cost',)  # общее значение заказа нельзя менять вручную
+    readonly_fields = ('subtotal', 'discount_total', 'total')  # итоги заказа нельзя менять вручную
+    list_select_related = ('user', 'address')
+    actions = ('export_csv', 'export_ndjson')
+
+    @admin.action(description='Выгрузить выбранные заказы в CSV')
+    def export_csv(self, request, queryset):
+        return export.streaming_response(export.iter_csv(queryset), 'csv', 'orders')
+
+    @admin.action(description='Выгрузить выбранные заказы в NDJSON')
+    def export_ndjson(self, request, queryset):
+        return export.streaming_response(export.iter_ndjson(queryset), 'ndjson', 'orders')
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = (
-        'id', 'order', 'product', 'quantity'
+        'id', 'order', 'product', 'quantity', 'unit_price'
     )  # показываем элементы заказа
     list_filter = ('order',)  # можем фильтровать по заказу
     search_fields = ('order__id', 'product__name')  # поиск по номеру заказа и названию товара
+    actions = ('export_csv',)
+
+    @admin.action(description='Выгрузить выбранные позиции в CSV')
+    def export_csv(self, request, queryset):
+        return export.streaming_response(export.iter_items_csv(queryset), 'csv', 'order_items')
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'provider', 'event', 'payment_id', 'order_id', 'received_at', 'processed_at'
+    )  # очередь уведомлений платёжного сервиса
+    list_filter = ('provider', 'event', 'processed_at')
+    search_fields = ('payment_id', 'event_key')
+    readonly_fields = ('provider', 'event_key', 'event', 'payment_id', 'order_id', 'payload', 'received_at', 'processed_at')
+
+
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    """
+    Отчёт о продажах. Читает только таблицу сводок, которую обновляет
+    команда update_sales_rollups, поэтому не зависит от количества заказов.
+    """
+    change_list_template = 'admin/orders/dailysalesrollup/change_list.html'
+    list_display = ('day', 'category', 'payment_method', 'status', 'orders', 'units', 'revenue')
+    list_filter = ('status', 'payment_method', 'category')
+    list_select_related = ('category',)
+    date_hierarchy = 'day'
+    ordering = ('-day',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        try:
+            queryset = response.context_data['cl'].queryset
+        except (AttributeError, KeyError):
+            return response
+
+        # Итоги по отфильтрованным строкам сводки
+        response.context_data['sales_summary'] = queryset.aggregate(units=Sum('units'), revenue=Sum('revenue'))
+        response.context_data['sales_by_category'] = (
+            queryset.values('category__title')
+            .annotate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('-revenue')
+        )
+        return response
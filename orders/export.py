@@ -0,0 +1,137 @@
+"""
+Потоковая выгрузка заказов в CSV и NDJSON.
+
+Заказы читаются через ``QuerySet.iterator(chunk_size=...)``, позиции
+подгружаются prefetch-запросом на каждую пачку, а результат отдаётся
+построчно генератором. Поэтому потребление памяти не зависит от количества
+заказов: и в ``StreamingHttpResponse``, и в команде export_orders.
+"""
+import csv
+import json
+
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+
+DEFAULT_CHUNK_SIZE = 500
+
+ORDER_FIELDS = (
+    'id', 'created_at', 'status', 'payment_method', 'subtotal', 'discount_total', 'total',
+    'user__phone_number', 'user__email',
+    'address__city', 'address__street', 'address__house', 'address__building',
+    'address__apartment', 'address__postal_code',
+)
+ITEM_FIELDS = ('order_id', 'product_id', 'product__title', 'quantity', 'price', 'discount', 'unit_price')
+
+CSV_HEADER = (
+    'order_id', 'created_at', 'status', 'payment_method', 'subtotal', 'discount_total', 'total',
+    'phone', 'email', 'address',
+    'product_id', 'product', 'quantity', 'price', 'discount', 'unit_price',
+)
+ITEM_CSV_HEADER = ('order_id', 'product_id', 'product', 'quantity', 'price', 'discount', 'unit_price')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def export_queryset(queryset):
+    """
+    Готовит QuerySet заказов к выгрузке: только нужные столбцы, покупатель,
+    адрес и позиции заказа (по одному запросу на пачку).
+    """
+    items = OrderItem.objects.select_related('product').only(*ITEM_FIELDS).order_by('pk')
+    return (
+        queryset.select_related('user', 'address')
+        .only(*ORDER_FIELDS)
+        .prefetch_related(Prefetch('items', queryset=items))
+        .order_by('pk')
+    )
+
+
+def _format_address(order):
+    address = order.address
+    if address is None:
+        return ''
+    return ', '.join(
+        str(value) for value in (
+            address.postal_code, address.city, address.street, address.house,
+            address.building, address.apartment,
+        ) if value
+    )
+
+
+def _order_values(order):
+    return [
+        order.pk,
+        timezone.localtime(order.created_at).isoformat(),
+        order.status,
+        order.payment_method,
+        order.subtotal,
+        order.discount_total,
+        order.total,
+        str(order.user.phone_number),
+        order.user.email or '',
+        _format_address(order),
+    ]
+
+
+def _item_values(item):
+    return [item.product_id, item.product.title, item.quantity, item.price, item.discount, item.unit_price]
+
+
+def iter_csv(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Выдаёт строки CSV: по строке на каждую позицию заказа (заказ без позиций — одна строка).
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order in export_queryset(queryset).iterator(chunk_size=chunk_size):
+        order_values = _order_values(order)
+        items = order.items.all()
+        if not items:
+            yield writer.writerow(order_values + [''] * 6)
+        for item in items:
+            yield writer.writerow(order_values + _item_values(item))
+
+
+def iter_ndjson(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Выдаёт строки NDJSON: по JSON-объекту с вложенными позициями на заказ."""
+    keys = CSV_HEADER[:10]
+    item_keys = ITEM_CSV_HEADER[1:]
+    for order in export_queryset(queryset).iterator(chunk_size=chunk_size):
+        record = dict(zip(keys, _order_values(order)))
+        record['items'] = [dict(zip(item_keys, _item_values(item))) for item in order.items.all()]
+        yield json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+
+def iter_items_csv(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Выдаёт строки CSV по позициям заказов."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ITEM_CSV_HEADER)
+    items = queryset.select_related('product').only(*ITEM_FIELDS).order_by('pk')
+    for item in items.iterator(chunk_size=chunk_size):
+        yield writer.writerow([item.order_id] + _item_values(item))
+
+
+EXPORTERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+}
+
+
+def streaming_response(rows, export_format, filename):
+    """Оборачивает генератор строк в StreamingHttpResponse с заголовком вложения."""
+    response = StreamingHttpResponse(rows, content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -1,4 +1,7 @@
+from datetime import datetime, time, timedelta
+
 from django import forms
+from django.utils import timezone
 from django.core.validators import RegexValidator
 from orders.models import Order
 
@@ -116,4 +119,39 @@ class OrderForm(forms.ModelForm):
         fields = [
             'first_name', 'last_name', 'email', 'phone', 'city', 'street',
             'house', 'building', 'apartment', 'postal_code', 'payment_method', 'agree_to_terms'
-        ]
\ No newline at end of file
+        ]
+
+class OrderFilterForm(forms.Form):
+    """Фильтры списка заказов (каждый обслуживается индексом по дате создания)."""
+    status = forms.ChoiceField(label="Статус", required=False, choices=[('', 'Все статусы')] + Order.STATUS_CHOICES,
+                               widget=forms.Select(attrs={'class': 'form-control'}))
+    date_from = forms.DateField(label="С даты", required=False,
+                                widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    date_to = forms.DateField(label="По дату", required=False,
+                              widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+
+    def filter_queryset(self, queryset):
+        """
+        Применяет фильтры к QuerySet заказов.
+
+        Даты превращаются в полуоткрытый диапазон по created_at, а не в
+        ``created_at__date``, чтобы условие использовало индекс.
+        """
+        if not self.is_valid():
+            return queryset
+
+        status = self.cleaned_data.get('status')
+        date_from = self.cleaned_data.get('date_from')
+        date_to = self.cleaned_data.get('date_to')
+
+        if status:
+            queryset = queryset.filter(status=status)
+        if date_from:
+            queryset = queryset.filter(created_at__gte=self._start_of_day(date_from))
+        if date_to:
+            queryset = queryset.filter(created_at__lt=self._start_of_day(date_to + timedelta(days=1)))
+        return queryset
+
+    @staticmethod
+    def _start_of_day(day):
+        return timezone.make_aware(datetime.combine(day, time.min))
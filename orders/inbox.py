@@ -0,0 +1,139 @@
+"""
+Очередь входящих уведомлений платёжного сервиса.
+
+Вебхук вызывает ``record_event()``: событие сохраняется одним
+``INSERT ... ON CONFLICT DO NOTHING``, и провайдер сразу получает ответ.
+Повторная доставка того же уведомления упирается в уникальный ключ и ничего
+не стоит.
+
+``process_events()`` выбирает пачку необработанных событий и применяет
+переходы статусов заказов групповыми UPDATE — по одному на тип перехода,
+независимо от количества событий в пачке. Уведомления о смене статуса
+записываются в исходящую очередь в той же транзакции.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.outbox import publish_many
+from orders.models import Order, PaymentEvent
+
+DEFAULT_BATCH_SIZE = 200
+
+# Тип события -> (статусы, из которых допустим переход, новый статус)
+TRANSITIONS = {
+    'payment.succeeded': (('pending', 'pending_payment'), 'paid'),
+    'payment.canceled': (('pending_payment',), 'canceled'),
+}
+
+
+class InvalidEvent(ValueError):
+    """Тело уведомления не удалось разобрать."""
+
+
+def parse_event(data, provider='yookassa'):
+    """
+    Преобразует уведомление ЮКассы в несохранённый PaymentEvent.
+
+    У уведомлений ЮКассы нет собственного идентификатора, поэтому ключом
+    события служит пара «тип события + ID платежа».
+
+    Raises:
+        InvalidEvent: Если в уведомлении нет типа события или ID платежа.
+    """
+    try:
+        event = data['event']
+        payment = data['object']
+        payment_id = payment['id']
+    except (KeyError, TypeError):
+        raise InvalidEvent('Уведомление не содержит тип события или ID платежа.')
+
+    metadata = payment.get('metadata') or {}
+    order_id = metadata.get('order_id') if isinstance(metadata, dict) else None
+    try:
+        order_id = int(order_id) if order_id is not None else None
+    except (TypeError, ValueError):
+        order_id = None
+
+    return PaymentEvent(
+        provider=provider,
+        event_key=f'{event}:{payment_id}'[:128],
+        event=str(event)[:64],
+        payment_id=str(payment_id)[:64],
+        order_id=order_id,
+        payload=data,
+    )
+
+
+def record_event(data, provider='yookassa'):
+    """
+    Сохраняет уведомление в очередь одним запросом; дубликаты игнорируются.
+
+    Raises:
+        InvalidEvent: Если уведомление не удалось разобрать.
+    """
+    PaymentEvent.objects.bulk_create([parse_event(data, provider)], ignore_conflicts=True)
+
+
+def process_events(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Обрабатывает одну пачку необработанных событий.
+
+    Переходы статусов применяются только из допустимых исходных статусов,
+    поэтому повторная или запоздавшая обработка события безопасна.
+
+    Returns:
+        int: Количество обработанных событий (0 — очередь пуста).
+    """
+    with transaction.atomic():
+        events = list(
+            PaymentEvent.objects.filter(processed_at__isnull=True)
+            .order_by('processed_at', 'pk')
+            .only('pk', 'event', 'payment_id', 'order_id')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        # События без order_id в метаданных сопоставляем по сохранённому ID платежа
+        unresolved = {event.payment_id for event in events if event.order_id is None}
+        order_by_payment = dict(
+            Order.objects.filter(payment_id__in=unresolved).values_list('payment_id', 'pk')
+        ) if unresolved else {}
+
+        order_ids_by_event = defaultdict(set)
+        for event in events:
+            order_id = event.order_id or order_by_payment.get(event.payment_id)
+            if event.event in TRANSITIONS and order_id:
+                order_ids_by_event[event.event].add(order_id)
+
+        notifications = []
+        for event_type, (from_statuses, to_status) in TRANSITIONS.items():
+            order_ids = order_ids_by_event.get(event_type)
+            if not order_ids:
+                continue
+            # Групповой UPDATE не вызывает сигналы — уведомления о смене статуса
+            # формируются здесь для заказов, которые действительно перешли
+            transitioned = list(
+                Order.objects.filter(pk__in=order_ids, status__in=from_statuses).values_list('pk', 'user_id')
+            )
+            if transitioned:
+                Order.objects.filter(pk__in=[pk for pk, _ in transitioned]).update(status=to_status, updated_at=timezone.now())
+                notifications.extend(
+                    Order.status_notification(pk, user_id, to_status) for pk, user_id in transitioned
+                )
+        publish_many(notifications)
+
+        PaymentEvent.objects.filter(pk__in=[event.pk for event in events]).update(processed_at=timezone.now())
+
+    return len(events)
+
+
+def drain(batch_size=DEFAULT_BATCH_SIZE):
+    """Обрабатывает очередь до опустошения и возвращает количество событий."""
+    total = 0
+    while True:
+        processed = process_events(batch_size)
+        if not processed:
+            return total
+        total += processed
@@ -0,0 +1,59 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills price snapshots on order items and stored totals on orders created before they existed. '
+        'Items without a snapshot get the current product price, the best value still available'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of orders per transaction')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        orders_filled = items_filled = 0
+        last_pk = 0
+
+        while True:
+            with transaction.atomic():
+                orders = list(
+                    Order.objects.filter(pk__gt=last_pk, total__isnull=True)
+                    .order_by('pk')
+                    .only('pk', *Order.TOTAL_FIELDS, 'updated_at')[:chunk_size]
+                )
+                if not orders:
+                    break
+
+                items = list(
+                    OrderItem.objects.filter(order_id__in=[order.pk for order in orders])
+                    .select_related('product')
+                    .only('order_id', 'quantity', *OrderItem.PRICE_FIELDS, 'product__price', 'product__discount')
+                )
+
+                missing = [item for item in items if item.price is None or item.unit_price is None]
+                for item in missing:
+                    item.set_price_snapshot(item.product)
+                if missing:
+                    OrderItem.objects.bulk_update(missing, OrderItem.PRICE_FIELDS)
+
+                items_by_order = defaultdict(list)
+                for item in items:
+                    items_by_order[item.order_id].append(item)
+                now = timezone.now()
+                for order in orders:
+                    order.set_totals(items_by_order[order.pk])
+                    order.updated_at = now
+                Order.objects.bulk_update(orders, [*Order.TOTAL_FIELDS, 'updated_at'])
+
+            orders_filled += len(orders)
+            items_filled += len(missing)
+            last_pk = orders[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f'Filled totals for {orders_filled} orders and prices for {items_filled} items'))
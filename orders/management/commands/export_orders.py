@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import export
+from orders.forms import OrderFilterForm
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Streams orders with their items, address and totals as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(export.EXPORTERS), default='csv', help='Output format')
+        parser.add_argument('--status', help='Only orders with this status')
+        parser.add_argument('--date-from', help='Only orders created on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--date-to', help='Only orders created on or before this date (YYYY-MM-DD)')
+        parser.add_argument('--output', help='Output file (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=export.DEFAULT_CHUNK_SIZE, help='Number of orders per query')
+
+    def handle(self, *args, **options):
+        filter_form = OrderFilterForm({
+            'status': options['status'] or '',
+            'date_from': options['date_from'] or '',
+            'date_to': options['date_to'] or '',
+        })
+        if not filter_form.is_valid():
+            raise CommandError(filter_form.errors.as_text())
+
+        queryset = filter_form.filter_queryset(Order.objects.all())
+        rows = export.EXPORTERS[options['format']](queryset, chunk_size=options['chunk_size'])
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                count = self.write(rows, f.write)
+            self.stdout.write(self.style.SUCCESS(f'Exported {count} lines to {options["output"]}'))
+        else:
+            self.write(rows, lambda row: self.stdout.write(row, ending=''))
+
+    @staticmethod
+    def write(rows, write):
+        count = 0
+        for row in rows:
+            write(row)
+            count += 1
+        return count
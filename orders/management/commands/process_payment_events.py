@@ -0,0 +1,15 @@
+from main.management.base import QueueWorkerCommand
+from orders import inbox
+
+
+class Command(QueueWorkerCommand):
+    help = 'Applies queued payment provider notifications to orders in batches'
+    queue_name = 'payment event queue'
+    default_batch_size = inbox.DEFAULT_BATCH_SIZE
+    batch_size_help = 'Number of events per transaction'
+
+    def drain(self, batch_size):
+        return inbox.drain(batch_size)
+
+    def report(self, processed):
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} payment events'))
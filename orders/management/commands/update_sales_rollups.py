@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders import rollups
+
+
+class Command(BaseCommand):
+    help = 'Updates daily sales rollups for orders changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild rollups for all orders')
+
+    def handle(self, *args, **options):
+        days, rows = rollups.update_rollups(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {days} days ({rows} rollup rows)'))
@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-17 13:30
+
+import uuid
+from django.db import migrations, models
+
+
+def fill_idempotence_keys(apps, schema_editor):
+    # default=uuid.uuid4 в AddField вычисляется один раз, и все существующие
+    # заказы получили бы одинаковый ключ
+    Order = apps.get_model('orders', 'Order')
+    orders = list(Order.objects.filter(payment_idempotence_key__isnull=True).only('pk'))
+    for order in orders:
+        order.payment_idempotence_key = uuid.uuid4()
+    Order.objects.bulk_update(orders, ['payment_idempotence_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_alter_orderitem_options_alter_order_payment_method'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='payment_id',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True, verbose_name='ID платежа'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='payment_idempotence_key',
+            field=models.UUIDField(editable=False, null=True, verbose_name='Ключ идемпотентности платежа'),
+        ),
+        migrations.RunPython(fill_idempotence_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='payment_idempotence_key',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, verbose_name='Ключ идемпотентности платежа'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'В обработке'), ('pending_payment', 'Ожидает оплаты'), ('completed', 'Завершен'), ('canceled', 'Отменён'), ('paid', 'Оплачен')], default='pending', max_length=20, verbose_name='Статус заказа'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_payment_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(default='yookassa', max_length=20, verbose_name='Платёжный сервис')),
+                ('event_key', models.CharField(max_length=128, verbose_name='Ключ события')),
+                ('event', models.CharField(max_length=64, verbose_name='Тип события')),
+                ('payment_id', models.CharField(blank=True, max_length=64, verbose_name='ID платежа')),
+                ('order_id', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='ID заказа')),
+                ('payload', models.JSONField(verbose_name='Тело уведомления')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Получено')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Обработано')),
+            ],
+            options={
+                'verbose_name': 'Платёжное событие',
+                'verbose_name_plural': 'Платёжные события',
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='payment_event_queue_idx')],
+                'constraints': [models.UniqueConstraint(fields=('provider', 'event_key'), name='unique_payment_event')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-17 16:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_list_indexes'),
+        ('shop', '0003_product_price_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Сводка')),
+                ('watermark', models.DateTimeField(verbose_name='Учтено до')),
+            ],
+            options={
+                'verbose_name': 'Отметка сводки',
+                'verbose_name_plural': 'Отметки сводок',
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('payment_method', models.CharField(choices=[('cash', 'Наличными'), ('card', 'Картой онлайн')], max_length=50, verbose_name='Способ оплаты')),
+                ('status', models.CharField(choices=[('pending', 'В обработке'), ('pending_payment', 'Ожидает оплаты'), ('completed', 'Завершен'), ('canceled', 'Отменён'), ('paid', 'Оплачен')], max_length=20, verbose_name='Статус заказа')),
+                ('orders', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('units', models.PositiveIntegerField(default=0, verbose_name='Единиц товара')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='shop.categoryshop', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Сводка продаж',
+                'verbose_name_plural': 'Сводки продаж',
+                'constraints': [models.UniqueConstraint(fields=('day', 'category', 'payment_method', 'status'), name='unique_daily_sales_rollup')],
+            },
+        ),
+    ]
@@ -1,16 +1,19 @@
-from django.db import models
+import uuid
+from decimal import Decimal
+
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from accounts.models import Address
-from shop.models import ProductShop
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from main.tracking import LoadedStateMixin
+from shop.models import CategoryShop, ProductShop
 
 User = get_user_model()
 
-class Order(models.Model):
+class Order(LoadedStateMixin, models.Model):
     """Представляет заказ пользователя."""
     STATUS_CHOICES = [
         ('pending', 'В обработке'),
+        ('pending_payment', 'Ожидает оплаты'),
         ('completed', 'Завершен'),
         ('canceled', 'Отменён'),
         ('paid', 'Оплачен'),
@@ -24,7 +27,26 @@ class Order(models.Model):
     address = models.ForeignKey(Address, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Адрес доставки')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='Статус заказа')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    # Групповые UPDATE заказа должны обновлять это поле явно (по нему работают сводки продаж)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения')
     payment_method = models.CharField(max_length=50, choices=PAYMENT_METHODS, verbose_name='Способ оплаты')
+    payment_id = models.CharField(max_length=64, null=True, blank=True, db_index=True, verbose_name='ID платежа')
+    payment_idempotence_key = models.UUIDField(default=uuid.uuid4, editable=False, verbose_name='Ключ идемпотентности платежа')
+    # Итоги заказа фиксируются при оформлении (NULL — ещё не заполнены командой backfill_order_totals)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name='Сумма без скидок')
+    discount_total = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name='Сумма скидки')
+    total = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name='Итоговая сумма')
+
+    TOTAL_FIELDS = ('subtotal', 'discount_total', 'total')
+    tracked_fields = ('status',)
+
+    # Тексты уведомлений покупателю о смене статуса
+    STATUS_MESSAGES = {
+        'pending': 'Заказ принят в обработку.',
+        'paid': 'Заказ оплачен.',
+        'completed': 'Заказ выполнен.',
+        'canceled': 'Заказ отменён.',
+    }
     
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
@@ -32,32 +54,152 @@ class Order(models.Model):
     class Meta:
         db_table = 'orders'
         verbose_name = 'Заказы'
+        indexes = [
+            # Список заказов покупателя и списки администратора (по статусу и по дате)
+            # выбираются по индексу; id добавляется SQLite неявно и служит вторым ключом курсора
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
+
+    def set_totals(self, items):
+        """
+        Вычисляет и запоминает итоги заказа по позициям с зафиксированными ценами.
+
+        Args:
+            items (Iterable[OrderItem]): Позиции заказа.
+        """
+        subtotal = total = Decimal('0.00')
+        for item in items:
+            subtotal += item.price * item.quantity
+            total += item.unit_price * item.quantity
+        self.subtotal = subtotal
+        self.total = total
+        self.discount_total = subtotal - total
 
     @property
     def total_cost(self):
-        """Возвращает общую стоимость заказа исходя из товаров и их количеств."""
-        total = sum(item.subtotal for item in self.items.all())
-
-        # Apply any order-level discounts here if needed
-        # For now, we'll just return the total as calculated
-        return total
+        """Возвращает итоговую стоимость заказа (по ценам на момент покупки)."""
+        if self.total is not None:
+            return self.total
+        # Заказы, для которых итоги ещё не заполнены
+        return sum(item.subtotal for item in self.items.all())
 
     @property
     def discount(self):
-        """Возвращает скидку на заказ."""
-        # Для начала просто возвращаем 0, так как скидка не реализована
-        return 0
+        """Возвращает сумму скидки по заказу."""
+        return self.discount_total or 0
+
+    def save(self, *args, **kwargs):
+        """Сохраняет заказ и уведомления о смене статуса (см. orders.signals) в одной транзакции."""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def status_notification(cls, order_id, user_id, status):
+        """
+        Формирует уведомление о смене статуса заказа для исходящей очереди.
+
+        Returns:
+            Notification: Несохранённое уведомление.
+        """
+        from notifications.models import Notification
+
+        message = cls.STATUS_MESSAGES.get(status, 'Изменился статус заказа.')
+        return Notification(
+            user_id=user_id,
+            kind='order_status',
+            message=f'Заказ #{order_id}: {message}',
+            payload={'order_id': order_id, 'status': status},
+        )
 
     @property
     def is_paid(self):
         """Логическое свойство для отслеживания оплаченности заказа."""
         return self.status == 'paid'
 
+class PaymentEvent(models.Model):
+    """
+    Входящее уведомление платёжного сервиса (inbox).
+
+    Вебхук только сохраняет событие одной вставкой; переходы статусов заказов
+    применяет обработчик очереди пачками. Ключ события уникален в пределах
+    провайдера, поэтому повторная доставка того же уведомления игнорируется.
+    """
+    provider = models.CharField(max_length=20, default='yookassa', verbose_name='Платёжный сервис')
+    event_key = models.CharField(max_length=128, verbose_name='Ключ события')
+    event = models.CharField(max_length=64, verbose_name='Тип события')
+    payment_id = models.CharField(max_length=64, blank=True, verbose_name='ID платежа')
+    order_id = models.PositiveBigIntegerField(null=True, blank=True, verbose_name='ID заказа')
+    payload = models.JSONField(verbose_name='Тело уведомления')
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name='Получено')
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name='Обработано')
+
+    def __str__(self):
+        return f"{self.provider}: {self.event} {self.payment_id}"
+
+    class Meta:
+        verbose_name = 'Платёжное событие'
+        verbose_name_plural = 'Платёжные события'
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'event_key'], name='unique_payment_event'),
+        ]
+        indexes = [
+            # Очередь необработанных событий выбирается по этому индексу
+            models.Index(fields=['processed_at', 'id'], name='payment_event_queue_idx'),
+        ]
+
+class DailySalesRollup(models.Model):
+    """
+    Сводка продаж за день в разрезе категории, способа оплаты и статуса заказа.
+
+    Заполняется командой update_sales_rollups; отчёты читают только эту
+    таблицу. Заказ с товарами из нескольких категорий учитывается в каждой
+    из них, поэтому количество заказов по категориям не суммируется.
+    """
+    day = models.DateField(verbose_name='День')
+    category = models.ForeignKey(CategoryShop, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Категория')
+    payment_method = models.CharField(max_length=50, choices=Order.PAYMENT_METHODS, verbose_name='Способ оплаты')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, verbose_name='Статус заказа')
+    orders = models.PositiveIntegerField(default=0, verbose_name='Заказов')
+    units = models.PositiveIntegerField(default=0, verbose_name='Единиц товара')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Выручка')
+
+    def __str__(self):
+        return f"{self.day} {self.category_id} {self.payment_method} {self.status}"
+
+    class Meta:
+        verbose_name = 'Сводка продаж'
+        verbose_name_plural = 'Сводки продаж'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category', 'payment_method', 'status'], name='unique_daily_sales_rollup'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """Отметка времени, до которой изменения заказов уже учтены в сводке."""
+    name = models.CharField(max_length=50, primary_key=True, verbose_name='Сводка')
+    watermark = models.DateTimeField(verbose_name='Учтено до')
+
+    def __str__(self):
+        return f"{self.name}: {self.watermark}"
+
+    class Meta:
+        verbose_name = 'Отметка сводки'
+        verbose_name_plural = 'Отметки сводок'
+
+
 class OrderItem(models.Model):
     """Элемент заказа (позиция в заказе)."""
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', verbose_name='Заказ')
     product = models.ForeignKey(ProductShop, on_delete=models.PROTECT, verbose_name='Товар')
     quantity = models.PositiveIntegerField(verbose_name='Количество')
+    # Цена товара на момент покупки
+    price = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True, verbose_name='Цена')
+    discount = models.DecimalField(max_digits=4, decimal_places=2, default=0, verbose_name='Скидка в %')
+    unit_price = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True, verbose_name='Цена со скидкой')
+
+    PRICE_FIELDS = ('price', 'discount', 'unit_price')
 
     def __str__(self):
         return f"{self.quantity} x {self.product.title} в Заказе #{self.order.id}"
@@ -65,13 +207,15 @@ class OrderItem(models.Model):
     class Meta:       
         verbose_name = 'Заказ товаров'
 
+    def set_price_snapshot(self, product):
+        """Фиксирует цену и скидку товара на момент покупки."""
+        self.price = product.price
+        self.discount = product.discount
+        self.unit_price = product.sell_price()
+
     @property
     def subtotal(self):
-        """Возвращает полную стоимость позиции (количество × цена товара с учетом скидки)."""
+        """Возвращает полную стоимость позиции (количество × цена со скидкой на момент покупки)."""
+        if self.unit_price is not None:
+            return self.quantity * self.unit_price
         return self.quantity * self.product.sell_price()
-
-# Срабатывание сигнала при изменении позиций заказа
-@receiver(post_save, sender=OrderItem)
-def update_order_total_cost(sender, instance, **kwargs):
-    """Обновляет общую стоимость заказа при изменении элементов."""
-    pass  # Общая стоимость является property и автоматически пересчитывается
@@ -0,0 +1,187 @@
+"""
+Создание платежей для заказов.
+
+Платёж создаётся после фиксации транзакции заказа (заказ уже сохранён в
+статусе ``pending_payment``), поэтому сетевой запрос к платёжному сервису не
+удерживает блокировку записи SQLite. Запрос к шлюзу ограничен таймаутом
+соединения и чтения и повторяется с тем же ключом идемпотентности, так что
+повтор не создаёт второй платёж.
+
+Шлюз выбирается настройкой ``PAYMENT_GATEWAY``: по умолчанию ЮКасса,
+для разработки и тестов — ``LocalGateway``, который не обращается в сеть.
+"""
+import functools
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from orders.models import Order
+
+DEFAULT_GATEWAY = 'orders.payments.YooKassaGateway'
+DEFAULT_TIMEOUT_SECONDS = 10
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 0.5
+
+
+class PaymentError(Exception):
+    """Не удалось создать платёж после всех попыток."""
+
+
+@dataclass(frozen=True)
+class PaymentIntent:
+    """
+    Созданный платёж.
+
+    Attributes:
+        payment_id (str): Идентификатор платежа у провайдера.
+        confirmation_url (str): URL, на который нужно перенаправить покупателя.
+    """
+    payment_id: str
+    confirmation_url: str
+
+
+class BaseGateway:
+    """
+    Базовый класс платёжного шлюза.
+
+    Attributes:
+        timeout (float): Таймаут соединения и чтения одного запроса к провайдеру (в секундах).
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT_SECONDS):
+        self.timeout = timeout
+
+    def create_payment(self, order, amount, return_url, idempotence_key):
+        """
+        Создаёт платёж у провайдера.
+
+        Args:
+            order (Order): Заказ.
+            amount (Decimal): Сумма к оплате.
+            return_url (str): URL возврата после оплаты.
+            idempotence_key (str): Ключ идемпотентности (одинаковый для всех попыток).
+
+        Returns:
+            PaymentIntent: Созданный платёж.
+        """
+        raise NotImplementedError
+
+
+@functools.lru_cache
+def _yookassa_payment_class(timeout):
+    """
+    Возвращает класс платежа ЮКассы, запросы которого ограничены таймаутом.
+
+    SDK создаёт ``requests.Session`` без таймаута сокета (``Configuration.timeout``
+    задаёт лишь паузу между повторами), поэтому зависший запрос блокировал бы
+    поток навсегда. Таймаут подставляется в каждый запрос сессии клиента.
+    """
+    from yookassa import Payment
+    from yookassa.client import ApiClient
+
+    class TimeoutApiClient(ApiClient):
+        def get_session(self):
+            session = super().get_session()
+            session.request = functools.partial(session.request, timeout=timeout)
+            return session
+
+    class TimeoutPayment(Payment):
+        def __init__(self):
+            self.client = TimeoutApiClient()
+
+    return TimeoutPayment
+
+
+class YooKassaGateway(BaseGateway):
+    """Платёжный шлюз ЮКассы."""
+
+    def create_payment(self, order, amount, return_url, idempotence_key):
+        from yookassa import Configuration
+
+        Configuration.configure(settings.YOOKASSA_ACCOUNT_ID, settings.YOOKASSA_SECRET_KEY)
+        payment = _yookassa_payment_class(self.timeout).create({
+            "amount": {
+                "value": f'{amount:.2f}',
+                "currency": "RUB"
+            },
+            "confirmation": {
+                "type": "redirect",
+                "return_url": return_url
+            },
+            "capture": True,
+            "description": f"Оплата заказа #{order.id}",
+            "metadata": {
+                "order_id": str(order.id)
+            }
+        }, idempotence_key)
+        return PaymentIntent(payment.id, payment.confirmation.confirmation_url)
+
+
+class LocalGateway(BaseGateway):
+    """
+    Локальная замена платёжного шлюза для разработки и тестов.
+
+    Не обращается в сеть: возвращает детерминированный идентификатор платежа
+    и сразу перенаправляет на URL возврата. Задержку ответа провайдера можно
+    имитировать настройкой ``PAYMENT_LOCAL_LATENCY_SECONDS``; задержка дольше
+    таймаута приводит к ``TimeoutError``, как у сетевого шлюза.
+    """
+
+    def create_payment(self, order, amount, return_url, idempotence_key):
+        latency = getattr(settings, 'PAYMENT_LOCAL_LATENCY_SECONDS', 0)
+        if latency > self.timeout:
+            time.sleep(self.timeout)
+            raise TimeoutError(f'Платёжный сервис не ответил за {self.timeout} с.')
+        if latency:
+            time.sleep(latency)
+        return PaymentIntent(f'local-{idempotence_key}', return_url)
+
+
+def get_gateway():
+    """Возвращает экземпляр шлюза из настройки PAYMENT_GATEWAY с таймаутом из PAYMENT_TIMEOUT_SECONDS."""
+    timeout = getattr(settings, 'PAYMENT_TIMEOUT_SECONDS', DEFAULT_TIMEOUT_SECONDS)
+    return import_string(getattr(settings, 'PAYMENT_GATEWAY', DEFAULT_GATEWAY))(timeout=timeout)
+
+
+def start_payment(order, return_url):
+    """
+    Создаёт платёж для уже сохранённого заказа и запоминает его идентификатор.
+
+    Должна вызываться вне транзакции. Таймаут соединения и чтения каждой
+    попытки — ``PAYMENT_TIMEOUT_SECONDS``; всего выполняется до
+    ``PAYMENT_MAX_ATTEMPTS`` попыток с экспоненциальной паузой между ними.
+
+    Args:
+        order (Order): Заказ в статусе pending_payment.
+        return_url (str): URL возврата после оплаты.
+
+    Raises:
+        PaymentError: Если платёж не удалось создать.
+
+    Returns:
+        PaymentIntent: Созданный платёж.
+    """
+    gateway = get_gateway()
+    max_attempts = getattr(settings, 'PAYMENT_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    amount = Decimal(order.total_cost)
+    idempotence_key = str(order.payment_idempotence_key)
+
+    last_error = None
+    for attempt in range(max_attempts):
+        if attempt:
+            time.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+        try:
+            intent = gateway.create_payment(order, amount, return_url, idempotence_key)
+            break
+        except Exception as e:
+            last_error = e
+    else:
+        raise PaymentError(str(last_error)) from last_error
+
+    Order.objects.filter(pk=order.pk).update(payment_id=intent.payment_id)
+    order.payment_id = intent.payment_id
+    return intent
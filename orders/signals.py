@@ -1,23 +1,20 @@
 from django.dispatch import receiver
-from django.db.models.signals import pre_save
-from django.contrib import messages
-from django.utils.translation import gettext_lazy as _
+from django.db.models.signals import post_save
 
+from notifications.outbox import publish_many
 from .models import Order
 
-@receiver(pre_save, sender=Order)
-def notify_on_status_change(sender, instance, **kwargs):
+@receiver(post_save, sender=Order)
+def notify_on_status_change(sender, instance, created, update_fields=None, **kwargs):
     """
-    Отправляет уведомление пользователю при изменении статуса заказа.
+    Ставит в очередь уведомление пользователю при изменении статуса заказа.
+
+    Прежний статус берётся из состояния, запомненного при загрузке заказа,
+    поэтому дополнительный запрос не выполняется. Уведомление записывается
+    в исходящую очередь в транзакции вызывающего кода и доставляется позже.
     """
-    previous_instance = sender.objects.filter(pk=instance.pk).first()
-    if previous_instance and previous_instance.status != instance.status:
-        message_map = {
-            'processing': _('Заказ принят в обработку.'),
-            'shipped': _('Заказ отправлен в доставку.'),
-            'completed': _('Заказ выполнен.'),
-            'cancelled': _('Заказ отменён.'),
-        }
-        notification_text = message_map.get(instance.status, _('Изменился статус заказа.'))
-        messages.info(previous_instance.user, notification_text)
-        
\ No newline at end of file
+    if created or not instance.has_changed('status'):
+        return
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    publish_many([Order.status_notification(instance.pk, instance.user_id, instance.status)])
@@ -1,3 +1,366 @@
-from django.test import TestCase
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from orders import export, inbox, payments, rollups
+from notifications.models import Notification
+from orders.models import DailySalesRollup, Order, OrderItem, PaymentEvent
+from shop.models import CategoryShop, ProductShop
+
+User = get_user_model()
+
+
+class FlakyGateway(payments.BaseGateway):
+    """Шлюз, который отвечает ошибкой на первую попытку и запоминает ключи идемпотентности."""
+    keys = []
+
+    def create_payment(self, order, amount, return_url, idempotence_key):
+        self.keys.append(idempotence_key)
+        if len(self.keys) == 1:
+            raise ConnectionError('provider unavailable')
+        return payments.PaymentIntent(f'flaky-{idempotence_key}', return_url)
+
+
+@override_settings(PAYMENT_GATEWAY='orders.payments.LocalGateway', PAYMENT_MAX_ATTEMPTS=2)
+class StartPaymentTest(TestCase):
+    """Проверяет создание платежа после фиксации заказа."""
+
+    def setUp(self):
+        user = User.objects.create_user(phone_number='+79990000001', password='password')
+        self.order = Order.objects.create(user=user, payment_method='card', status='pending_payment')
+
+    def test_local_gateway_stores_payment_id(self):
+        intent = payments.start_payment(self.order, 'http://testserver/return/')
+
+        self.assertEqual(intent.confirmation_url, 'http://testserver/return/')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_id, intent.payment_id)
+
+    @override_settings(PAYMENT_GATEWAY='orders.tests.FlakyGateway')
+    def test_retry_reuses_idempotence_key(self):
+        FlakyGateway.keys = []
+        payments.start_payment(self.order, 'http://testserver/return/')
+
+        self.assertEqual(FlakyGateway.keys, [str(self.order.payment_idempotence_key)] * 2)
+
+    @override_settings(PAYMENT_LOCAL_LATENCY_SECONDS=0.2, PAYMENT_TIMEOUT_SECONDS=0.05)
+    def test_timeout_raises_payment_error(self):
+        with self.assertRaises(payments.PaymentError):
+            payments.start_payment(self.order, 'http://testserver/return/')
+
+        self.order.refresh_from_db()
+        self.assertIsNone(self.order.payment_id)
+
+    def test_yookassa_session_has_socket_timeout(self):
+        from yookassa import Configuration
+
+        Configuration.configure('account', 'secret')
+        session = payments._yookassa_payment_class(3)().client.get_session()
+
+        self.assertEqual(session.request.keywords, {'timeout': 3})
+
+
+class PaymentWebhookInboxTest(TestCase):
+    """Проверяет приём уведомлений в очередь и их пакетную обработку."""
+
+    def setUp(self):
+        user = User.objects.create_user(phone_number='+79990000002', password='password')
+        self.order = Order.objects.create(user=user, payment_method='card', status='pending_payment')
+
+    def notify(self, event='payment.succeeded', payment_id='pay-1', metadata=None):
+        body = {
+            'type': 'notification',
+            'event': event,
+            'object': {'id': payment_id, 'metadata': metadata if metadata is not None else {'order_id': str(self.order.pk)}},
+        }
+        return self.client.post(reverse('orders:payment_webhook'), json.dumps(body), content_type='application/json')
+
+    def test_webhook_is_single_insert_and_replays_are_ignored(self):
+        with self.assertNumQueries(1):
+            response = self.notify()
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.notify().status_code, 200)
+
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'pending_payment')
+
+    def test_malformed_notification_is_rejected(self):
+        response = self.client.post(reverse('orders:payment_webhook'), '{"event": 1}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(reverse('orders:payment_webhook')).status_code, 405)
+
+    def test_worker_applies_transitions(self):
+        Order.objects.filter(pk=self.order.pk).update(payment_id='pay-2')
+        self.notify(payment_id='pay-2', metadata={})
+        self.notify(event='payment.canceled', payment_id='pay-2', metadata={})
+
+        self.assertEqual(inbox.drain(), 2)
+        self.assertEqual(inbox.drain(), 0)
+        self.order.refresh_from_db()
+        # Оплаченный заказ не отменяется запоздавшим уведомлением
+        self.assertEqual(self.order.status, 'paid')
+        self.assertFalse(PaymentEvent.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(
+            list(Notification.objects.values_list('payload__status', flat=True)), ['paid']
+        )
+
+
+class OrderTotalsTest(TestCase):
+    """Проверяет фиксацию цен в заказе и заполнение итогов старых заказов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone_number='+79990000003', password='password')
+        category = CategoryShop.objects.create(title='Категория', slug='category')
+        cls.product = ProductShop.objects.create(
+            title='Товар', slug='product', price=Decimal('200.00'), discount=Decimal('10.00'), quantity=10, category=category
+        )
+
+    def create_order(self, quantity=2):
+        order = Order.objects.create(user=self.user, payment_method='cash')
+        OrderItem.objects.create(order=order, product=self.product, quantity=quantity)
+        return order
+
+    def test_backfill_fills_snapshots_and_totals(self):
+        order = self.create_order()
+        call_command('backfill_order_totals', chunk_size=1, stdout=StringIO())
+
+        order.refresh_from_db()
+        self.assertEqual(order.subtotal, Decimal('400.00'))
+        self.assertEqual(order.discount_total, Decimal('40.00'))
+        self.assertEqual(order.total, Decimal('360.00'))
+
+        # Изменение цены товара не меняет уже оформленный заказ
+        ProductShop.objects.filter(pk=self.product.pk).update(price=Decimal('999.00'))
+        order = Order.objects.get(pk=order.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(order.total_cost, Decimal('360.00'))
+
+    def test_order_list_queries_do_not_grow(self):
+        self.client.force_login(self.user)
+        url = reverse('orders:order_list')
+        self.create_order()
+        call_command('backfill_order_totals', stdout=StringIO())
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        for quantity in range(1, 6):
+            self.create_order(quantity)
+        call_command('backfill_order_totals', stdout=StringIO())
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class OrderListViewTest(TestCase):
+    """Проверяет пагинацию по ключу и фильтры списка заказов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(phone_number='+79990000004', password='password', is_staff=True)
+        cls.customer = User.objects.create_user(phone_number='+79990000005', password='password')
+        Order.objects.bulk_create([
+            Order(user=cls.customer, payment_method='cash', status='paid' if index % 3 else 'pending', total=index)
+            for index in range(25)
+        ])
+
+    def collect_pages(self, params=None):
+        """Проходит все страницы по курсорам и возвращает id заказов и количество запросов на страницу."""
+        ids, query_counts = [], set()
+        params = dict(params or {})
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('orders:order_list'), params)
+            self.assertEqual(response.status_code, 200)
+            query_counts.add(len(queries.captured_queries))
+            page = response.context['page_obj']
+            ids.extend(order.pk for order in page)
+            if not page.has_next:
+                return ids, query_counts
+            params['cursor'] = page.next_cursor
+
+    def test_staff_pages_through_all_orders(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('orders:order_list'))
+
+        ids, query_counts = self.collect_pages()
+
+        self.assertEqual(ids, list(Order.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)))
+        self.assertEqual(len(query_counts), 1)
+
+    def test_status_filter(self):
+        self.client.force_login(self.staff)
+        ids, _ = self.collect_pages({'status': 'pending'})
+        self.assertEqual(len(ids), 9)
+        self.assertFalse(Order.objects.filter(pk__in=ids).exclude(status='pending').exists())
+
+    def test_customer_sees_only_own_orders(self):
+        other = User.objects.create_user(phone_number='+79990000006', password='password')
+        self.client.force_login(other)
+        response = self.client.get(reverse('orders:order_list'))
+        self.assertEqual(len(response.context['orders']), 0)
+
+
+class OrderStatusTrackingTest(TestCase):
+    """Проверяет отслеживание смены статуса без дополнительного SELECT."""
+
+    def setUp(self):
+        user = User.objects.create_user(phone_number='+79990000007', password='password')
+        Order.objects.create(user=user, payment_method='cash')
+        self.order = Order.objects.get()
+
+    def test_status_change_is_queued_without_select(self):
+        self.order.status = 'completed'
+        # SAVEPOINT, UPDATE заказа, INSERT уведомления и RELEASE SAVEPOINT
+        with self.assertNumQueries(4):
+            self.order.save()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.user_id, self.order.user_id)
+        self.assertEqual(notification.payload, {'order_id': self.order.pk, 'status': 'completed'})
+
+        # Повторное сохранение без изменений не создаёт уведомление
+        with self.assertNumQueries(3):
+            self.order.save()
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_deferred_status_is_not_tracked(self):
+        order = Order.objects.only('pk', 'user_id').get()
+        with self.assertNumQueries(0):
+            self.assertFalse(order.has_changed('status'))
+
+
+@override_settings(SALES_ROLLUP_LAG_SECONDS=0)
+class SalesRollupTest(TestCase):
+    """Проверяет инкрементальное обновление сводок продаж."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(phone_number='+79990000008', password='password')
+        cls.phones = CategoryShop.objects.create(title='Телефоны', slug='phones')
+        cls.laptops = CategoryShop.objects.create(title='Ноутбуки', slug='laptops')
+        cls.phone = ProductShop.objects.create(title='Телефон', slug='phone', price=100, quantity=10, category=cls.phones)
+        cls.laptop = ProductShop.objects.create(title='Ноутбук', slug='laptop', price=500, quantity=10, category=cls.laptops)
+
+    def create_order(self, *lines, payment_method='cash'):
+        order = Order.objects.create(user=self.user, payment_method=payment_method)
+        items = []
+        for product, quantity in lines:
+            item = OrderItem(order=order, product=product, quantity=quantity)
+            item.set_price_snapshot(product)
+            items.append(item)
+        OrderItem.objects.bulk_create(items)
+        return order
+
+    def rollup(self, category, status='pending'):
+        return DailySalesRollup.objects.get(category=category, status=status)
+
+    def test_incremental_update(self):
+        order = self.create_order((self.phone, 2), (self.laptop, 1))
+        self.create_order((self.phone, 1), payment_method='card')
+
+        self.assertEqual(rollups.update_rollups(), (1, 3))
+        phones = DailySalesRollup.objects.filter(category=self.phones)
+        self.assertEqual(sum(row.units for row in phones), 3)
+        self.assertEqual(self.rollup(self.laptops).revenue, Decimal('500.00'))
+
+        # Без изменений заказов пересчитывать нечего
+        self.assertEqual(rollups.update_rollups(), (0, 0))
+
+        order.status = 'paid'
+        order.save()
+        rollups.update_rollups()
+        self.assertEqual(self.rollup(self.laptops, 'paid').orders, 1)
+        self.assertFalse(DailySalesRollup.objects.filter(category=self.laptops, status='pending').exists())
+
+    def test_days_follow_local_midnight(self):
+        late = self.create_order((self.phone, 1))
+        early = self.create_order((self.laptop, 1))
+        midnight = timezone.make_aware(datetime(2026, 3, 2))
+        Order.objects.filter(pk=late.pk).update(created_at=midnight - timedelta(seconds=1))
+        Order.objects.filter(pk=early.pk).update(created_at=midnight)
+
+        self.assertEqual(rollups.update_rollups(full=True), (2, 2))
+        self.assertEqual(self.rollup(self.phones).day, date(2026, 3, 1))
+        self.assertEqual(self.rollup(self.laptops).day, date(2026, 3, 2))
+
+    def test_missing_unit_price_uses_current_price(self):
+        order = self.create_order((self.phone, 2))
+        OrderItem.objects.filter(order=order).update(price=None, unit_price=None)
+
+        rollups.update_rollups()
+
+        self.assertEqual(self.rollup(self.phones).revenue, Decimal('200.00'))
+
+    def test_admin_report(self):
+        self.create_order((self.phone, 3))
+        rollups.update_rollups()
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('admin:orders_dailysalesrollup_changelist'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['sales_summary'], {'units': 3, 'revenue': Decimal('300.00')})
+
+
+class OrderExportTest(TestCase):
+    """Проверяет потоковую выгрузку заказов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(phone_number='+79990000009', password='password')
+        category = CategoryShop.objects.create(title='Категория', slug='category')
+        cls.product = ProductShop.objects.create(title='Товар', slug='product', price=100, quantity=10, category=category)
+        for status in ('pending', 'paid', 'paid'):
+            order = Order.objects.create(user=cls.user, payment_method='cash', status=status)
+            item = OrderItem(order=order, product=cls.product, quantity=2)
+            item.set_price_snapshot(cls.product)
+            item.save()
+            order.set_totals([item])
+            order.save()
+
+    def test_command_filters_and_formats(self):
+        out = StringIO()
+        call_command('export_orders', format='ndjson', status='paid', stdout=out)
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([record['status'] for record in records], ['paid', 'paid'])
+        self.assertEqual(records[0]['items'][0]['unit_price'], '100.00')
+        self.assertEqual(records[0]['total'], '200.00')
+
+    def test_queries_do_not_depend_on_row_count(self):
+        rows = list(export.iter_csv(Order.objects.all(), chunk_size=2))
+        # Заголовок и по строке на позицию
+        self.assertEqual(len(rows), 4)
+        # Один курсор по заказам и по одному prefetch-запросу позиций на пачку из двух заказов
+        with self.assertNumQueries(3):
+            list(export.iter_csv(Order.objects.all(), chunk_size=2))
+
+    def test_admin_action_streams(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('admin:orders_order_changelist'), {
+            'action': 'export_csv',
+            'select_across': '1',
+            'index': '0',
+            '_selected_action': list(Order.objects.values_list('pk', flat=True)),
+        })
+
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('order_id,created_at'))
+        self.assertEqual(len(content.splitlines()), 4)
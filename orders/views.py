@@ -7,25 +7,59 @@ from django.contrib import messages
 from django.utils.translation import gettext as _
 from django.shortcuts import redirect
 
+from django.db.models import Prefetch
+
+from shop.mixins import KeysetPaginationMixin
 from .models import Order, OrderItem
-from .forms import OrderForm
+from .forms import OrderFilterForm, OrderForm
+
+class OrderListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    """
+    Список заказов с пагинацией по ключу (created_at, id) и фильтрами.
 
-class OrderListView(LoginRequiredMixin, ListView):
+    Страница выбирается по индексу, поэтому её стоимость не зависит от
+    количества заказов — в том числе для администраторов, видящих все заказы.
+    """
     model = Order
     template_name = 'orders/order_list.html'
+    context_object_name = 'orders'
     paginate_by = 10
     ordering = ['-created_at']
+    keyset_always = True
+    # Поля, которые выводятся в строке списка
+    list_fields = ('id', 'user_id', 'status', 'created_at', 'total')
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().only(*self.list_fields)
         # Только администраторы видят все заказы, обычные пользователи - только свои
-        if not self.request.user.is_staff:
+        if self.request.user.is_staff:
+            queryset = queryset.select_related('user').only(*self.list_fields, 'user__phone_number')
+        else:
             queryset = queryset.filter(user=self.request.user)
-        return queryset
+        return self.get_filter_form().filter_queryset(queryset)
+
+    def get_filter_form(self):
+        if not hasattr(self, '_filter_form'):
+            self._filter_form = OrderFilterForm(self.request.GET or None)
+        return self._filter_form
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Сохраняем фильтры для ссылок пагинации (кроме cursor)
+        query_params = self.request.GET.copy()
+        query_params.pop(self.cursor_kwarg, None)
+        context['filter_form'] = self.get_filter_form()
+        context['query_params'] = query_params.urlencode()
+        return context
 
 class OrderHistoryView(OrderListView):
     template_name = 'orders/order_history.html'
-    context_object_name = 'orders'
+
+    def get_queryset(self):
+        # Названия товаров выводятся для каждого заказа — загружаем их одним запросом
+        return super().get_queryset().prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product').only('order_id', 'product__title'))
+        )
 
 class OrderDetailView(LoginRequiredMixin, DetailView):
     model = Order
@@ -41,8 +75,8 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Автоматически добавляем элементы заказа в контекст
-        order = self.get_object()
-        context['order_items'] = order.items.all()
+        order = self.object
+        context['order_items'] = order.items.select_related('product')
         context['discount'] = order.discount
 
         # Добавляем адрес, если он существует
@@ -1,32 +1,26 @@
 from django.views.decorators.csrf import csrf_exempt
 from django.http import HttpResponse
-from django.conf import settings
-from yookassa import Configuration, Payment
+from orders.inbox import InvalidEvent, record_event
 from orders.models import Order
 import json
 
 @csrf_exempt
 def yookassa_webhook(request):
-    """Обработчик вебхука от ЮКасса"""
-    if request.method == 'POST':
-        try:
-            event = json.loads(request.body)
-            
-            if event['event'] == 'payment.succeeded':
-                payment_object = event['object']
-                order_id = payment_object['metadata']['order_id']
-                
-                # Находим заказ и меняем статус на Оплачен
-                order = Order.objects.get(id=order_id)
-                order.status = 'paid'
-                order.save()
-                
-                return HttpResponse(status=200)
-                
-        except Exception as e:
-            return HttpResponse(status=400)
-    
-    return HttpResponse(status=405)
+    """
+    Обработчик вебхука от ЮКасса.
+
+    Уведомление только записывается в очередь (одна вставка, дубликаты
+    игнорируются); статус заказа меняет команда process_payment_events.
+    """
+    if request.method != 'POST':
+        return HttpResponse(status=405)
+
+    try:
+        record_event(json.loads(request.body))
+    except (ValueError, InvalidEvent):
+        return HttpResponse(status=400)
+
+    return HttpResponse(status=200)
 
 
 def payment_success(request, order_id):
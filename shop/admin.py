@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import *
+from .products_json import suppress_rebuilds
 
 @admin.register(CategoryShop)
 class CategoryShopAdmin(admin.ModelAdmin):
@@ -19,7 +20,17 @@ class ProductShopAdmin(admin.ModelAdmin):
     list_editable = ('is_bestseller', 'is_promo', 'quantity', 'price', 'discount')
     search_fields = ['title']
 
+    def changelist_view(self, request, extra_context=None):
+        # list_editable и массовые действия сохраняют много строк за запрос —
+        # products.json пересобирается один раз после всех изменений
+        with suppress_rebuilds():
+            return super().changelist_view(request, extra_context)
+
 
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug':('image',)}
+
+    def changelist_view(self, request, extra_context=None):
+        with suppress_rebuilds():
+            return super().changelist_view(request, extra_context)
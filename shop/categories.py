@@ -0,0 +1,171 @@
+"""
+Дерево категорий и подкатегорий в памяти процесса.
+
+Категории меняются несколько раз в год, а нужны почти каждой странице
+каталога. ``get_tree()`` строит неизменяемое дерево двумя запросами и держит
+его в памяти процесса; выбранные категория и подкатегория находятся по slug
+без обращения к базе.
+
+Актуальность проверяется по номеру версии в кэше Django (ключ
+``CATEGORY_TREE_VERSION_KEY``). Сигналы сохранения и удаления категорий
+увеличивают версию (в том числе после фиксации транзакции), и каждый процесс при
+следующем обращении перестраивает дерево. Чтобы сброс доходил до всех
+процессов, кэш по умолчанию (``CACHES['default']``) должен быть общим.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db import transaction
+
+from shop.models import CategoryShop, SubcategoryShop
+
+CATEGORY_TREE_VERSION_KEY = 'shop:category_tree:version'
+
+_lock = threading.Lock()
+_tree = None
+
+
+@dataclass(frozen=True)
+class SubcategoryNode:
+    """
+    Подкатегория в дереве.
+
+    Attributes:
+        pk (int): ID подкатегории.
+        title (str): Название.
+        slug (str | None): URL-идентификатор.
+        category (CategoryNode): Родительская категория.
+    """
+    pk: int
+    title: str
+    slug: str
+    category: 'CategoryNode' = field(default=None, compare=False, repr=False)
+
+    def __str__(self):
+        return self.title
+
+
+@dataclass(frozen=True)
+class CategoryNode:
+    """
+    Категория в дереве.
+
+    Attributes:
+        pk (int): ID категории.
+        title (str): Название.
+        slug (str | None): URL-идентификатор.
+        subcategories (tuple[SubcategoryNode]): Подкатегории в порядке ID.
+    """
+    pk: int
+    title: str
+    slug: str
+    subcategories: tuple = ()
+
+    def __str__(self):
+        return self.title
+
+
+@dataclass(frozen=True)
+class CategoryTree:
+    """
+    Неизменяемый снимок дерева категорий.
+
+    Attributes:
+        version: Версия из кэша, для которой построено дерево.
+        categories (tuple[CategoryNode]): Категории в порядке ID.
+        subcategories (tuple[SubcategoryNode]): Все подкатегории в порядке ID.
+        category_by_slug (dict): slug -> CategoryNode.
+        subcategory_by_slug (dict): slug -> SubcategoryNode.
+        category_by_pk (dict): ID -> CategoryNode.
+        subcategory_by_pk (dict): ID -> SubcategoryNode.
+    """
+    version: object
+    categories: tuple
+    subcategories: tuple
+    category_by_slug: dict
+    subcategory_by_slug: dict
+    category_by_pk: dict
+    subcategory_by_pk: dict
+
+    def category(self, slug):
+        """Возвращает категорию по slug или None."""
+        return self.category_by_slug.get(slug) if slug else None
+
+    def subcategory(self, slug):
+        """Возвращает подкатегорию по slug или None."""
+        return self.subcategory_by_slug.get(slug) if slug else None
+
+
+def build_tree(version=None):
+    """Строит дерево категорий двумя запросами к базе."""
+    children = {}
+    for sub in SubcategoryShop.objects.order_by('pk').values('pk', 'title', 'slug', 'category_id'):
+        children.setdefault(sub['category_id'], []).append(sub)
+
+    categories = []
+    subcategories = []
+    for row in CategoryShop.objects.order_by('pk').values('pk', 'title', 'slug'):
+        nodes = tuple(
+            SubcategoryNode(sub['pk'], sub['title'], sub['slug']) for sub in children.get(row['pk'], ())
+        )
+        category = CategoryNode(row['pk'], row['title'], row['slug'], nodes)
+        for node in nodes:
+            # Обратная ссылка на родителя появляется после создания категории
+            object.__setattr__(node, 'category', category)
+        categories.append(category)
+        subcategories.extend(nodes)
+
+    return CategoryTree(
+        version=version,
+        categories=tuple(categories),
+        subcategories=tuple(sorted(subcategories, key=lambda node: node.pk)),
+        category_by_slug={node.slug: node for node in categories if node.slug},
+        subcategory_by_slug={node.slug: node for node in subcategories if node.slug},
+        category_by_pk={node.pk: node for node in categories},
+        subcategory_by_pk={node.pk: node for node in subcategories},
+    )
+
+
+def get_version():
+    """Возвращает текущую версию дерева, создавая её при первом обращении."""
+    version = cache.get(CATEGORY_TREE_VERSION_KEY)
+    if version is None:
+        cache.add(CATEGORY_TREE_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATEGORY_TREE_VERSION_KEY)
+    return version
+
+
+def get_tree():
+    """Возвращает дерево категорий, перестраивая его, если версия изменилась."""
+    global _tree
+
+    version = get_version()
+    tree = _tree
+    if tree is not None and tree.version == version:
+        return tree
+
+    with _lock:
+        if _tree is None or _tree.version != version:
+            _tree = build_tree(version)
+        return _tree
+
+
+def bump_version():
+    """Делает дерево устаревшим во всех процессах."""
+    try:
+        cache.incr(CATEGORY_TREE_VERSION_KEY)
+    except ValueError:
+        cache.set(CATEGORY_TREE_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate():
+    """
+    Сбрасывает дерево сразу и ещё раз после фиксации текущей транзакции.
+
+    Повторный сброс нужен, потому что до фиксации другой процесс мог успеть
+    перестроить дерево по старым данным.
+    """
+    bump_version()
+    transaction.on_commit(bump_version)
@@ -0,0 +1,251 @@
+"""
+Счётчики фасетов каталога: категории, подкатегории, наличие, акции, хиты
+продаж и ценовые диапазоны.
+
+Счётчики хранятся в таблице ``ProductFacetCount`` и поддерживаются
+инкрементально: сигналы товаров вычисляют ключи фасетов до и после изменения
+(исходные значения запоминает ``LoadedStateMixin``, а для товаров, загруженных
+без нужных полей, они читаются одним SELECT перед сохранением) и применяют
+разницу одним ``INSERT ... ON CONFLICT DO UPDATE``. Каждый фасет считается для всего
+каталога (scope 0) и внутри категории товара, поэтому страница каталога и
+страница категории читают свои счётчики одним запросом, а не GROUP BY по
+товарам.
+
+``QuerySet.update()`` полей из ``SOURCE_FIELDS`` сигналов не вызывает и
+счётчики не меняет: после него нужно вызвать ``record_stock_change()`` (для
+остатков) или команду rebuild_facet_counts.
+
+Фасеты результатов поиска считаются по товарам, найденным в индексе FTS5,
+то есть пропорционально количеству совпадений, а не размеру каталога.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from shop.models import ProductFacetCount, ProductShop
+from shop.search import search_products
+
+ALL_SCOPE = 0
+
+CATEGORY = 'category'
+SUBCATEGORY = 'subcategory'
+IN_STOCK = 'in_stock'
+PROMO = 'promo'
+BESTSELLER = 'bestseller'
+PRICE_BAND = 'price_band'
+
+# Поля товара, из которых вычисляются фасеты, в порядке аргументов facet_keys()
+SOURCE_FIELDS = ('category_id', 'subcategory_id', 'quantity', 'is_promo', 'is_bestseller', 'effective_price')
+
+# Границы ценовых диапазонов по умолчанию, если PRODUCT_PRICE_BANDS не задана
+DEFAULT_PRICE_BANDS = (1000, 5000, 10000, 50000)
+
+_UPSERT_SQL = f'''
+    INSERT INTO "{ProductFacetCount._meta.db_table}" (scope, facet, value, "count")
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (scope, facet, value) DO UPDATE SET "count" = "count" + excluded."count"
+'''
+
+
+def get_price_bands():
+    """Возвращает границы ценовых диапазонов из настроек."""
+    return tuple(getattr(settings, 'PRODUCT_PRICE_BANDS', DEFAULT_PRICE_BANDS))
+
+
+def price_band_labels():
+    """Возвращает метки ценовых диапазонов по возрастанию: «0-1000», …, «50000+»."""
+    bands = get_price_bands()
+    lower = (0,) + bands
+    return tuple(f'{low}-{high}' for low, high in zip(lower, bands)) + (f'{bands[-1]}+',)
+
+
+def price_band(price):
+    """Возвращает метку ценового диапазона для цены."""
+    bands = get_price_bands()
+    low = 0
+    for high in bands:
+        if price < high:
+            return f'{low}-{high}'
+        low = high
+    return f'{low}+'
+
+
+def facet_keys(category_id, subcategory_id, quantity, is_promo, is_bestseller, price):
+    """
+    Возвращает ключи (scope, facet, value), в которые попадает товар.
+
+    Каждый фасет учитывается для всего каталога и для категории товара.
+    Ценовой диапазон определяется по цене со скидкой.
+    """
+    values = [(CATEGORY, str(category_id)), (PRICE_BAND, price_band(price))]
+    if subcategory_id:
+        values.append((SUBCATEGORY, str(subcategory_id)))
+    if quantity:
+        values.append((IN_STOCK, '1'))
+    if is_promo:
+        values.append((PROMO, '1'))
+    if is_bestseller:
+        values.append((BESTSELLER, '1'))
+    return [(scope, facet, value) for scope in (ALL_SCOPE, category_id) for facet, value in values]
+
+
+def product_keys(product, loaded=False):
+    """
+    Ключи фасетов товара по текущим значениям или по значениям на момент загрузки.
+
+    Returns:
+        list | None: Ключи или None, если исходные значения неизвестны
+        (товар создан в памяти или загружен без нужных полей).
+    """
+    if not loaded:
+        return facet_keys(*(getattr(product, name) for name in SOURCE_FIELDS))
+    state = getattr(product, '_loaded_state', {})
+    if any(name not in state for name in SOURCE_FIELDS):
+        return None
+    return facet_keys(*(state[name] for name in SOURCE_FIELDS))
+
+
+def stored_state(pk):
+    """
+    Значения полей фасетов товара, сохранённые в базе данных (один SELECT).
+
+    Returns:
+        dict | None: Поле -> значение или None, если товара ещё нет в базе.
+    """
+    return ProductShop.objects.filter(pk=pk).values(*SOURCE_FIELDS).first()
+
+
+def state_keys(state):
+    """Ключи фасетов по словарю значений полей из SOURCE_FIELDS."""
+    return facet_keys(*(state[name] for name in SOURCE_FIELDS))
+
+
+def apply_deltas(deltas):
+    """
+    Прибавляет изменения к счётчикам одним пакетным upsert.
+
+    Args:
+        deltas (Counter): (scope, facet, value) -> изменение количества.
+    """
+    rows = [(scope, facet, value, delta) for (scope, facet, value), delta in deltas.items() if delta]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(_UPSERT_SQL, rows)
+
+
+def record_change(old_keys=(), new_keys=()):
+    """Применяет переход товара из фасетов old_keys в фасеты new_keys."""
+    deltas = Counter(new_keys)
+    deltas.subtract(Counter(old_keys))
+    apply_deltas(deltas)
+
+
+def record_stock_change(changes):
+    """
+    Учитывает изменение остатков групповым UPDATE (сигналы при этом не вызываются).
+
+    Args:
+        changes (Iterable[tuple]): (ID категории, остаток до, остаток после).
+    """
+    deltas = Counter()
+    for category_id, before, after in changes:
+        if bool(before) == bool(after):
+            continue
+        delta = 1 if after else -1
+        for scope in (ALL_SCOPE, category_id):
+            deltas[(scope, IN_STOCK, '1')] += delta
+    apply_deltas(deltas)
+
+
+def rebuild(chunk_size=2000):
+    """
+    Полностью пересчитывает таблицу счётчиков по текущему каталогу.
+
+    Returns:
+        int: Количество строк счётчиков.
+    """
+    counts = Counter()
+    for values in ProductShop.objects.values_list(*SOURCE_FIELDS).iterator(chunk_size=chunk_size):
+        counts.update(facet_keys(*values))
+
+    with transaction.atomic():
+        ProductFacetCount.objects.all().delete()
+        ProductFacetCount.objects.bulk_create(
+            ProductFacetCount(scope=scope, facet=facet, value=value, count=count)
+            for (scope, facet, value), count in counts.items()
+        )
+    return len(counts)
+
+
+@dataclass(frozen=True)
+class FacetCounts:
+    """
+    Счётчики фасетов для шаблона.
+
+    Attributes:
+        categories (dict): ID категории -> количество товаров.
+        subcategories (dict): ID подкатегории -> количество товаров.
+        in_stock (int): Товаров в наличии.
+        promo (int): Товаров по акции.
+        bestseller (int): Хитов продаж.
+        price_bands (tuple): Пары (метка диапазона, количество) по возрастанию цены.
+    """
+    categories: dict = field(default_factory=dict)
+    subcategories: dict = field(default_factory=dict)
+    in_stock: int = 0
+    promo: int = 0
+    bestseller: int = 0
+    price_bands: tuple = ()
+
+    @classmethod
+    def from_counts(cls, menu, scoped):
+        """
+        Собирает счётчики из словарей (facet, value) -> количество.
+
+        Args:
+            menu (dict): Счётчики меню категорий (весь каталог или результаты поиска).
+            scoped (dict): Счётчики флагов и цен для текущей выборки.
+        """
+        return cls(
+            categories={int(value): count for (facet, value), count in menu.items() if facet == CATEGORY and count},
+            subcategories={int(value): count for (facet, value), count in menu.items() if facet == SUBCATEGORY and count},
+            in_stock=scoped.get((IN_STOCK, '1'), 0),
+            promo=scoped.get((PROMO, '1'), 0),
+            bestseller=scoped.get((BESTSELLER, '1'), 0),
+            price_bands=tuple(
+                (label, scoped[(PRICE_BAND, label)]) for label in price_band_labels()
+                if scoped.get((PRICE_BAND, label))
+            ),
+        )
+
+
+def get_counts(category_id=None):
+    """
+    Читает счётчики одним запросом.
+
+    Args:
+        category_id (int, optional): Категория, для которой считаются флаги и цены.
+            Меню категорий всегда считается по всему каталогу.
+    """
+    scope = category_id or ALL_SCOPE
+    counts = {ALL_SCOPE: {}, scope: {}}
+    rows = ProductFacetCount.objects.filter(scope__in={ALL_SCOPE, scope}, count__gt=0)
+    for row_scope, facet, value, count in rows.values_list('scope', 'facet', 'value', 'count'):
+        counts[row_scope][(facet, value)] = count
+    return FacetCounts.from_counts(counts[ALL_SCOPE], counts[scope])
+
+
+def search_counts(query):
+    """
+    Считает фасеты по результатам поиска.
+
+    Перебираются только товары, найденные в индексе FTS5, с минимальным
+    набором полей.
+    """
+    counts = Counter()
+    for values in search_products(query).order_by().values_list(*SOURCE_FIELDS):
+        counts.update((facet, value) for scope, facet, value in facet_keys(*values) if scope == ALL_SCOPE)
+    return FacetCounts.from_counts(counts, counts)
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
+from shop import products_json
 from shop.models import ProductShop, CategoryShop
-from django.conf import settings
 import json
 import os
 from datetime import datetime
@@ -129,11 +129,15 @@ class Command(BaseCommand):
         }
 
         # Write to file
-        json_file_path = os.path.join(settings.BASE_DIR, 'static', 'products.json')
+        json_file_path = products_json.get_file_path()
 
         try:
-            with open(json_file_path, 'w', encoding='utf-8') as f:
+            # Пишем во временный файл и атомарно подменяем, чтобы читатели
+            # никогда не видели частично записанный файл
+            tmp_file_path = f'{json_file_path}.{uuid.uuid4().hex}.tmp'
+            with open(tmp_file_path, 'w', encoding='utf-8') as f:
                 json.dump(json_data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file_path, json_file_path)
 
             self.stdout.write(self.style.SUCCESS(f'Successfully generated products.json with {len(products_data)} products'))
         except Exception as e:
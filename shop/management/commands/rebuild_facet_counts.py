@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from shop import facets
+
+
+class Command(BaseCommand):
+    help = 'Recomputes catalog facet counts from the current products'
+
+    def handle(self, *args, **options):
+        count = facets.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {count} facet counts'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text product search index'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write(self.style.WARNING('Full-text search index requires SQLite, nothing to rebuild'))
+            return
+
+        with transaction.atomic():
+            count = search.rebuild_index()
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully indexed {count} products'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from shop import facets, pricing
+
+
+class Command(BaseCommand):
+    help = 'Recomputes stored discounted prices and facet counts after bulk repricing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of products per transaction')
+
+    def handle(self, *args, **options):
+        updated = pricing.refresh_effective_prices(chunk_size=options['chunk_size'])
+        facets.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Successfully repriced {updated} products'))
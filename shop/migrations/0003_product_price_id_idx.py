@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0002_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productshop',
+            index=models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+        ),
+    ]
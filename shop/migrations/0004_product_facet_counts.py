@@ -0,0 +1,76 @@
+# Generated by Django 6.0 on 2026-10-17 19:10
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Логика заполнения зафиксирована на момент миграции и не зависит от shop.facets
+DEFAULT_PRICE_BANDS = (1000, 5000, 10000, 50000)
+SOURCE_FIELDS = ('category_id', 'subcategory_id', 'quantity', 'is_promo', 'is_bestseller', 'price')
+
+
+def price_band(price, bands):
+    low = 0
+    for high in bands:
+        if price < high:
+            return f'{low}-{high}'
+        low = high
+    return f'{low}+'
+
+
+def facet_keys(category_id, subcategory_id, quantity, is_promo, is_bestseller, price, bands):
+    values = [('category', str(category_id)), ('price_band', price_band(price, bands))]
+    if subcategory_id:
+        values.append(('subcategory', str(subcategory_id)))
+    if quantity:
+        values.append(('in_stock', '1'))
+    if is_promo:
+        values.append(('promo', '1'))
+    if is_bestseller:
+        values.append(('bestseller', '1'))
+    return [(scope, facet, value) for scope in (0, category_id) for facet, value in values]
+
+
+def fill_facet_counts(apps, schema_editor):
+    """Заполняет счётчики фасетов по текущему каталогу."""
+    ProductShop = apps.get_model('shop', 'ProductShop')
+    ProductFacetCount = apps.get_model('shop', 'ProductFacetCount')
+    bands = tuple(getattr(settings, 'PRODUCT_PRICE_BANDS', DEFAULT_PRICE_BANDS))
+
+    counts = Counter()
+    for values in ProductShop.objects.values_list(*SOURCE_FIELDS).iterator(chunk_size=2000):
+        counts.update(facet_keys(*values, bands))
+
+    ProductFacetCount.objects.all().delete()
+    ProductFacetCount.objects.bulk_create(
+        ProductFacetCount(scope=scope, facet=facet, value=value, count=count)
+        for (scope, facet, value), count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_product_price_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.PositiveIntegerField(default=0, verbose_name='Категория (0 — весь каталог)')),
+                ('facet', models.CharField(max_length=32, verbose_name='Фасет')),
+                ('value', models.CharField(max_length=32, verbose_name='Значение')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество товаров')),
+            ],
+            options={
+                'verbose_name': 'Счётчик фасета',
+                'verbose_name_plural': 'Счётчики фасетов',
+                'db_table': 'ProductFacetCount',
+                'constraints': [models.UniqueConstraint(fields=('scope', 'facet', 'value'), name='unique_product_facet')],
+            },
+        ),
+        migrations.RunPython(fill_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 6.0 on 2026-10-17 20:40
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Логика заполнения зафиксирована на момент миграции и не зависит от shop.facets и shop.pricing
+DEFAULT_PRICE_BANDS = (1000, 5000, 10000, 50000)
+SOURCE_FIELDS = ('category_id', 'subcategory_id', 'quantity', 'is_promo', 'is_bestseller', 'effective_price')
+
+
+def discounted_price(price, discount):
+    if discount:
+        return round(price - price * discount / 100, 2)
+    return price
+
+
+def price_band(price, bands):
+    low = 0
+    for high in bands:
+        if price < high:
+            return f'{low}-{high}'
+        low = high
+    return f'{low}+'
+
+
+def facet_keys(category_id, subcategory_id, quantity, is_promo, is_bestseller, price, bands):
+    values = [('category', str(category_id)), ('price_band', price_band(price, bands))]
+    if subcategory_id:
+        values.append(('subcategory', str(subcategory_id)))
+    if quantity:
+        values.append(('in_stock', '1'))
+    if is_promo:
+        values.append(('promo', '1'))
+    if is_bestseller:
+        values.append(('bestseller', '1'))
+    return [(scope, facet, value) for scope in (0, category_id) for facet, value in values]
+
+
+def fill_effective_prices(apps, schema_editor):
+    """Заполняет цену со скидкой и пересчитывает ценовые диапазоны фасетов по ней."""
+    ProductShop = apps.get_model('shop', 'ProductShop')
+    ProductFacetCount = apps.get_model('shop', 'ProductFacetCount')
+    bands = tuple(getattr(settings, 'PRODUCT_PRICE_BANDS', DEFAULT_PRICE_BANDS))
+
+    last_pk = 0
+    while True:
+        products = list(
+            ProductShop.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'price', 'discount')[:500]
+        )
+        if not products:
+            break
+        for product in products:
+            product.effective_price = discounted_price(product.price, product.discount)
+        ProductShop.objects.bulk_update(products, ['effective_price'])
+        last_pk = products[-1].pk
+
+    counts = Counter()
+    for values in ProductShop.objects.values_list(*SOURCE_FIELDS).iterator(chunk_size=2000):
+        counts.update(facet_keys(*values, bands))
+
+    ProductFacetCount.objects.all().delete()
+    ProductFacetCount.objects.bulk_create(
+        ProductFacetCount(scope=scope, facet=facet, value=value, count=count)
+        for (scope, facet, value), count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_product_facet_counts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='productshop',
+            name='product_price_id_idx',
+        ),
+        migrations.AddField(
+            model_name='productshop',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=7, verbose_name='Цена со скидкой'),
+        ),
+        migrations.RunPython(fill_effective_prices, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='productshop',
+            index=models.Index(fields=['effective_price', 'id'], name='product_eff_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productshop',
+            index=models.Index(fields=['category', 'effective_price', 'id'], name='product_cat_eff_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productshop',
+            index=models.Index(fields=['subcategory', 'effective_price', 'id'], name='product_subcat_eff_price_idx'),
+        ),
+    ]
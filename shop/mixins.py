@@ -1,36 +1,31 @@
-from django.db.models import Q
-from shop.models import CategoryShop, ProductShop
+from decimal import Decimal, InvalidOperation
+
+from shop import search
+from shop.models import ProductShop
+from shop.pagination import KeysetPaginator, paginate_by_cursor
 
 class SearchMixin:
     """
     Миксин для добавления логики поиска в представления.
-    Выполняет поиск по товарам (название, описание) и категориям.
+    Выполняет поиск по товарам (название, описание) и категориям
+    с помощью полнотекстового индекса (см. shop.search).
     """
     search_query = ''
     search_results = None
 
     def get_search_results(self):
         """
-        Выполняет поиск и возвращает QuerySet с результатами.
+        Выполняет поиск по полнотекстовому индексу и возвращает QuerySet с результатами,
+        упорядоченными по релевантности.
         """
         self.search_query = self.request.GET.get('search', '').strip()
         
         if not self.search_query:
             return ProductShop.objects.none() # Возвращаем пустой QuerySet, если поиск пустой
 
-        search_query_lower = self.search_query.lower()
-
-        # 1. Поиск по товарам (название и описание)
-        product_search = ProductShop.objects.filter(
-            Q(title__icontains=self.search_query) | Q(description__icontains=self.search_query)
-        )
-
-        # 2. Поиск по категориям (находим ID категорий и ищем товары в них)
-        category_ids = CategoryShop.objects.filter(title__icontains=self.search_query).values_list('id', flat=True)
-        category_products_search = ProductShop.objects.filter(category_id__in=category_ids)
-
-        # Объединяем результаты и убираем дубликаты
-        return (product_search | category_products_search).distinct()
+        # Индекс содержит название, описание и категорию товара,
+        # поэтому один запрос заменяет три LIKE-сканирования и DISTINCT
+        return search.search_products(self.search_query)
 
     def get_context_data(self, **kwargs):
         """
@@ -48,4 +43,81 @@ class SearchMixin:
         context['search_query'] = self.search_query
         context['search_results'] = self.search_results
         
-        return context
\ No newline at end of file
+        return context
+
+class KeysetPaginationMixin:
+    """
+    Миксин для ListView, добавляющий режим пагинации по ключу (курсору).
+
+    Режим включается параметром ``?cursor=`` (пустое значение — первая страница).
+    Работает для любой сортировки по полям модели (pk добавляется как
+    дополнительный ключ); если сортировка не поддерживается (например, по
+    релевантности поиска), используется обычная постраничная пагинация.
+    С ``keyset_always = True`` режим курсора используется всегда.
+    """
+    cursor_kwarg = 'cursor'
+    keyset_with_count = False  # Выполнять ли COUNT(*) в режиме курсора
+    keyset_always = False  # Использовать курсор и без параметра ?cursor=
+    keyset_page = None
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Возвращает страницу по курсору, если режим включён, иначе — стандартную пагинацию.
+        """
+        keyset_requested = self.keyset_always or self.cursor_kwarg in self.request.GET
+        if keyset_requested and KeysetPaginator.supports(queryset.model, queryset.query.order_by):
+            self.keyset_page = paginate_by_cursor(
+                queryset,
+                page_size,
+                self.request.GET.get(self.cursor_kwarg),
+                with_count=self.keyset_with_count,
+            )
+            return None, self.keyset_page, self.keyset_page.object_list, self.keyset_page.has_other_pages()
+        return super().paginate_queryset(queryset, page_size)
+
+    def get_context_data(self, **kwargs):
+        """
+        Добавляет в контекст флаг режима курсора.
+        """
+        context = super().get_context_data(**kwargs)
+        context['keyset_pagination'] = self.keyset_page is not None
+        return context
+
+
+class PriceRangeMixin:
+    """
+    Миксин для ListView товаров: фильтр по цене со скидкой (``?price_min=&price_max=``).
+
+    Фильтр применяется к ``effective_price``, поэтому выполняется поиском по
+    диапазону индекса и совпадает с ценой, которую видит покупатель.
+    Некорректные значения игнорируются.
+    """
+    price_min_kwarg = 'price_min'
+    price_max_kwarg = 'price_max'
+
+    def _parse_price(self, name):
+        value = self.request.GET.get(name, '').strip().replace(',', '.')
+        try:
+            price = Decimal(value)
+        except InvalidOperation:
+            return None
+        return price if price.is_finite() and price >= 0 else None
+
+    def get_price_range(self):
+        """Возвращает пару (минимальная цена, максимальная цена); None — без ограничения."""
+        return self._parse_price(self.price_min_kwarg), self._parse_price(self.price_max_kwarg)
+
+    def filter_price_range(self, queryset):
+        """Ограничивает QuerySet диапазоном цены со скидкой."""
+        price_min, price_max = self.get_price_range()
+        if price_min is not None:
+            queryset = queryset.filter(effective_price__gte=price_min)
+        if price_max is not None:
+            queryset = queryset.filter(effective_price__lte=price_max)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        """Добавляет в контекст выбранный диапазон цены для формы фильтра."""
+        context = super().get_context_data(**kwargs)
+        context['price_min'], context['price_max'] = self.get_price_range()
+        return context
@@ -1,6 +1,22 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Subquery, Value
 from django.utils import timezone
 
+from main.querycache import RequestCachedQuerySet
+from main.tracking import LoadedStateMixin
+
+
+def discounted_price(price, discount):
+    """
+    Вычисляет цену с учётом скидки в процентах.
+
+    Returns:
+        Decimal: Цена после скидки, округлённая до копеек.
+    """
+    if discount:
+        return round(price - price * discount / 100, 2)
+    return price
+
 
 class CategoryShop(models.Model):
     """
@@ -21,6 +37,8 @@ class CategoryShop(models.Model):
     title = models.CharField(max_length=200, unique=True, verbose_name='Название категории')
     slug = models.SlugField(max_length=200, unique=True, null=True, blank=True, verbose_name='URL')
 
+    objects = RequestCachedQuerySet.as_manager()
+
     class Meta:
         db_table = 'CategoryShop'
         verbose_name = 'Категорию'
@@ -53,6 +71,8 @@ class SubcategoryShop(models.Model):
         to=CategoryShop, on_delete=models.CASCADE, related_name='subcategories', verbose_name='Категория'
     )
 
+    objects = RequestCachedQuerySet.as_manager()
+
     class Meta:
         db_table = 'SubcategoryShop'
         verbose_name = 'Подкатегория'
@@ -62,7 +82,54 @@ class SubcategoryShop(models.Model):
         return self.title
 
 
-class ProductShop(models.Model):
+class ProductShopQuerySet(RequestCachedQuerySet):
+    """
+    QuerySet товаров с проекцией для карточек в списках.
+
+    Methods:
+        cards(user): Загружает только поля карточки, URL основного изображения
+            и признак «в избранном» для пользователя за один запрос.
+
+    Результаты кэшируются на время HTTP-запроса (см. main/querycache.py).
+    """
+
+    # Поля, которые используются в шаблонах карточек товара
+    CARD_FIELDS = (
+        'id', 'title', 'slug', 'price', 'discount', 'effective_price', 'quantity',
+        'category_id', 'subcategory__id', 'subcategory__title',
+    )
+
+    def cards(self, user=None):
+        """
+        Возвращает QuerySet для отображения карточек товаров.
+
+        Основное изображение и признак избранного вычисляются подзапросами,
+        поэтому страница карточек загружается фиксированным количеством запросов
+        независимо от количества товаров.
+
+        Args:
+            user (User, optional): Текущий пользователь (для признака избранного).
+
+        Returns:
+            QuerySet: Товары с аннотациями ``primary_image`` и ``is_favorited``.
+        """
+        primary_image = ProductImage.objects.filter(product=OuterRef('pk')).order_by('pk').values('image')[:1]
+
+        if user is not None and user.is_authenticated:
+            favorites = ProductShop.favorited_by.through.objects.filter(
+                user_id=user.pk, productshop_id=OuterRef('pk')
+            )
+            is_favorited = Exists(favorites)
+        else:
+            is_favorited = Value(False)
+
+        return self.select_related('subcategory').only(*self.CARD_FIELDS).annotate(
+            primary_image=Subquery(primary_image),
+            is_favorited=is_favorited,
+        )
+
+
+class ProductShop(LoadedStateMixin, models.Model):
     """
     Модель, представляющая товар в магазине.
 
@@ -72,6 +139,8 @@ class ProductShop(models.Model):
         slug (SlugField): URL-идентификатор товара. Уникальное поле длиной до 250 символов, может быть пустым.
         price (DecimalField): Цена товара. По умолчанию 0.00.
         discount (DecimalField): Скидка на товар в процентах. По умолчанию 0.00.
+        effective_price (DecimalField): Цена со скидкой, которую платит покупатель.
+            Пересчитывается при сохранении; по ней сортируются и фильтруются списки.
         quantity (PositiveIntegerField): Количество товара на складе. По умолчанию 0.
         category (ForeignKey): Связь с моделью CategoryShop, указывающая на категорию товара.
         subcategory (ForeignKey): Связь с моделью SubcategoryShop, указывающая на подкатегорию товара. Может быть пустой.
@@ -82,16 +151,24 @@ class ProductShop(models.Model):
         db_table (str): Имя таблицы в базе данных.
         verbose_name (str): читаемое имя модели в единственном числе.
         verbose_name_plural (str): читаемое имя модели во множественном числе.
+        indexes (list): Индексы для оптимизации запросов.
 
     Methods:
         __str__: Возвращает строковое представление товара с указанием его количества.
         sell_price: Вычисляет и возвращает цену товара с учетом скидки.
+        save: Сохраняет товар, пересчитывая effective_price.
+
+    Properties:
+        primary_image_url: Возвращает URL основного изображения товара.
     """
     title = models.CharField(max_length=150, unique=True, verbose_name='Название товара')
     description = models.TextField(blank=True, null=True, verbose_name='Описание товара')
     slug = models.SlugField(max_length=250, unique=True, blank=True, null=True, verbose_name='URL')
     price = models.DecimalField(default=0.00, max_digits=7, decimal_places=2, verbose_name='Цена')
     discount = models.DecimalField(default=0.00, max_digits=4, decimal_places=2, verbose_name='Скидка в %')
+    effective_price = models.DecimalField(
+        default=0.00, max_digits=7, decimal_places=2, editable=False, verbose_name='Цена со скидкой'
+    )
     quantity = models.PositiveIntegerField(default=0, verbose_name='Количество')
     category = models.ForeignKey(to=CategoryShop, on_delete=models.PROTECT, verbose_name='Категория товара')
     subcategory = models.ForeignKey(
@@ -106,10 +183,22 @@ class ProductShop(models.Model):
     is_bestseller = models.BooleanField(default=False, verbose_name='Хит продаж')
     is_promo = models.BooleanField(default=False, verbose_name='Акция')
 
+    objects = ProductShopQuerySet.as_manager()
+
+    # Поля, от которых зависят счётчики фасетов (см. shop/facets.py)
+    tracked_fields = ('category_id', 'subcategory_id', 'quantity', 'is_promo', 'is_bestseller', 'effective_price')
+
     class Meta:
         db_table = 'ProductShop'
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
+        indexes = [
+            # Сортировка, фильтр по цене и пагинация по ключу (цена со скидкой, id):
+            # по всему каталогу, внутри категории и внутри подкатегории
+            models.Index(fields=['effective_price', 'id'], name='product_eff_price_id_idx'),
+            models.Index(fields=['category', 'effective_price', 'id'], name='product_cat_eff_price_idx'),
+            models.Index(fields=['subcategory', 'effective_price', 'id'], name='product_subcat_eff_price_idx'),
+        ]
 
     def __str__(self):
         return f'{self.title} Количество - {self.quantity}'
@@ -121,9 +210,35 @@ class ProductShop(models.Model):
         Returns:
             Decimal: Цена товара после применения скидки (если скидка указана).
         """
-        if self.discount:
-            return round(self.price - self.price * self.discount / 100, 2)
-        return self.price
+        return discounted_price(self.price, self.discount)
+
+    def save(self, *args, **kwargs):
+        self.effective_price = self.sell_price()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'price', 'discount'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'effective_price'}
+        super().save(*args, **kwargs)
+
+    @property
+    def primary_image_url(self):
+        """
+        Возвращает URL основного (первого) изображения товара.
+
+        Использует аннотацию ``primary_image`` из ``ProductShopQuerySet.cards()``,
+        а без неё выполняет отдельный запрос.
+
+        Returns:
+            str: URL изображения или пустая строка, если изображений нет.
+        """
+        if hasattr(self, 'primary_image'):
+            name = self.primary_image
+        else:
+            image = self.images.first()
+            name = image.image.name if image else None
+
+        if not name:
+            return ''
+        return ProductImage._meta.get_field('image').storage.url(name)
 
 
 class ProductImage(models.Model):
@@ -153,4 +268,34 @@ class ProductImage(models.Model):
         verbose_name_plural = 'Изображения товаров'
 
     def __str__(self):
-        return f'Изображение для товара: {self.product.title}'
\ No newline at end of file
+        return f'Изображение для товара: {self.product.title}'
+
+class ProductFacetCount(models.Model):
+    """
+    Количество товаров в значении фасета каталога.
+
+    Таблица поддерживается инкрементально при изменении товаров
+    (см. shop/facets.py) и полностью пересчитывается командой
+    rebuild_facet_counts.
+
+    Attributes:
+        scope (PositiveIntegerField): ID категории, внутри которой посчитан фасет; 0 — весь каталог.
+        facet (CharField): Фасет: category, subcategory, in_stock, promo, bestseller, price_band.
+        value (CharField): Значение фасета (ID, «1» для флагов, метка ценового диапазона).
+        count (IntegerField): Количество товаров.
+    """
+    scope = models.PositiveIntegerField(default=0, verbose_name='Категория (0 — весь каталог)')
+    facet = models.CharField(max_length=32, verbose_name='Фасет')
+    value = models.CharField(max_length=32, verbose_name='Значение')
+    count = models.IntegerField(default=0, verbose_name='Количество товаров')
+
+    class Meta:
+        db_table = 'ProductFacetCount'
+        verbose_name = 'Счётчик фасета'
+        verbose_name_plural = 'Счётчики фасетов'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'facet', 'value'], name='unique_product_facet'),
+        ]
+
+    def __str__(self):
+        return f'{self.scope}:{self.facet}={self.value} ({self.count})'
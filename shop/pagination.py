@@ -0,0 +1,230 @@
+"""
+Пагинация по ключу (keyset / seek) для списков товаров.
+
+В отличие от стандартного Paginator не использует OFFSET и (по умолчанию)
+не выполняет COUNT(*): следующая страница выбирается условием
+``(поле, pk) > (последнее значение, последний pk)``, которое обслуживается индексом,
+поэтому стоимость страницы не зависит от её «глубины».
+
+Курсор — непрозрачная строка (base64 от JSON), содержащая значения ключа
+сортировки граничного объекта и направление перехода.
+"""
+import base64
+import binascii
+import json
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """Курсор не удалось разобрать или он не подходит к текущей сортировке."""
+
+
+class KeysetPage:
+    """
+    Страница результатов пагинации по ключу.
+
+    Attributes:
+        object_list (list): Объекты страницы.
+        has_next (bool): Есть ли следующая страница.
+        has_previous (bool): Есть ли предыдущая страница.
+        next_cursor (str | None): Курсор следующей страницы.
+        previous_cursor (str | None): Курсор предыдущей страницы.
+        count (int | None): Общее количество объектов (только если запрошено).
+    """
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor, count=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Пагинатор по ключу сортировки с добавлением pk для однозначности.
+
+    Args:
+        queryset (QuerySet): Исходный QuerySet (без срезов).
+        per_page (int): Количество объектов на странице.
+        ordering (Sequence[str]): Поля сортировки, например ``('-price',)``.
+            Если среди них нет pk, он добавляется в том же направлении, что и последнее поле.
+        with_count (bool): Выполнять ли COUNT(*) для общего количества.
+    """
+
+    def __init__(self, queryset, per_page, ordering, with_count=False):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.with_count = with_count
+        self.model = queryset.model
+        self.ordering = self._normalize_ordering(ordering)
+
+    def _normalize_ordering(self, ordering):
+        """Проверяет поля сортировки и добавляет pk как последний ключ."""
+        normalized = []
+        for item in ordering:
+            name = item.lstrip('-')
+            if name != 'pk':
+                try:
+                    field = self.model._meta.get_field(name)
+                except FieldDoesNotExist:
+                    raise ValueError(f'Поле "{name}" нельзя использовать для пагинации по ключу.')
+                if not field.concrete or field.is_relation or field.null:
+                    raise ValueError(f'Поле "{name}" нельзя использовать для пагинации по ключу.')
+            normalized.append(item)
+
+        names = [item.lstrip('-') for item in normalized]
+        if 'pk' not in names and self.model._meta.pk.name not in names:
+            descending = bool(normalized) and normalized[-1].startswith('-')
+            normalized.append('-pk' if descending else 'pk')
+        return tuple(normalized)
+
+    @staticmethod
+    def supports(model, ordering):
+        """Проверяет, можно ли построить пагинацию по ключу для данной сортировки."""
+        try:
+            KeysetPaginator(model._default_manager.none(), 1, ordering)
+        except ValueError:
+            return False
+        return True
+
+    def _field_names(self):
+        return [item.lstrip('-') for item in self.ordering]
+
+    def _get_field(self, name):
+        return self.model._meta.pk if name == 'pk' else self.model._meta.get_field(name)
+
+    def encode_cursor(self, obj, direction):
+        """
+        Формирует курсор по граничному объекту страницы.
+
+        Args:
+            obj (Model): Первый или последний объект страницы.
+            direction (str): 'n' — следующая страница, 'p' — предыдущая.
+        """
+        values = []
+        for name in self._field_names():
+            field = self._get_field(name)
+            values.append(field.value_to_string(obj))
+        raw = json.dumps({'v': values, 'd': direction}, separators=(',', ':'), ensure_ascii=False)
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        Разбирает курсор.
+
+        Returns:
+            tuple: (значения ключа, направление).
+
+        Raises:
+            InvalidCursor: Если курсор повреждён или не соответствует сортировке.
+        """
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            values, direction = data['v'], data['d']
+        except (ValueError, KeyError, TypeError, UnicodeError, binascii.Error):
+            raise InvalidCursor(cursor)
+
+        names = self._field_names()
+        if direction not in ('n', 'p') or not isinstance(values, list) or len(values) != len(names):
+            raise InvalidCursor(cursor)
+
+        try:
+            values = [self._get_field(name).to_python(value) for name, value in zip(names, values)]
+        except ValidationError:
+            raise InvalidCursor(cursor)
+        return values, direction
+
+    def _seek_filter(self, values, reverse):
+        """
+        Строит лексикографическое условие «строго после ключа» для текущей сортировки.
+
+        Для сортировки (a, b) условие имеет вид ``a >= x AND (a > x OR (a = x AND b > y))``;
+        направление сравнения каждого поля учитывает его порядок и флаг reverse.
+        Избыточное условие ``a >= x`` позволяет SQLite начать чтение индекса
+        сразу с курсора, а не просматривать все предшествующие записи.
+        """
+        conditions = []
+        for index, item in enumerate(self.ordering):
+            name = item.lstrip('-')
+            descending = item.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            equal_prefix = {
+                self.ordering[i].lstrip('-'): values[i] for i in range(index)
+            }
+            conditions.append(Q(**equal_prefix, **{f'{name}__{lookup}': values[index]}))
+        seek = reduce(lambda left, right: left | right, conditions)
+        if len(self.ordering) > 1:
+            first = self.ordering[0]
+            descending = first.startswith('-') != reverse
+            seek &= Q(**{f"{first.lstrip('-')}__{'lte' if descending else 'gte'}": values[0]})
+        return seek
+
+    @staticmethod
+    def _reverse_ordering(ordering):
+        return tuple(item[1:] if item.startswith('-') else f'-{item}' for item in ordering)
+
+    def page(self, cursor=None):
+        """
+        Возвращает страницу, начинающуюся после (или заканчивающуюся перед) курсором.
+
+        Args:
+            cursor (str, optional): Курсор, полученный с соседней страницы.
+
+        Raises:
+            InvalidCursor: Если курсор повреждён.
+        """
+        queryset = self.queryset
+        direction = 'n'
+        if cursor:
+            values, direction = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._seek_filter(values, reverse=direction == 'p'))
+
+        ordering = self.ordering if direction == 'n' else self._reverse_ordering(self.ordering)
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == 'p':
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        next_cursor = self.encode_cursor(rows[-1], 'n') if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], 'p') if rows and has_previous else None
+        count = self.queryset.count() if self.with_count else None
+
+        return KeysetPage(rows, has_next, has_previous, next_cursor, previous_cursor, count)
+
+
+def paginate_by_cursor(queryset, per_page, cursor, with_count=False):
+    """
+    Выполняет пагинацию по ключу, используя сортировку самого QuerySet.
+
+    Повреждённый курсор или курсор от другой сортировки (например, после
+    смены ``?sorting=`` в ссылке) даёт первую страницу, а не ошибку.
+
+    Returns:
+        KeysetPage: Страница результатов.
+    """
+    ordering = queryset.query.order_by or queryset.model._meta.ordering or ('-pk',)
+    paginator = KeysetPaginator(queryset, per_page, ordering, with_count=with_count)
+    try:
+        return paginator.page(cursor)
+    except InvalidCursor:
+        return paginator.page()
@@ -0,0 +1,40 @@
+"""
+Пересчёт сохранённой цены со скидкой (``ProductShop.effective_price``).
+
+``ProductShop.save()`` пересчитывает цену сам. После массового изменения
+цен или скидок через ``QuerySet.update()`` (сигналы и save() при этом не
+вызываются) нужно вызвать ``refresh_effective_prices()`` или команду
+refresh_effective_prices, которая заодно пересчитывает счётчики фасетов.
+"""
+from django.db import transaction
+
+from shop.models import ProductShop, discounted_price
+
+
+def refresh_effective_prices(chunk_size=500):
+    """
+    Пересчитывает effective_price пачками по pk и сохраняет только изменившиеся.
+
+    Returns:
+        int: Количество товаров с обновлённой ценой.
+    """
+    updated = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            products = list(
+                ProductShop.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .only('pk', 'price', 'discount', 'effective_price')[:chunk_size]
+            )
+            if not products:
+                return updated
+            changed = []
+            for product in products:
+                price = discounted_price(product.price, product.discount)
+                if product.effective_price != price:
+                    product.effective_price = price
+                    changed.append(product)
+            ProductShop.objects.bulk_update(changed, ['effective_price'])
+        updated += len(changed)
+        last_pk = products[-1].pk
@@ -0,0 +1,240 @@
+"""
+Планировщик перегенерации products.json.
+
+Сигналы каталога не пересобирают файл сами, а вызывают ``schedule_rebuild()``:
+после фиксации транзакции (пере)запускается таймер дребезга. Каждое новое
+изменение откладывает пересборку ещё на ``PRODUCTS_JSON_DEBOUNCE_SECONDS``,
+но не дальше ``PRODUCTS_JSON_MAX_WAIT_SECONDS`` от первого несобранного
+изменения, поэтому поток правок не откладывает файл бесконечно. Пересборка
+выполняется в фоновом потоке вне запроса.
+
+Одновременно выполняется не более одной пересборки: вызовы, пришедшие во
+время сборки, не ждут её и не запускают свою, а сливаются в одну повторную
+сборку сразу после текущей.
+
+Массовые операции оборачиваются в ``suppress_rebuilds()``: внутри блока
+пересборки только накапливаются, а при выходе планируется ровно одна.
+
+Для раздачи файла ``get_payload()`` держит в памяти уже сериализованное
+содержимое, его gzip-версию и ETag. Кэш обновляется только когда генератор
+записал новую версию файла (меняется mtime или размер).
+"""
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+DEFAULT_MAX_WAIT_SECONDS = 10.0
+
+_state_lock = threading.Lock()
+_build_lock = threading.Lock()
+_timer = None
+_deadline = None
+_rebuild_requested = False
+_local = threading.local()
+
+
+def get_debounce_seconds():
+    """Возвращает окно дребезга из настроек (0 — пересборка сразу после коммита)."""
+    return getattr(settings, 'PRODUCTS_JSON_DEBOUNCE_SECONDS', DEFAULT_DEBOUNCE_SECONDS)
+
+
+def get_max_wait_seconds():
+    """Возвращает наибольшую задержку пересборки от первого несобранного изменения."""
+    return getattr(settings, 'PRODUCTS_JSON_MAX_WAIT_SECONDS', DEFAULT_MAX_WAIT_SECONDS)
+
+
+def schedule_rebuild():
+    """
+    Помечает products.json как устаревший и планирует его пересборку.
+
+    Внутри ``suppress_rebuilds()`` только запоминает, что пересборка нужна.
+    """
+    if getattr(_local, 'suppress_depth', 0):
+        _local.pending = True
+        return
+
+    transaction.on_commit(_arm_timer)
+
+
+@contextmanager
+def suppress_rebuilds():
+    """
+    Контекстный менеджер для массовых операций над каталогом.
+
+    Пересборки, запрошенные внутри блока, сливаются в одну, которая
+    планируется при выходе из самого внешнего блока.
+    """
+    _local.suppress_depth = getattr(_local, 'suppress_depth', 0) + 1
+    try:
+        yield
+    finally:
+        _local.suppress_depth -= 1
+        if not _local.suppress_depth and getattr(_local, 'pending', False):
+            _local.pending = False
+            schedule_rebuild()
+
+
+def _arm_timer():
+    """
+    Перезапускает таймер пересборки (дребезг по последнему изменению).
+
+    Срок ожидания не превышает ``PRODUCTS_JSON_MAX_WAIT_SECONDS`` от
+    изменения, запустившего первый таймер.
+    """
+    global _timer, _deadline
+
+    delay = get_debounce_seconds()
+    if not delay:
+        rebuild_now()
+        return
+
+    with _state_lock:
+        now = time.monotonic()
+        if _timer is None:
+            _deadline = now + max(get_max_wait_seconds(), delay)
+        else:
+            _timer.cancel()
+        _timer = threading.Timer(min(delay, max(_deadline - now, 0)), _run_scheduled)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _run_scheduled():
+    """Точка входа фонового потока: снимает отметку таймера и пересобирает файл."""
+    global _timer, _deadline
+
+    with _state_lock:
+        # Таймер успел сработать, но уже заменён более поздним: пересоберёт тот
+        if _timer is not threading.current_thread():
+            return
+        _timer = _deadline = None
+    try:
+        rebuild_now()
+    finally:
+        connections.close_all()
+
+
+def cancel_scheduled():
+    """Отменяет запланированную пересборку (например, при остановке тестов)."""
+    global _timer, _deadline
+
+    with _state_lock:
+        if _timer is not None:
+            _timer.cancel()
+        _timer = _deadline = None
+
+
+def rebuild_now():
+    """
+    Пересобирает products.json.
+
+    Если файл уже собирается, вызов не ждёт: он отмечает, что нужна ещё одна
+    сборка, и её выполнит текущий сборщик сразу после своей (изменения могли
+    прийти во время сборки). Несколько таких вызовов дают одну сборку.
+    """
+    global _rebuild_requested
+
+    with _state_lock:
+        _rebuild_requested = True
+
+    while _build_lock.acquire(blocking=False):
+        try:
+            while True:
+                with _state_lock:
+                    if not _rebuild_requested:
+                        break
+                    _rebuild_requested = False
+                _generate()
+        finally:
+            _build_lock.release()
+        # Запрос мог прийти после последней проверки, но до освобождения
+        # блокировки: его автор не смог её взять, поэтому сборку выполняем мы
+        with _state_lock:
+            if not _rebuild_requested:
+                return
+
+
+def _generate():
+    output = io.StringIO()
+    try:
+        call_command('generate_products_json', stdout=output)
+    except Exception:
+        logger.exception('Error updating products.json')
+    else:
+        logger.info(output.getvalue().strip())
+
+
+@dataclass(frozen=True)
+class Payload:
+    """Сериализованная версия products.json, готовая к отдаче."""
+    body: bytes
+    gzipped: bytes
+    etag: str
+    gzip_etag: str
+    last_modified: float
+    version: tuple
+
+
+_payload = None
+_payload_lock = threading.Lock()
+
+
+def get_file_path():
+    """Возвращает путь к products.json (``PRODUCTS_JSON_PATH``, по умолчанию static/products.json)."""
+    return str(getattr(settings, 'PRODUCTS_JSON_PATH', os.path.join(settings.BASE_DIR, 'static', 'products.json')))
+
+
+def get_payload():
+    """
+    Возвращает закэшированное содержимое products.json.
+
+    На каждый вызов выполняется только ``os.stat``; файл читается и
+    сжимается заново лишь при появлении новой версии.
+
+    Raises:
+        FileNotFoundError: Если файл ещё не сгенерирован.
+
+    Returns:
+        Payload: Тело ответа, gzip-версия, ETag и время изменения.
+    """
+    global _payload
+
+    path = get_file_path()
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    payload = _payload
+    if payload is not None and payload.version == version:
+        return payload
+
+    with _payload_lock:
+        if _payload is not None and _payload.version == version:
+            return _payload
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        _payload = Payload(
+            body=body,
+            gzipped=gzip.compress(body, compresslevel=9, mtime=0),
+            etag=f'"{digest}"',
+            gzip_etag=f'"{digest}-gzip"',
+            last_modified=stat.st_mtime,
+            version=version,
+        )
+        return _payload
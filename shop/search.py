@@ -0,0 +1,174 @@
+"""
+Полнотекстовый поиск по товарам на основе SQLite FTS5.
+
+Индекс хранится в виртуальной таблице ``product_search`` (создаётся миграцией
+``shop.0002_product_search_index``). ``rowid`` строки индекса совпадает с
+``ProductShop.id``, а колонки содержат название, описание и название категории
+товара, поэтому поиск по категориям не требует отдельного подзапроса.
+
+Индекс поддерживается в актуальном состоянии сигналами из ``shop.signals``
+и может быть полностью перестроен командой ``rebuild_search_index``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from shop.models import CategoryShop, ProductShop
+
+SEARCH_TABLE = 'product_search'
+
+# Веса колонок для bm25: название важнее категории, категория важнее описания
+RANK_WEIGHTS = (10.0, 1.0, 3.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_INSERT_SQL = f'''
+    INSERT INTO {SEARCH_TABLE} (rowid, title, description, category)
+    SELECT p.id, p.title, COALESCE(p.description, ''), COALESCE(c.title, '')
+    FROM "{ProductShop._meta.db_table}" p
+    LEFT JOIN "{CategoryShop._meta.db_table}" c ON c.id = p.category_id
+'''
+
+
+def is_available():
+    """
+    Проверяет, поддерживает ли текущая база данных индекс FTS5.
+
+    Returns:
+        bool: True, если используется SQLite (индекс создаётся миграцией).
+    """
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(query):
+    """
+    Преобразует пользовательский ввод в безопасное выражение MATCH.
+
+    Каждое слово запроса превращается в префиксный терм ("слово"*),
+    термы объединяются через неявный AND. Спецсимволы синтаксиса FTS5
+    отбрасываются, поэтому пользователь не может сломать запрос.
+
+    Args:
+        query (str): Строка поиска.
+
+    Returns:
+        str: Выражение для MATCH или пустая строка, если слов нет.
+    """
+    tokens = _TOKEN_RE.findall(query.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_products(query, queryset=None):
+    """
+    Возвращает товары, найденные в индексе, с аннотацией релевантности.
+
+    Args:
+        query (str): Строка поиска.
+        queryset (QuerySet, optional): Базовый QuerySet товаров.
+
+    Returns:
+        QuerySet: Товары, упорядоченные по релевантности (поле ``search_rank``,
+        меньше — лучше).
+    """
+    if queryset is None:
+        queryset = ProductShop.objects.all()
+
+    match = build_match_query(query)
+    if not match:
+        return queryset.none()
+
+    if not is_available():
+        return _fallback_search(query, queryset)
+
+    table = ProductShop._meta.db_table
+    weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+    return queryset.filter(
+        pk__in=RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', (match,))
+    ).annotate(
+        search_rank=RawSQL(
+            f'SELECT bm25({SEARCH_TABLE}, {weights}) FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s AND rowid = "{table}"."id"',
+            (match,),
+        )
+    ).order_by('search_rank', '-pk')
+
+
+def _fallback_search(query, queryset):
+    """Поиск без индекса для баз данных, отличных от SQLite."""
+    return queryset.filter(
+        Q(title__icontains=query)
+        | Q(description__icontains=query)
+        | Q(category__title__icontains=query)
+    ).order_by('-pk')
+
+
+def index_products(product_ids):
+    """
+    Переиндексирует указанные товары (удалённые товары просто исключаются из индекса).
+
+    Args:
+        product_ids (Iterable[int]): Идентификаторы товаров.
+    """
+    product_ids = list(product_ids)
+    if not product_ids or not is_available():
+        return
+
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', product_ids)
+        cursor.execute(f'{_INSERT_SQL} WHERE p.id IN ({placeholders})', product_ids)
+
+
+def index_category(category_id):
+    """
+    Переиндексирует все товары категории (например, после переименования категории).
+
+    Args:
+        category_id (int): Идентификатор категории.
+    """
+    if not is_available():
+        return
+
+    table = ProductShop._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id FROM "{table}" WHERE category_id = %s)',
+            [category_id],
+        )
+        cursor.execute(f'{_INSERT_SQL} WHERE p.category_id = %s', [category_id])
+
+
+def remove_products(product_ids):
+    """
+    Удаляет товары из индекса.
+
+    Args:
+        product_ids (Iterable[int]): Идентификаторы товаров.
+    """
+    product_ids = list(product_ids)
+    if not product_ids or not is_available():
+        return
+
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', product_ids)
+
+
+def rebuild_index():
+    """
+    Полностью перестраивает индекс по текущему содержимому каталога.
+
+    Returns:
+        int: Количество проиндексированных товаров.
+    """
+    if not is_available():
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(_INSERT_SQL)
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE}')
+        return cursor.fetchone()[0]
@@ -1,31 +1,44 @@
-from django.db.models.signals import post_save, post_delete, pre_delete
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from shop.models import ProductShop, ProductImage
+from shop.models import CategoryShop, ProductShop, ProductImage, SubcategoryShop
+from shop import categories, facets, products_json, search
 from django.conf import settings
-import json
-import os
-from datetime import datetime
-from django.core.management import call_command
 
 @receiver(post_save, sender=ProductShop)
 def update_products_json_on_save(sender, instance, **kwargs):
     """
-    Signal receiver to update products.json when a product is saved
+    Signal receiver to schedule a products.json rebuild when a product is saved
     """
-    try:
-        call_command('generate_products_json')
-    except Exception as e:
-        print(f"Error updating products.json: {str(e)}")
+    products_json.schedule_rebuild()
 
 @receiver(post_delete, sender=ProductShop)
 def update_products_json_on_delete(sender, instance, **kwargs):
     """
-    Signal receiver to update products.json when a product is deleted
+    Signal receiver to schedule a products.json rebuild when a product is deleted
     """
-    try:
-        call_command('generate_products_json')
-    except Exception as e:
-        print(f"Error updating products.json: {str(e)}")
+    products_json.schedule_rebuild()
+
+@receiver(post_save, sender=ProductShop)
+def update_search_index_on_save(sender, instance, **kwargs):
+    """
+    Signal receiver to reindex a product in the full-text search index
+    """
+    search.index_products([instance.pk])
+
+@receiver(post_delete, sender=ProductShop)
+def update_search_index_on_delete(sender, instance, **kwargs):
+    """
+    Signal receiver to remove a deleted product from the full-text search index
+    """
+    search.remove_products([instance.pk])
+
+@receiver(post_save, sender=CategoryShop)
+def update_search_index_on_category_save(sender, instance, created, **kwargs):
+    """
+    Signal receiver to reindex category products when the category title changes
+    """
+    if not created:
+        search.index_category(instance.pk)
 
 @receiver(pre_delete, sender=ProductShop)
 def delete_product_images_on_delete(sender, instance, **kwargs):
@@ -52,19 +65,62 @@ def delete_product_images_on_delete(sender, instance, **kwargs):
 @receiver(post_save, sender=ProductImage)
 def update_products_json_on_image_save(sender, instance, **kwargs):
     """
-    Signal receiver to update products.json when a product image is saved
+    Signal receiver to schedule a products.json rebuild when a product image is saved
     """
-    try:
-        call_command('generate_products_json')
-    except Exception as e:
-        print(f"Error updating products.json: {str(e)}")
+    products_json.schedule_rebuild()
 
 @receiver(post_delete, sender=ProductImage)
 def update_products_json_on_image_delete(sender, instance, **kwargs):
     """
-    Signal receiver to update products.json when a product image is deleted
+    Signal receiver to schedule a products.json rebuild when a product image is deleted
+    """
+    products_json.schedule_rebuild()
+
+@receiver(post_save, sender=CategoryShop)
+@receiver(post_save, sender=SubcategoryShop)
+def invalidate_category_tree_on_save(sender, instance, **kwargs):
+    """
+    Signal receiver to invalidate the cached category tree when a category or subcategory is saved
+    """
+    categories.invalidate()
+
+@receiver(post_delete, sender=CategoryShop)
+@receiver(post_delete, sender=SubcategoryShop)
+def invalidate_category_tree_on_delete(sender, instance, **kwargs):
+    """
+    Signal receiver to invalidate the cached category tree when a category or subcategory is deleted
+    """
+    categories.invalidate()
+
+@receiver(pre_save, sender=ProductShop)
+def remember_stored_facet_state(sender, instance, **kwargs):
+    """
+    Signal receiver to read the stored facet fields of a product whose loaded values are unknown
+    """
+    instance._stored_facet_state = None
+    if instance.pk is not None and facets.product_keys(instance, loaded=True) is None:
+        # The product was loaded without the facet fields (only/defer) or built in memory
+        instance._stored_facet_state = facets.stored_state(instance.pk)
+
+@receiver(post_save, sender=ProductShop)
+def update_facet_counts_on_save(sender, instance, created, **kwargs):
+    """
+    Signal receiver to move a saved product between facet counts
+    """
+    stored = getattr(instance, '_stored_facet_state', None)
+    if stored is None:
+        old_keys = () if created else facets.product_keys(instance, loaded=True) or ()
+        facets.record_change(old_keys, facets.product_keys(instance))
+        return
+
+    # Deferred fields were not saved, so their stored values are still current
+    current = {name: instance.__dict__.get(name, value) for name, value in stored.items()}
+    facets.record_change(facets.state_keys(stored), facets.state_keys(current))
+
+@receiver(post_delete, sender=ProductShop)
+def update_facet_counts_on_delete(sender, instance, **kwargs):
+    """
+    Signal receiver to remove a deleted product from facet counts
     """
-    try:
-        call_command('generate_products_json')
-    except Exception as e:
-        print(f"Error updating products.json: {str(e)}")
+    old_keys = facets.product_keys(instance, loaded=True) or facets.product_keys(instance)
+    facets.record_change(old_keys=old_keys)
@@ -15,3 +15,11 @@ def format_thousands(value):
         return '{:,.2f}'.format(value).replace(',', ' ').replace('.', ',')
     except (ValueError, TypeError):
         return value
+
+@register.filter
+def facet_count(counts, key):
+    """Количество товаров из словаря счётчиков фасета (см. shop/facets.py)."""
+    try:
+        return counts.get(key, 0)
+    except AttributeError:
+        return 0
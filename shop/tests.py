@@ -1,3 +1,594 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from shop import categories, facets, pricing, products_json, search
+from shop.pagination import InvalidCursor, KeysetPaginator
+from shop.models import CategoryShop, ProductFacetCount, ProductImage, ProductShop, SubcategoryShop
+
+User = get_user_model()
+
+
+class ProductCardsQueryCountTest(TestCase):
+    """
+    Проверяет, что страницы со списками карточек товаров выполняют
+    фиксированное количество запросов независимо от количества товаров.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = CategoryShop.objects.create(title='Телефоны', slug='phones')
+        cls.subcategory = SubcategoryShop.objects.create(title='Смартфоны', slug='smartphones', category=cls.category)
+        cls.user = User.objects.create_user(phone_number='+79990000000', password='password')
+
+    def create_products(self, count):
+        start = ProductShop.objects.count()
+        for index in range(start, start + count):
+            product = ProductShop.objects.create(
+                title=f'Товар {index}',
+                slug=f'product-{index}',
+                price=100 + index,
+                quantity=index % 3,
+                category=self.category,
+                subcategory=self.subcategory,
+                is_bestseller=True,
+                is_promo=True,
+            )
+            ProductImage.objects.create(product=product, image=f'shop_images/{index}.jpg', slug=f'image-{index}')
+            self.user.favorite_products.add(product)
+
+    def assert_constant_queries(self, url):
+        """Количество запросов не должно расти вместе с количеством товаров."""
+        self.create_products(2)
+        self.client.get(url)  # прогрев сессии и кэшей
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+
+        self.create_products(10)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        return response
+
+    def test_shop_list_view(self):
+        self.client.force_login(self.user)
+        response = self.assert_constant_queries(reverse('shop:shop'))
+        product = response.context['products'][0]
+        self.assertTrue(product.is_favorited)
+        self.assertTrue(product.primary_image_url.endswith('.jpg'))
+
+    def test_category_list_view(self):
+        self.client.force_login(self.user)
+        self.assert_constant_queries(reverse('shop:category', args=[self.category.slug]))
+
+    def test_favorite_list_view(self):
+        self.client.force_login(self.user)
+        response = self.assert_constant_queries(reverse('shop:favorites'))
+        self.assertEqual(len(response.context['favorite_products']), 12)
+
+    def test_index_view(self):
+        self.client.force_login(self.user)
+        self.assert_constant_queries(reverse('main:index') + '?search=Товар')
+
+    def test_anonymous_cards(self):
+        self.create_products(1)
+        product = ProductShop.objects.cards().get()
+        self.assertFalse(product.is_favorited)
+        self.assertEqual(product.primary_image_url, '/media/shop_images/0.jpg')
+
+
+class ProductSearchTest(TestCase):
+    """Проверяет полнотекстовый поиск FTS5 и синхронизацию индекса с каталогом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = CategoryShop.objects.create(title='Телефоны', slug='phones')
+        cls.accessories = CategoryShop.objects.create(title='Аксессуары', slug='accessories')
+        cls.phone = ProductShop.objects.create(
+            title='Смартфон Galaxy', slug='galaxy', price=500, quantity=1, category=cls.phones,
+            description='Экран и батарея',
+        )
+        cls.case = ProductShop.objects.create(
+            title='Чехол', slug='case', price=50, quantity=1, category=cls.accessories,
+            description='Подходит для смартфона Galaxy',
+        )
+
+    def found(self, query):
+        return list(search.search_products(query).values_list('slug', flat=True))
+
+    def test_title_match_ranks_above_description_match(self):
+        self.assertEqual(self.found('galaxy'), ['galaxy', 'case'])
+
+    def test_prefix_and_category_match(self):
+        self.assertEqual(self.found('смарт'), ['galaxy', 'case'])
+        self.assertEqual(self.found('аксесс'), ['case'])
+        self.assertEqual(self.found('смарт чех'), ['case'])
+        # Синтаксис FTS5 в запросе не ломает поиск
+        self.assertEqual(self.found('("galaxy*'), ['galaxy', 'case'])
+
+    def test_save_and_delete_keep_index_in_sync(self):
+        self.phone.title = 'Планшет Tab'
+        self.phone.save()
+        self.assertEqual(self.found('планшет'), ['galaxy'])
+        self.assertEqual(self.found('galaxy'), ['case'])
+
+        self.case.delete()
+        self.assertEqual(self.found('galaxy'), [])
+        self.assertEqual(self.found('подходит'), [])
+
+    def test_category_rename_reindexes_products(self):
+        self.accessories.title = 'Чехлы и плёнки'
+        self.accessories.save()
+        self.assertEqual(self.found('плёнки'), ['case'])
+        self.assertEqual(self.found('аксессуары'), [])
+
+    def test_rebuild_command_restores_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.SEARCH_TABLE}')
+        self.assertEqual(self.found('galaxy'), [])
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+
+        self.assertIn('Successfully indexed 2 products', out.getvalue())
+        self.assertEqual(self.found('galaxy'), ['galaxy', 'case'])
+
+
+class KeysetPaginationTest(TestCase):
+    """Проверяет пагинацию по ключу: курсоры в обе стороны, равные цены и запасной режим ?page=."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryShop.objects.create(title='Категория', slug='category')
+        for index, price in enumerate((300, 100, 200, 100, 50, 200, 100, 100)):
+            ProductShop.objects.create(
+                title=f'Товар {index}', slug=f'product-{index}', price=price, quantity=1, category=category
+            )
+
+    def expected(self, *ordering):
+        return list(ProductShop.objects.order_by(*ordering).values_list('pk', flat=True))
+
+    def walk_forward(self, paginator):
+        pages, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            pages.append(page)
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def test_cursors_round_trip_in_both_directions(self):
+        for ordering in (('effective_price',), ('-effective_price',), ('-pk',)):
+            with self.subTest(ordering=ordering):
+                paginator = KeysetPaginator(ProductShop.objects.all(), 3, ordering)
+                forward = self.walk_forward(paginator)
+                self.assertEqual(
+                    [product.pk for page in forward for product in page],
+                    self.expected(*paginator.ordering),
+                )
+
+                backward, page = [forward[-1]], forward[-1]
+                while page.has_previous:
+                    page = paginator.page(page.previous_cursor)
+                    backward.insert(0, page)
+                self.assertEqual(
+                    [[product.pk for product in page] for page in backward],
+                    [[product.pk for product in page] for page in forward],
+                )
+                self.assertFalse(backward[0].has_previous)
+
+    def test_equal_prices_are_ordered_by_id(self):
+        paginator = KeysetPaginator(ProductShop.objects.all(), 2, ('effective_price',))
+        self.assertEqual(paginator.ordering, ('effective_price', 'pk'))
+
+        ids = [product.pk for page in self.walk_forward(paginator) for product in page]
+        self.assertEqual(ids, self.expected('effective_price', 'pk'))
+        cheapest_ties = list(ProductShop.objects.filter(effective_price=100).order_by('pk').values_list('pk', flat=True))
+        self.assertEqual(ids[1:5], cheapest_ties)
+
+    def test_tampered_cursor_is_rejected(self):
+        paginator = KeysetPaginator(ProductShop.objects.all(), 3, ('effective_price',))
+        cursor = paginator.page().next_cursor
+        wrong_shape = base64.urlsafe_b64encode(b'{"v":["100"],"d":"n"}').decode().rstrip('=')
+        for bad in ('not-a-cursor', cursor[:-4], wrong_shape, cursor.swapcase()):
+            with self.subTest(cursor=bad), self.assertRaises(InvalidCursor):
+                paginator.page(bad)
+
+    def test_view_falls_back_to_first_page_for_invalid_cursor(self):
+        url = reverse('shop:shop')
+        first = self.client.get(url, {'sorting': 'price-asc', 'cursor': ''})
+        self.assertTrue(first.context['keyset_pagination'])
+        expected = [product.pk for product in first.context['products']]
+
+        for bad in ('garbage', first.context['page_obj'].next_cursor + 'x'):
+            with self.subTest(cursor=bad):
+                response = self.client.get(url, {'sorting': 'price-asc', 'cursor': bad})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([product.pk for product in response.context['products']], expected)
+
+    def test_view_pages_by_cursor_with_effective_price(self):
+        url = reverse('shop:shop')
+        params = {'sorting': 'price-desc', 'cursor': ''}
+        ids = []
+        while True:
+            page = self.client.get(url, params).context['page_obj']
+            ids.extend(product.pk for product in page)
+            if not page.has_next:
+                break
+            params['cursor'] = page.next_cursor
+        self.assertEqual(ids, self.expected('-effective_price', '-pk'))
+
+    def test_page_parameter_without_cursor_uses_offset_pagination(self):
+        response = self.client.get(reverse('shop:shop'), {'sorting': 'price-asc', 'page': 2})
+
+        self.assertFalse(response.context['keyset_pagination'])
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(
+            [product.effective_price for product in response.context['products']],
+            sorted(ProductShop.objects.values_list('effective_price', flat=True))[6:],
+        )
+
+
+class CategoryTreeTest(TestCase):
+    """Проверяет дерево категорий в памяти процесса и его сброс сигналами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = CategoryShop.objects.create(title='Телефоны', slug='phones')
+        cls.subcategory = SubcategoryShop.objects.create(title='Смартфоны', slug='smartphones', category=cls.category)
+
+    def setUp(self):
+        categories.bump_version()
+
+    def test_tree_links_and_lookups(self):
+        tree = categories.get_tree()
+        category = tree.category('phones')
+        subcategory = tree.subcategory('smartphones')
+        self.assertEqual(category.pk, self.category.pk)
+        self.assertEqual(category.subcategories, (subcategory,))
+        self.assertIs(subcategory.category, category)
+        self.assertIsNone(tree.category('missing'))
+        self.assertIsNone(tree.subcategory(None))
+
+    def test_tree_is_reused_until_invalidated(self):
+        tree = categories.get_tree()
+        with self.assertNumQueries(0):
+            self.assertIs(categories.get_tree(), tree)
+
+        SubcategoryShop.objects.create(title='Планшеты', slug='tablets', category=self.category)
+        rebuilt = categories.get_tree()
+        self.assertIsNot(rebuilt, tree)
+        self.assertEqual(len(rebuilt.category('phones').subcategories), 2)
+
+    def test_selected_filters_do_not_query_categories(self):
+        url = reverse('shop:shop') + '?category=phones&subcategory=smartphones'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['selected_subcategory'].slug, 'smartphones')
+        tables = (CategoryShop._meta.db_table, SubcategoryShop._meta.db_table)
+        category_queries = [
+            query['sql'] for query in queries.captured_queries
+            if any(f'FROM "{table}"' in query['sql'] for table in tables)
+        ]
+        self.assertEqual(category_queries, [])
+
+    def test_unknown_category_returns_404(self):
+        response = self.client.get(reverse('shop:category', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+
+class FacetCountsTest(TestCase):
+    """Проверяет инкрементальные счётчики фасетов и их совпадение с полным пересчётом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = CategoryShop.objects.create(title='Телефоны', slug='phones')
+        cls.laptops = CategoryShop.objects.create(title='Ноутбуки', slug='laptops')
+        cls.smartphones = SubcategoryShop.objects.create(title='Смартфоны', slug='smartphones', category=cls.phones)
+        ProductShop.objects.create(
+            title='Телефон', slug='phone', price=500, quantity=3,
+            category=cls.phones, subcategory=cls.smartphones, is_promo=True,
+        )
+        ProductShop.objects.create(
+            title='Ноутбук', slug='laptop', price=60000, quantity=0, category=cls.laptops, is_bestseller=True,
+        )
+
+    def snapshot(self):
+        return set(ProductFacetCount.objects.filter(count__gt=0).values_list('scope', 'facet', 'value', 'count'))
+
+    def assert_matches_rebuild(self):
+        incremental = self.snapshot()
+        facets.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_counts_for_catalog_and_category(self):
+        counts = facets.get_counts()
+        self.assertEqual(counts.categories, {self.phones.pk: 1, self.laptops.pk: 1})
+        self.assertEqual(counts.subcategories, {self.smartphones.pk: 1})
+        self.assertEqual((counts.in_stock, counts.promo, counts.bestseller), (1, 1, 1))
+        self.assertEqual(counts.price_bands, (('0-1000', 1), ('50000+', 1)))
+
+        counts = facets.get_counts(self.laptops.pk)
+        self.assertEqual(counts.categories, {self.phones.pk: 1, self.laptops.pk: 1})
+        self.assertEqual((counts.in_stock, counts.promo, counts.bestseller), (0, 0, 1))
+        self.assertEqual(counts.price_bands, (('50000+', 1),))
+
+    def test_counts_follow_product_changes(self):
+        product = ProductShop.objects.get(slug='phone')
+        product.category = self.laptops
+        product.subcategory = None
+        product.quantity = 0
+        product.price = 7000
+        product.save()
+        self.assertEqual(facets.get_counts().categories, {self.laptops.pk: 2})
+        self.assert_matches_rebuild()
+
+        ProductShop.objects.get(slug='laptop').delete()
+        self.assertEqual(facets.get_counts().categories, {self.laptops.pk: 1})
+        self.assert_matches_rebuild()
+
+    def test_partially_loaded_product_applies_delta(self):
+        product = ProductShop.objects.only('pk', 'title', 'quantity').get(slug='phone')
+        product.quantity = 0
+
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+
+        facet_queries = [query['sql'] for query in queries.captured_queries if 'ProductFacetCount' in query['sql']]
+        self.assertEqual(len(facet_queries), 1)
+        self.assertIn('ON CONFLICT', facet_queries[0])
+        self.assertEqual(facets.get_counts().in_stock, 0)
+        self.assert_matches_rebuild()
+
+    def test_stock_change_from_bulk_update(self):
+        product = ProductShop.objects.get(slug='phone')
+        ProductShop.objects.filter(pk=product.pk).update(quantity=0)
+        facets.record_stock_change([(product.category_id, 3, 0)])
+        self.assertEqual(facets.get_counts().in_stock, 0)
+        self.assert_matches_rebuild()
+
+    def test_search_counts_cover_only_matches(self):
+        counts = facets.search_counts('телефон')
+        self.assertEqual(counts.categories, {self.phones.pk: 1})
+        self.assertEqual(counts.promo, 1)
+        self.assertEqual(counts.bestseller, 0)
+
+    def test_catalog_page_reads_counts_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('shop:shop'))
+        self.assertEqual(response.context['facets'].in_stock, 1)
+        facet_queries = [q for q in queries.captured_queries if 'ProductFacetCount' in q['sql']]
+        self.assertEqual(len(facet_queries), 1)
+
+
+class EffectivePriceTest(TestCase):
+    """Проверяет сохранённую цену со скидкой, сортировку и фильтр по ней."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = CategoryShop.objects.create(title='Телефоны', slug='phones')
+        # Без скидки дороже по price, но дешевле по цене со скидкой — и наоборот
+        cls.discounted = ProductShop.objects.create(
+            title='Со скидкой', slug='discounted', price=1000, discount=50, quantity=1, category=cls.category,
+        )
+        cls.regular = ProductShop.objects.create(
+            title='Без скидки', slug='regular', price=800, quantity=1, category=cls.category,
+        )
+
+    def test_effective_price_is_maintained_on_save(self):
+        self.assertEqual(self.discounted.effective_price, self.discounted.sell_price())
+
+        product = ProductShop.objects.get(pk=self.regular.pk)
+        product.discount = 25
+        product.save(update_fields=['discount'])
+        product.refresh_from_db()
+        self.assertEqual(product.effective_price, 600)
+
+    def test_refresh_after_bulk_repricing(self):
+        ProductShop.objects.filter(pk=self.regular.pk).update(discount=10)
+        self.assertEqual(pricing.refresh_effective_prices(), 1)
+        self.assertEqual(ProductShop.objects.get(pk=self.regular.pk).effective_price, 720)
+
+    def test_listing_sorts_and_filters_by_effective_price(self):
+        for url in (reverse('shop:shop'), reverse('shop:category', args=['phones'])):
+            response = self.client.get(url, {'sorting': 'price-asc'})
+            self.assertEqual([p.slug for p in response.context['products']], ['discounted', 'regular'])
+
+            response = self.client.get(url, {'price_min': '600', 'price_max': '900'})
+            self.assertEqual([p.slug for p in response.context['products']], ['regular'])
+
+    def test_invalid_price_range_is_ignored(self):
+        response = self.client.get(reverse('shop:shop'), {'price_min': 'abc', 'price_max': 'NaN'})
+        self.assertEqual(len(response.context['products']), 2)
+        self.assertIsNone(response.context['price_min'])
+
+
+class ProductsJsonViewTest(SimpleTestCase):
+    """Проверяет условные запросы и выбор gzip-версии products.json."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'products.json')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'products': [{'title': 'Товар'}]}, f, ensure_ascii=False)
+
+        patcher = mock.patch.object(products_json, 'get_file_path', return_value=self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        products_json._payload = None
+        self.addCleanup(setattr, products_json, '_payload', None)
+        self.url = reverse('shop:products_json')
+
+    def test_gzip_has_its_own_etag(self):
+        plain = self.client.get(self.url)
+        zipped = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(json.loads(plain.content), {'products': [{'title': 'Товар'}]})
+        self.assertEqual(zipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(zipped.content), plain.content)
+        self.assertEqual(zipped['ETag'], plain['ETag'][:-1] + '-gzip"')
+        self.assertIn('Accept-Encoding', zipped['Vary'])
+
+    def test_q_values_are_respected(self):
+        for header, compressed in (
+            ('gzip;q=0, identity', False),
+            ('GZIP; q=0.5', True),
+            ('*', True),
+            ('*;q=0.1, gzip;q=0', False),
+            ('br, deflate', False),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_ACCEPT_ENCODING=header)
+                self.assertEqual(response.has_header('Content-Encoding'), compressed)
+
+    def test_if_none_match_returns_304_with_vary(self):
+        etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        # ETag gzip-версии не подходит для несжатого представления
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.url)
+        last_modified = response['Last-Modified']
+        self.assertEqual(last_modified, http_date(os.stat(self.path).st_mtime))
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date(os.stat(self.path).st_mtime - 60))
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_file_version_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'products': []}, f)
+        os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + 1))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class FakeTimer:
+    """Таймер, который запоминает задержку и не запускает поток."""
+    created = []
+
+    def __init__(self, interval, function):
+        self.interval = interval
+        self.function = function
+        self.cancelled = False
+        FakeTimer.created.append(self)
+
+    def start(self):
+        pass
+
+    def cancel(self):
+        self.cancelled = True
+
+
+@override_settings(PRODUCTS_JSON_DEBOUNCE_SECONDS=2, PRODUCTS_JSON_MAX_WAIT_SECONDS=10)
+class ProductsJsonSchedulerTest(SimpleTestCase):
+    """Проверяет дребезг и единственную одновременную пересборку products.json."""
+
+    def setUp(self):
+        FakeTimer.created = []
+        self.addCleanup(products_json.cancel_scheduled)
+        self.generate = mock.patch.object(products_json, '_generate').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_each_change_restarts_timer_until_max_wait(self):
+        mock.patch.object(products_json.threading, 'Timer', FakeTimer).start()
+        clock = mock.patch.object(products_json.time, 'monotonic').start()
+
+        for now in (100, 101, 108.5, 109.5):
+            clock.return_value = now
+            products_json._arm_timer()
+
+        self.assertEqual([timer.interval for timer in FakeTimer.created], [2, 2, 1.5, 0.5])
+        self.assertEqual([timer.cancelled for timer in FakeTimer.created], [True, True, True, False])
+        self.generate.assert_not_called()
+
+    @override_settings(PRODUCTS_JSON_DEBOUNCE_SECONDS=0.05)
+    def test_burst_of_changes_rebuilds_once(self):
+        for _ in range(5):
+            products_json._arm_timer()
+        time.sleep(0.3)
+
+        self.generate.assert_called_once()
+        self.assertIsNone(products_json._timer)
+
+    def test_concurrent_requests_coalesce_into_one_follow_up(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_generate():
+            if not started.is_set():
+                started.set()
+                release.wait(5)
+
+        self.generate.side_effect = slow_generate
+        builder = threading.Thread(target=products_json.rebuild_now)
+        builder.start()
+        self.assertTrue(started.wait(5))
+
+        for _ in range(3):
+            products_json.rebuild_now()  # не ждёт текущую сборку
+        self.assertEqual(self.generate.call_count, 1)
+
+        release.set()
+        builder.join(5)
+        self.assertEqual(self.generate.call_count, 2)
+
+    def test_request_before_lock_release_is_not_lost(self):
+        lock = threading.Lock()
+
+        class RacingStateLock:
+            """
+            Блокировка состояния, после проверки «сборок больше не нужно» которой
+            приходит новый запрос, пока сборщик ещё держит _build_lock.
+            """
+            raced = False
+
+            def __enter__(self):
+                lock.acquire()
+                self.requested = products_json._rebuild_requested
+
+            def __exit__(self, *exc_info):
+                lock.release()
+                idle = not self.requested and not products_json._rebuild_requested
+                if idle and not RacingStateLock.raced and products_json._build_lock.locked():
+                    RacingStateLock.raced = True
+                    products_json.rebuild_now()  # сборщик занят — вызов сразу возвращается
+
+        mock.patch.object(products_json, '_state_lock', RacingStateLock()).start()
+        products_json.rebuild_now()
+
+        self.assertTrue(RacingStateLock.raced)
+        self.assertEqual(self.generate.call_count, 2)
+        self.assertFalse(products_json._rebuild_requested)
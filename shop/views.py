@@ -1,17 +1,16 @@
-from django.utils.http import urlencode
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
 from django.shortcuts import get_object_or_404
 from django.views.generic import ListView, DetailView, TemplateView, View
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse, HttpResponseNotModified
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import Q
-from shop.mixins import SearchMixin
-from shop.models import CategoryShop, ProductShop, SubcategoryShop
-import json
-import os
-from django.conf import settings
+from shop import categories, facets, products_json
+from shop.mixins import KeysetPaginationMixin, PriceRangeMixin, SearchMixin
+from shop.models import ProductShop
 
 
-class ShopListView(SearchMixin, ListView):
+class ShopListView(SearchMixin, PriceRangeMixin, KeysetPaginationMixin, ListView):
     """
     Отображает список товаров с фильтрацией, поиском и сортировкой.
     Логика разделена: сначала фильтрация, затем поиск, затем сортировка.
@@ -22,6 +21,23 @@ class ShopListView(SearchMixin, ListView):
     context_object_name = 'products'
     default_ordering = '-pk'  # Дефолтная сортировка по ID (новые товары)
 
+    def filter_categories(self, queryset, category_slug, subcategory_slug):
+        """
+        Фильтрует товары по подкатегории или категории из GET-параметров.
+
+        Slug переводится в ID по дереву категорий, поэтому фильтр не требует
+        JOIN и использует составные индексы (категория, цена со скидкой).
+        Неизвестный slug даёт пустой список.
+        """
+        tree = categories.get_tree()
+        if subcategory_slug:
+            node = tree.subcategory(subcategory_slug)
+            return queryset.filter(subcategory_id=node.pk) if node else queryset.none()
+        if category_slug:
+            node = tree.category(category_slug)
+            return queryset.filter(category_id=node.pk) if node else queryset.none()
+        return queryset
+
     def get_queryset(self):
         """
         1. Получает базовый список товаров.
@@ -36,10 +52,7 @@ class ShopListView(SearchMixin, ListView):
         category_slug = self.request.GET.get('category')
         subcategory_slug = self.request.GET.get('subcategory')
         
-        if subcategory_slug:
-            queryset = queryset.filter(subcategory__slug=subcategory_slug)
-        elif category_slug:
-            queryset = queryset.filter(category__slug=category_slug)
+        queryset = self.filter_categories(queryset, category_slug, subcategory_slug)
 
         # 3. Поиск (вызываем метод из миксина)
         search_query = self.request.GET.get('search', '').strip()
@@ -47,19 +60,27 @@ class ShopListView(SearchMixin, ListView):
             # Если есть поиск, заменяем queryset на результаты поиска
             queryset = self.get_search_results()
             # Важно: после поиска нужно применить фильтрацию категорий заново
-            if category_slug:
-                queryset = queryset.filter(category__slug=category_slug)
-            elif subcategory_slug:
-                queryset = queryset.filter(subcategory__slug=subcategory_slug)
+            queryset = self.filter_categories(queryset, category_slug, subcategory_slug)
+
+        # Фильтр по цене со скидкой (поиск по диапазону индекса)
+        queryset = self.filter_price_range(queryset)
+
+        # Проекция карточек: изображение и избранное без N+1 запросов в шаблоне
+        queryset = queryset.cards(self.request.user)
 
         # 4. Сортировка (применяем в самом конце к финальному queryset)
+        # Без явной сортировки результаты поиска остаются упорядоченными по релевантности
+        if search_query and 'sorting' not in self.request.GET:
+            return queryset
+
         sort_by = self.request.GET.get('sorting', 'created-desc')
         
         sort_map = {
             'title-asc': 'title',
             'title-desc': '-title',
-            'price-asc': 'price',
-            'price-desc': '-price',
+            # Сортировка по цене, которую видит покупатель (с учётом скидки)
+            'price-asc': 'effective_price',
+            'price-desc': '-effective_price',
             'created-asc': 'pk',
             'created-desc': '-pk',
         }
@@ -74,9 +95,10 @@ class ShopListView(SearchMixin, ListView):
         """
         context = super().get_context_data(**kwargs)
         
-        # Сохраняем параметры для пагинации (кроме page)
+        # Сохраняем параметры для пагинации (кроме page и cursor)
         query_params = self.request.GET.copy()
         query_params.pop('page', None)
+        query_params.pop(self.cursor_kwarg, None)
         
         # --- НАЧАЛО ИСПРАВЛЕНИЯ ---
         # Проверяем, активен ли поиск
@@ -88,17 +110,20 @@ class ShopListView(SearchMixin, ListView):
         selected_category = None
         selected_subcategory = None
         
+        # Дерево категорий берётся из памяти процесса (см. shop/categories.py)
+        tree = categories.get_tree()
+
         if not is_search_active:
             # Только если поиска нет, мы берём фильтры из URL
-            selected_category = CategoryShop.objects.filter(slug=self.request.GET.get('category')).first()
-            selected_subcategory = SubcategoryShop.objects.filter(slug=self.request.GET.get('subcategory')).first()
+            selected_category = tree.category(self.request.GET.get('category'))
+            selected_subcategory = tree.subcategory(self.request.GET.get('subcategory'))
         # --- КОНЕЦ ИСПРАВЛЕНИЯ ---
 
         context.update({
             'title': 'Магазин',
-            'categories': CategoryShop.objects.all(),
-            'subcategories': SubcategoryShop.objects.all(),
-            'query_params': urlencode(query_params),
+            'categories': tree.categories,
+            'subcategories': tree.subcategories,
+            'query_params': query_params.urlencode(),
             
             # Текущая сортировка для отображения в <select>
             'sorting': self.request.GET.get('sorting', 'created-desc'),
@@ -109,6 +134,9 @@ class ShopListView(SearchMixin, ListView):
             # Безопасное получение фильтров для подсветки в меню (без 404)
             'selected_category': selected_category,
             'selected_subcategory': selected_subcategory,
+
+            # Счётчики товаров для боковой панели: из таблицы фасетов или по результатам поиска
+            'facets': facets.search_counts(search_query) if is_search_active else facets.get_counts(),
         })
         
         return context
@@ -126,37 +154,39 @@ class ProductDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        tree = categories.get_tree()
         
         context.update({
             'title': f'Товар: {self.object.title}',
             'images': self.object.images.all(),
             
             # Для хлебных крошек / навигации
-            'selected_category': self.object.category,
-            'selected_subcategory': self.object.subcategory,
+            'selected_category': tree.category_by_pk.get(self.object.category_id),
+            'selected_subcategory': tree.subcategory_by_pk.get(self.object.subcategory_id),
             
             # Рекомендуемые товары из той же категории (кроме текущего)
             'related_products': ProductShop.objects.filter(
-                category=self.object.category
+                category_id=self.object.category_id
             ).exclude(id=self.object.id)[:4],
             
-            'categories': CategoryShop.objects.all(),
+            'categories': tree.categories,
         })
         
         return context
 
 
-class CategoryListView(ListView):
+class CategoryListView(PriceRangeMixin, KeysetPaginationMixin, ListView):
     """
     Класс-представление для отображения списка товаров в выбранной категории.
 
     Attributes:
         model (ProductShop): Модель данных для товаров.
         template_name (str): Имя шаблона для отображения списка товаров в категории.
-        paginate_by (int): Количество товаров на странице.
+        paginate_by (int): Количество товаров на странице (доступен и режим курсора, см. KeysetPaginationMixin).
         context_object_name (str): Имя переменной контекста для списка товаров.
 
     Methods:
+        get_category(): Возвращает категорию из URL по дереву категорий.
         get_queryset(): Возвращает queryset товаров в выбранной категории.
         get_context_data(**kwargs): Добавляет дополнительные данные в контекст шаблона.
     """
@@ -165,28 +195,45 @@ class CategoryListView(ListView):
     paginate_by = 6
     context_object_name = 'products'
 
+    def get_category(self):
+        """
+        Возвращает категорию из URL по дереву категорий.
+
+        Raises:
+            Http404: Если категории с таким slug нет.
+        """
+        category = categories.get_tree().category(self.kwargs['category_slug'])
+        if category is None:
+            raise Http404('Категория не найдена.')
+        return category
+
     def get_queryset(self):
         queryset = super().get_queryset()
 
-        category_slug = self.kwargs['category_slug']
-        
         # Фильтрация по категории из URL
-        category = get_object_or_404(CategoryShop, slug=category_slug)
-        queryset = queryset.filter(category=category)
+        category = self.get_category()
+        queryset = queryset.filter(category_id=category.pk)
 
         # Дополнительная фильтрация по подкатегории из GET-параметров
         subcategory_slug = self.request.GET.get('subcategory')
         if subcategory_slug:
             queryset = queryset.filter(subcategory__slug=subcategory_slug)
 
+        # Фильтр по цене со скидкой (поиск по диапазону индекса)
+        queryset = self.filter_price_range(queryset)
+
+        # Проекция карточек: изображение и избранное без N+1 запросов в шаблоне
+        queryset = queryset.cards(self.request.user)
+
         # Сортировка (всегда в конце)
         sort_by = self.request.GET.get('sorting', '-pk')
         
         sort_map = {
             'title-asc': 'title',
             'title-desc': '-title',
-            'price-asc': 'price',
-            'price-desc': '-price',
+            # Сортировка по цене, которую видит покупатель (с учётом скидки)
+            'price-asc': 'effective_price',
+            'price-desc': '-effective_price',
             'created-asc': 'pk',
             'created-desc': '-pk',
         }
@@ -203,15 +250,22 @@ class CategoryListView(ListView):
             dict: Словарь с данными для передачи в шаблон.
         """
         context = super().get_context_data(**kwargs)
-        category_slug = self.kwargs['category_slug']
-        category = get_object_or_404(CategoryShop, slug=category_slug)
+        tree = categories.get_tree()
+        category = self.get_category()
         context['title'] = f'Категория: {category.title}'
         context['category'] = category
-        context['categories'] = CategoryShop.objects.all()
-        context['subcategories'] = SubcategoryShop.objects.all()
+        context['categories'] = tree.categories
+        context['subcategories'] = tree.subcategories
         context['selected_category'] = category
         context['selected_subcategory'] = None
+        context['facets'] = facets.get_counts(category.pk)
         context['sorting'] = self.request.GET.get('sorting', 'created-desc')
+
+        # Сохраняем параметры для пагинации (кроме page и cursor)
+        query_params = self.request.GET.copy()
+        query_params.pop('page', None)
+        query_params.pop(self.cursor_kwarg, None)
+        context['query_params'] = query_params.urlencode()
         return context
 
 
@@ -254,6 +308,9 @@ class FavoriteListView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Избранные товары'
         context['user'] = self.request.user
+        context['favorite_products'] = ProductShop.objects.filter(
+            favorited_by=self.request.user
+        ).cards(self.request.user)
         return context
 
 class FavoriteCountView(LoginRequiredMixin, View):
@@ -279,21 +336,79 @@ class FavoriteCountView(LoginRequiredMixin, View):
         return JsonResponse({'favorites_count': favorites_count})
 
 class ProductsJsonView(View):
+    """
+    Отдаёт products.json из кэша в памяти (см. shop.products_json).
+
+    Поддерживает условные запросы (ETag / If-None-Match, Last-Modified /
+    If-Modified-Since) и отдаёт заранее сжатую gzip-версию, если клиент её
+    принимает. У gzip-версии собственный ETag с суффиксом ``-gzip``, чтобы
+    кэши не путали представления.
+    """
+
     def get(self, request):
-        json_file_path = os.path.join(settings.BASE_DIR, 'static', 'products.json')
-        
         try:
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            return HttpResponse(
-                json.dumps(data),
-                content_type='application/json; charset=utf-8'
-            )
-            
+            payload = products_json.get_payload()
         except FileNotFoundError:
             return JsonResponse(
                 {'error': 'Файл products.json не найден.'},
                 status=404,
                 json_dumps_params={'ensure_ascii': False}
             )
+
+        use_gzip = self._accepts_gzip(request.headers.get('Accept-Encoding', ''))
+        etag = payload.gzip_etag if use_gzip else payload.etag
+
+        if self._is_not_modified(request, etag, payload.last_modified):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                payload.gzipped if use_gzip else payload.body,
+                content_type='application/json; charset=utf-8'
+            )
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(payload.last_modified)
+        response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    @staticmethod
+    def _accepts_gzip(accept_encoding):
+        """
+        Проверяет, принимает ли клиент gzip, с учётом q-значений.
+
+        ``gzip;q=0`` запрещает сжатие; явное значение для gzip важнее ``*``.
+        """
+        gzip_q = any_q = None
+        for item in accept_encoding.split(','):
+            coding, *params = [part.strip() for part in item.split(';')]
+            q = 1.0
+            for param in params:
+                name, _, value = param.partition('=')
+                if name.strip().lower() == 'q':
+                    try:
+                        q = float(value)
+                    except ValueError:
+                        q = 0.0
+            coding = coding.lower()
+            if coding in ('gzip', 'x-gzip'):
+                gzip_q = q
+            elif coding == '*':
+                any_q = q
+
+        if gzip_q is None:
+            gzip_q = any_q
+        return gzip_q is not None and gzip_q > 0
+
+    @staticmethod
+    def _is_not_modified(request, etag, last_modified):
+        """Проверяет условные заголовки запроса (If-None-Match имеет приоритет)."""
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or etag in etags
+
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+        return if_modified_since is not None and int(last_modified) <= if_modified_since